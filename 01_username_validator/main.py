@@ -2,7 +2,7 @@
 Username Validator (CSV-based)
 
 This script reads usernames from a CSV file and validates them
-according to a set of predefined rules.
+according to the rules in rules.toml.
 
 Valid records are written to a separate CSV file.
 Invalid records are written to another CSV file along with
@@ -11,136 +11,146 @@ the validation error message.
 Designed as a portfolio-ready beginner Python project.
 """
 
-import csv
+import os
+import sys
+
+# Make the shared helpers in the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.dedup import DuplicateIndex, NearDuplicateIndex
+from common.batch_rules import BatchFieldRules
+from common.error_summary import ErrorSummary
+from common.rules import RuleConfig
+from common.sinks import open_sink
+from common.sources import CsvInput
 
 # -----------------------------
 # Configuration: input/output
 # -----------------------------
 
+# INPUT_FILE may also be a folder or a glob such as 'exports/*.csv.gz'
 INPUT_FILE = "sample.csv"
+# Output format follows the file extension:
+# .csv, .csv.gz, .csv.zst, .jsonl, .parquet, .arrow or .sqlite (see common/sinks.py)
 OUTPUT_VALID = "valid_records.csv"
 OUTPUT_INVALID = "invalid_records.csv"
+# Rejections per rule, with example rows (see common/error_summary.py)
+ERROR_SUMMARY_OUTPUT = "error_summary.csv"
+
+# Rules are read from this file (TOML or JSON, rule types are listed in
+# common/rules.py). An edited file is picked up while the script runs.
+RULES_FILE = "rules.toml"
+# Rows validated together (vectorized with NumPy when it is installed,
+# see common/batch_rules.py); an edited rules file is picked up between
+# batches
+BATCH_ROWS = 10_000
 
 
 # -----------------------------
-# Username validation rules
+# Duplicate detection
 # -----------------------------
 
-def rule_username_min_length(value):
-    """Username must be at least 5 characters long."""
-    if len(value) < 5:
-        return False, "must be at least 5 characters"
-    return True, ""
-
-
-def rule_username_not_digits_only(value):
-    """Username must not consist of digits only."""
-    if value.isdigit():
-        return False, "cannot be digits only"
-    return True, ""
-
+exact_usernames = DuplicateIndex()
+similar_usernames = NearDuplicateIndex()
 
-def rule_username_no_spaces(value):
-    """Username must not contain whitespace characters."""
-    for char in value:
-        if char.isspace():
-            return False, "no spaces allowed"
-    return True, ""
 
+def duplicate_failure(username, row_number):
+    """
+    Check a username against the valid usernames from earlier rows.
 
-def rule_username_starts_with_letter(value):
-    """Username must start with an alphabetic character."""
-    if not value[0].isalpha():
-        return False, "must start with a letter"
-    return True, ""
-
-
-def rule_username_no_double_underscores(value):
-    """Username must not contain double underscores."""
-    if "__" in value:
-        return False, "double underscore not allowed"
-    return True, ""
-
+    Exact repeats are compared case-insensitively. Look-alike usernames
+    such as 'john.doe' and 'john-doe' are reported as too similar.
 
-def rule_username_only_safe_chars(value):
-    """Username may only contain letters, digits, dots, and hyphens."""
-    safe_chars = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890.-"
-    for char in value:
-        if char not in safe_chars:
-            return False, f"invalid character '{char}'"
-    return True, ""
+    Returns:
+        (str, str) | None: Rule name and error message, or None if the
+        username is unique
+    """
+    first_row = exact_usernames.find(username.casefold())
+    if first_row is not None:
+        return "duplicate", f"duplicate of row {first_row}"
 
+    earlier = similar_usernames.find(username)
+    if earlier is not None:
+        earlier_name, earlier_row = earlier
+        return "too_similar", f"too similar to '{earlier_name}' (row {earlier_row})"
 
-# List of rules applied in order
-username_rules = [
-    rule_username_min_length,
-    rule_username_not_digits_only,
-    rule_username_no_double_underscores,
-    rule_username_no_spaces,
-    rule_username_only_safe_chars,
-    rule_username_starts_with_letter,
-]
+    # Only accepted usernames are remembered for later rows
+    exact_usernames.add(username.casefold(), row_number)
+    similar_usernames.add(username, row_number)
+    return None
 
 
 # -----------------------------
-# Validation engine
+# CSV processing
 # -----------------------------
 
-def is_username_valid(username, rules):
+def write_batch(batch, usernames, username_rules, valid_writer, invalid_writer, summary):
     """
-    Apply validation rules to a username.
+    Validate a batch of usernames and write each row to the matching output.
 
-    Returns:
-        (bool, str | None): Validation result and error message (if any)
+    The rules are checked for the whole batch at once; uniqueness is then
+    checked row by row, in file order. Every row is counted in summary.
     """
-    for rule in rules:
-        passed, message = rule(username)
-        if not passed:
-            return False, message
-    return True, None
+    failures = username_rules.evaluate(usernames)
+    for (row_number, row), username, failure in zip(batch, usernames, failures):
+        if failure is None:
+            failure = duplicate_failure(username, row_number)
 
+        if failure is None:
+            summary.add_row(row_number, [])
+            valid_writer.writerow(row)
+        else:
+            summary.add_row(row_number, [("username", failure[0], failure[1])], row)
+            row["error"] = failure[1]
+            invalid_writer.writerow(row)
 
-# -----------------------------
-# CSV processing
-# -----------------------------
 
 try:
-    with open(INPUT_FILE, "r", newline="") as infile, \
-         open(OUTPUT_VALID, "w", newline="") as valid_file, \
-         open(OUTPUT_INVALID, "w", newline="") as invalid_file:
-
-        reader = csv.DictReader(infile)
-
-        # Writers for valid and invalid records
-        valid_writer = csv.DictWriter(
-            valid_file,
-            fieldnames=["username", "password", "email"],
-            extrasaction="ignore"
-        )
-
-        invalid_writer = csv.DictWriter(
-            invalid_file,
-            fieldnames=["username", "password", "email", "error"],
-            extrasaction="ignore"
-        )
+    rule_config = RuleConfig(RULES_FILE)
+    username_rules = BatchFieldRules(rule_config.rules["username"])
+    summary = ErrorSummary()
+
+    # Input reader plus writers for valid and invalid records
+    with CsvInput(INPUT_FILE) as reader, \
+         open_sink(
+             OUTPUT_VALID,
+             fieldnames=["username", "password", "email"],
+             extrasaction="ignore"
+         ) as valid_writer, \
+         open_sink(
+             OUTPUT_INVALID,
+             fieldnames=["username", "password", "email", "error"],
+             extrasaction="ignore",
+             dictionary_columns=["error"]
+         ) as invalid_writer:
 
         valid_writer.writeheader()
         invalid_writer.writeheader()
 
-        for row in reader:
+        batch = []
+        usernames = []
+        # Row numbers start at 2 because line 1 is the header
+        for row_number, row in enumerate(reader, start=2):
             try:
                 username = row["username1"]  # intentionally incorrect key for testing
             except KeyError:
                 print("Row missing 'username' key. Skipping row.")
                 continue
 
-            is_valid, error = is_username_valid(username, username_rules)
+            batch.append((row_number, row))
+            usernames.append(username)
+            if len(batch) == BATCH_ROWS:
+                write_batch(batch, usernames, username_rules, valid_writer, invalid_writer, summary)
+                batch = []
+                usernames = []
+                # Rows in flight keep the rule set they started with; a newer
+                # rules file is only swapped in between batches
+                if rule_config.reload_if_changed():
+                    username_rules = BatchFieldRules(rule_config.rules["username"])
+
+        write_batch(batch, usernames, username_rules, valid_writer, invalid_writer, summary)
 
-            if is_valid:
-                valid_writer.writerow(row)
-            else:
-                row["error"] = error
-                invalid_writer.writerow(row)
+    summary.write(ERROR_SUMMARY_OUTPUT)
 
 except FileNotFoundError as e:
     print("File not found:", e)
@@ -151,4 +161,6 @@ except Exception as e:
 else:
     print("Username validation completed successfully.")
 finally:
+    exact_usernames.close()
+    similar_usernames.close()
     print("Validation attempt finished.")
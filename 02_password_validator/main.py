@@ -2,7 +2,7 @@
 Password Validator (CSV-based)
 
 Reads passwords from a CSV file and validates them
-according to a set of predefined rules.
+according to the rules in rules.toml.
 
 Valid records are written to a separate CSV file.
 Invalid records are written to another CSV file along with
@@ -11,120 +11,97 @@ the validation error message.
 Designed as a beginner-friendly portfolio project.
 """
 
-import csv
+import os
+import sys
+
+# Make the shared helpers in the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.batch_rules import BatchFieldRules
+from common.error_summary import ErrorSummary
+from common.rules import RuleConfig
+from common.sinks import open_sink
+from common.sources import CsvInput
 
 # -----------------------------
 # Configuration: input/output
 # -----------------------------
 
+# INPUT_FILE may also be a folder or a glob such as 'exports/*.csv.gz'
 INPUT_FILE = "sample_input.csv"
+# Output format follows the file extension:
+# .csv, .csv.gz, .csv.zst, .jsonl, .parquet, .arrow or .sqlite (see common/sinks.py)
 OUTPUT_VALID = "valid_records.csv"
 OUTPUT_INVALID = "invalid_records.csv"
+# Rejections per rule, with example rows (see common/error_summary.py)
+ERROR_SUMMARY_OUTPUT = "error_summary.csv"
 
-# -----------------------------
-# Password validation rules
-# -----------------------------
-
-def rule_password_min_length(value):
-    """Password must be at least 5 characters."""
-    if len(value) < 5:
-        return False, "must be at least 5 characters"
-    return True, ""
-
-def rule_password_no_space(value):
-    """Password must not contain spaces."""
-    if " " in value:
-        return False, "no spaces allowed"
-    return True, ""
-
-def rule_password_only_safe_chars(value):
-    """Password may only contain letters, digits, and special characters !#$%^&*()-"""
-    safe_chars = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890!#$%^&*()-"
-    for char in value:
-        if char not in safe_chars:
-            return False, f"invalid character '{char}'"
-    return True, ""
-
-def rule_password_no_triple_repeats(value):
-    """Password cannot have three consecutive repeated characters."""
-    for i in range(len(value) - 2):
-        if value[i] == value[i+1] == value[i+2]:
-            return False, "cannot have three repeated characters consecutively"
-    return True, ""
-
-def rule_password_has_uppercase(value):
-    """Password must contain at least one uppercase character."""
-    for ch in value:
-        if ch.isupper():
-            return True, ""
-    return False, "must have an uppercase character"
-
-def rule_password_has_digit(value):
-    """Password must contain at least one digit."""
-    for ch in value:
-        if ch.isdigit():
-            return True, ""
-    return False, "must have at least one digit"
-
-# List of rules applied in order
-password_rules = [
-    rule_password_min_length,
-    rule_password_no_space,
-    rule_password_only_safe_chars,
-    rule_password_has_digit,
-    rule_password_has_uppercase,
-    rule_password_no_triple_repeats
-]
+# Rules are read from this file (TOML or JSON, rule types are listed in
+# common/rules.py). An edited file is picked up while the script runs.
+RULES_FILE = "rules.toml"
+# Rows validated together (vectorized with NumPy when it is installed,
+# see common/batch_rules.py); an edited rules file is picked up between
+# batches
+BATCH_ROWS = 10_000
 
 # -----------------------------
-# Validation engine
+# CSV processing
 # -----------------------------
 
-def is_password_ok(password, rules):
+def write_batch(batch, passwords, password_rules, valid_writer, invalid_writer, summary):
     """
-    Apply validation rules to a password.
-
-    Returns:
-        (bool, str): Validation result and error message (if any)
+    Validate a batch of passwords and write each row to the matching output.
+    Every row is counted in summary.
     """
-    for rule in rules:
-        passed, message = rule(password)
-        if not passed:
-            return False, message
-    return True, ""
+    failures = password_rules.evaluate(passwords)
+    for (row_number, row), failure in zip(batch, failures):
+        if failure is None:
+            summary.add_row(row_number, [])
+            valid_writer.writerow(row)
+        else:
+            summary.add_row(row_number, [("password", failure[0], failure[1])], row)
+            row["error"] = failure[1]
+            invalid_writer.writerow(row)
 
-# -----------------------------
-# CSV processing
-# -----------------------------
 
 try:
-    with open(INPUT_FILE, "r", newline="") as file, \
-         open(OUTPUT_VALID, "w", newline="") as valid_file, \
-         open(OUTPUT_INVALID, "w", newline="") as invalid_file:
-
-        reader = csv.DictReader(file)
+    rule_config = RuleConfig(RULES_FILE)
+    password_rules = BatchFieldRules(rule_config.rules["password"])
+    summary = ErrorSummary()
 
-        # Writers for valid and invalid records
-        valid_writer = csv.DictWriter(valid_file, fieldnames=["username","password","email"])
-        invalid_writer = csv.DictWriter(invalid_file, fieldnames=["username","password","email","error"])
+    # Input reader plus writers for valid and invalid records
+    with CsvInput(INPUT_FILE) as reader, \
+         open_sink(OUTPUT_VALID, fieldnames=["username","password","email"]) as valid_writer, \
+         open_sink(OUTPUT_INVALID, fieldnames=["username","password","email","error"],
+                   dictionary_columns=["error"]) as invalid_writer:
 
         valid_writer.writeheader()
         invalid_writer.writeheader()
 
-        for row in reader:
+        batch = []
+        passwords = []
+        # Row numbers start at 2 because line 1 is the header
+        for row_number, row in enumerate(reader, start=2):
             try:
                 password = row["password"]
             except KeyError:
                 print("Row missing 'password' key. Skipping row.")
                 continue
 
-            is_valid, error = is_password_ok(password, password_rules)
+            batch.append((row_number, row))
+            passwords.append(password)
+            if len(batch) == BATCH_ROWS:
+                write_batch(batch, passwords, password_rules, valid_writer, invalid_writer, summary)
+                batch = []
+                passwords = []
+                # Rows in flight keep the rule set they started with; a newer
+                # rules file is only swapped in between batches
+                if rule_config.reload_if_changed():
+                    password_rules = BatchFieldRules(rule_config.rules["password"])
+
+        write_batch(batch, passwords, password_rules, valid_writer, invalid_writer, summary)
 
-            if is_valid:
-                valid_writer.writerow(row)
-            else:
-                row["error"] = error
-                invalid_writer.writerow(row)
+    summary.write(ERROR_SUMMARY_OUTPUT)
 
 except FileNotFoundError as e:
     print("File not found:", e)
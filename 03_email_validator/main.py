@@ -2,7 +2,7 @@
 Email Validator (CSV-based)
 
 Reads emails from a CSV file and validates them
-according to predefined rules.
+according to the rules in rules.toml.
 
 Valid records are written to a separate CSV file.
 Invalid records are written to another CSV file along with
@@ -11,112 +11,105 @@ the validation error message.
 Designed as a beginner-friendly portfolio project.
 """
 
-import csv
+import os
+import sys
+
+# Make the shared helpers in the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.dedup import DuplicateIndex, normalize_email
+from common.error_summary import ErrorSummary
+from common.rules import RuleConfig
+from common.sinks import open_sink
+from common.sources import CsvInput
 
 # -----------------------------
 # Configuration: input/output
 # -----------------------------
 
+# INPUT_FILE may also be a folder or a glob such as 'exports/*.csv.gz'
 INPUT_FILE = "sample_input.csv"
+# Output format follows the file extension:
+# .csv, .csv.gz, .csv.zst, .jsonl, .parquet, .arrow or .sqlite (see common/sinks.py)
 VALID_OUTPUT = "valid_records.csv"
 INVALID_OUTPUT = "invalid_records.csv"
+# Rejections per rule, with example rows (see common/error_summary.py)
+ERROR_SUMMARY_OUTPUT = "error_summary.csv"
 
-# -----------------------------
-# Email validation rules
-# -----------------------------
-
-def rule_email_only_safe_chars(value):
-    """Email may only contain letters, digits, and . _ - @"""
-    allowed = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._-@"
-    for char in value:
-        if char not in allowed:
-            return False, f"contains invalid character '{char}'"
-    return True, ""
-
-def valid_email_format(value):
-    """Check email format: one @, valid local and domain parts, valid TLD"""
-    if value.count('@') != 1:
-        return False, "must contain exactly one '@'"
-    if " " in value:
-        return False, "email cannot contain spaces"
-
-    local, _, domain = value.partition('@')
-    if not local:
-        return False, "no characters before '@'"
-    if "." not in domain:
-        return False, "no '.' in domain part"
-    if domain.startswith('.') or domain.endswith('.'):
-        return False, "domain starts or ends with '.'"
-    if local.startswith('.') or local.endswith('.'):
-        return False, "local part starts or ends with '.'"
-    if '..' in domain:
-        return False, "domain has consecutive dots"
-    if '..' in local:
-        return False, "local part has consecutive dots"
-    tld = domain.split(".")[-1]
-    if len(tld) < 2:
-        return False, "TLD too short"
-    if not tld.isalpha():
-        return False, "TLD can only contain alphabets"
-
-    return True, ""
-
-# List of rules applied in order
-email_rules = [rule_email_only_safe_chars, valid_email_format]
+# Rules are read from this file (TOML or JSON, rule types are listed in
+# common/rules.py). An edited file is picked up while the script runs.
+RULES_FILE = "rules.toml"
+# Rows checked with one rule set before looking for an edited rules file
+RELOAD_CHECK_ROWS = 1000
 
 # -----------------------------
-# Validation engine
+# Duplicate detection
 # -----------------------------
 
-def is_email_ok(email, rules):
+seen_emails = DuplicateIndex()
+
+def duplicate_failure(email, row_number):
     """
-    Apply validation rules to an email.
+    Check an email against the valid emails from earlier rows.
+    Emails are compared case-insensitively.
 
     Returns:
-        (bool, str | None): Validation result and error message (if any)
+        (str, str) | None: Rule name and error message, or None if the
+        email is unique
     """
-    for rule in rules:
-        passed, message = rule(email)
-        if not passed:
-            return False, message
-    return True, None
+    first_row = seen_emails.check(normalize_email(email), row_number)
+    if first_row is not None:
+        return "duplicate", f"duplicate of row {first_row}"
+    return None
 
 # -----------------------------
 # CSV processing
 # -----------------------------
 
 try:
-    with open(INPUT_FILE, "r", newline="") as file, \
-         open(VALID_OUTPUT, "w", newline="") as valid_file, \
-         open(INVALID_OUTPUT, "w", newline="") as invalid_file:
+    rule_config = RuleConfig(RULES_FILE)
+    rules = rule_config.rules
+    summary = ErrorSummary()
 
-        reader = csv.DictReader(file)
-        valid_fieldnames = ["username","password","email"]
-        invalid_fieldnames = ["username","password","email","error"]
+    valid_fieldnames = ["username","password","email"]
+    invalid_fieldnames = ["username","password","email","error"]
 
-        valid_writer = csv.DictWriter(valid_file, fieldnames=valid_fieldnames)
-        invalid_writer = csv.DictWriter(invalid_file, fieldnames=invalid_fieldnames)
+    with CsvInput(INPUT_FILE) as reader, \
+         open_sink(VALID_OUTPUT, fieldnames=valid_fieldnames) as valid_writer, \
+         open_sink(INVALID_OUTPUT, fieldnames=invalid_fieldnames,
+                   dictionary_columns=["error"]) as invalid_writer:
 
         # Write headers
         valid_writer.writeheader()
         invalid_writer.writeheader()
 
-        # Process each row
-        for row in reader:
+        # Process each row (line 1 is the header)
+        for row_number, row in enumerate(reader, start=2):
+            # Rows in flight keep the rule set they started with; a newer
+            # rules file is only swapped in between batches
+            if row_number % RELOAD_CHECK_ROWS == 0 and rule_config.reload_if_changed():
+                rules = rule_config.rules
+
             try:
                 email = row["email"]
             except KeyError:
                 print("Row missing 'email' key. Skipping row.")
                 continue
 
-            is_valid, error = is_email_ok(email, email_rules)
+            failure = rules["email"].first_failure(email)
+            if failure is None:
+                failure = duplicate_failure(email, row_number)
 
-            if is_valid:
+            if failure is None:
+                summary.add_row(row_number, [])
                 valid_writer.writerow(row)
             else:
-                row["error"] = error
+                summary.add_row(row_number, [("email", failure[0], failure[1])], row)
+                row["error"] = failure[1]
                 invalid_writer.writerow(row)
 
+    summary.write(ERROR_SUMMARY_OUTPUT)
+
 except FileNotFoundError as e:
     print("File not found:", e)
 except PermissionError as e:
@@ -126,4 +119,5 @@ except Exception as e:
 else:
     print("Email validation completed successfully.")
 finally:
+    seen_emails.close()
     print("Validation attempt finished.")
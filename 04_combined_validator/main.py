@@ -1,250 +1,278 @@
 """
 Combined Validator (CSV-based)
 
-Validates usernames, passwords, and emails from a CSV file.
+Validates usernames, passwords, and emails from a CSV file
+with the rules in rules.toml.
 Writes valid records to one CSV and invalid records (with errors) to another.
 """
 
 import csv
+import os
+import sys
+
+# Make the shared helpers in the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.dedup import DuplicateIndex, NearDuplicateIndex, normalize_email
+from common.error_summary import ErrorSummary
+from common.rules import RuleConfig
+from common.sinks import open_sink
+from common.sampling import SAMPLE_BLOCKS, add_sample_arguments, estimate_shares, format_share, sample_input
+from common.sources import CsvInput, expand_inputs, open_compressed
+from common.spool import atomic_outputs, run_spool, spool_stem, watch_argument_parser
 
 # -----------------------------
 # Configuration: input/output
 # -----------------------------
+# INPUT_FILE may also be a folder or a glob such as 'exports/*.csv.gz'
 INPUT_FILE = "sample_input.csv"
+# Output format follows the file extension:
+# .csv, .csv.gz, .csv.zst, .jsonl, .parquet, .arrow or .sqlite (see common/sinks.py)
 VALID_OUTPUT = "valid_records.csv"
 INVALID_OUTPUT = "nvalid_records.csv"
+# Rejections per field and rule, with co-occurring errors and example rows
+ERROR_SUMMARY_OUTPUT = "error_summary.csv"
+
+# Rules are read from this file (TOML or JSON, rule types are listed in
+# common/rules.py). An edited file is picked up while the script runs.
+RULES_FILE = "rules.toml"
+# Rows checked with one rule set before looking for an edited rules file
+RELOAD_CHECK_ROWS = 1000
 
 
 # -----------------------------
-# Rule functions
+# Duplicate detection
 # -----------------------------
+def duplicate_errors(row, row_number, exact_usernames, similar_usernames, seen_emails):
+    """
+    Return (field, rule, message) for a username/email already used in an earlier valid row.
+
+    The row's keys are only recorded when it has no duplicate errors, so a
+    rejected row never causes later rows to be flagged.
+    """
+    errors = []
+    username = row["username"]
+    email = normalize_email(row["email"])
+
+    first_row = exact_usernames.find(username.casefold())
+    if first_row is not None:
+        errors.append(("username", "duplicate", f"duplicate of row {first_row}"))
+    else:
+        earlier = similar_usernames.find(username)
+        if earlier is not None:
+            errors.append(("username", "too_similar",
+                           f"too similar to '{earlier[0]}' (row {earlier[1]})"))
+
+    first_row = seen_emails.find(email)
+    if first_row is not None:
+        errors.append(("email", "duplicate", f"duplicate of row {first_row}"))
+
+    if not errors:
+        exact_usernames.add(username.casefold(), row_number)
+        similar_usernames.add(username, row_number)
+        seen_emails.add(email, row_number)
+    return errors
 
-def rule_not_empty(value, field):
-    """Check that a field is not empty."""
-    if not value:
-        return False, "cannot be empty"
-    return True, ""
 
+# -----------------------------
+# Rules
+# -----------------------------
+# Loaded once per process, so a daemon worker does not re-read the file
+# for every input; later calls pick up an edited rules file
+rule_config = None
 
-# --- Username rules ---
-def rule_username_min_length(value):
-    """Username must be at least 5 characters."""
-    if len(value) < 5:
-        return False, "must be at least 5 characters"
-    return True, ""
 
+def load_rule_config():
+    """Returns the RuleConfig for RULES_FILE, reloading it if it changed."""
+    global rule_config
+    if rule_config is None:
+        rule_config = RuleConfig(RULES_FILE)
+    else:
+        rule_config.reload_if_changed()
+    return rule_config
 
-def rule_username_no_spaces(value):
-    """Username must not contain spaces."""
-    for char in value:
-        if char.isspace():
-            return False, "no spaces allowed"
-    return True, ""
-
-
-def rule_username_starts_with_letter(value):
-    """Username must start with a letter."""
-    if not value[0].isalpha():
-        return False, "must start with a letter"
-    return True, ""
-
-
-def rule_username_no_double_underscores(value):
-    """Username must not contain double underscores."""
-    if "__" in value:
-        return False, "double underscore not allowed"
-    return True, ""
-
-
-def rule_username_only_safe_chars(value):
-    """Username may only contain letters, digits, dots, and hyphens."""
-    safe_chars = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890.-"
-    for char in value:
-        if char not in safe_chars:
-            return False, f"invalid character {char}"
-    return True, ""
-
-
-username_rules = [
-    lambda v: rule_not_empty(v, "username"),
-    rule_username_min_length,
-    rule_username_no_spaces,
-    rule_username_starts_with_letter,
-    rule_username_only_safe_chars,
-    rule_username_no_double_underscores
-]
-
-
-# --- Password rules ---
-def rule_password_min_length(value):
-    """Password must be at least 5 characters."""
-    if len(value) < 5:
-        return False, "must be at least 5 characters"
-    return True, ""
-
-
-def rule_password_no_space(value):
-    """Password must not contain spaces."""
-    if " " in value:
-        return False, "no spaces allowed"
-    return True, ""
-
-
-def rule_password_only_safe_chars(value):
-    """Password may only contain letters, digits, and safe symbols."""
-    safe_chars = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890!#$%^&*()-"
-    for char in value:
-        if char not in safe_chars:
-            return False, f"invalid character | {char}"
-    return True, ""
-
-
-def rule_password_no_triple_repeats(value):
-    """Password must not have three repeated characters consecutively."""
-    for i in range(len(value) - 2):
-        if value[i] == value[i+1] == value[i+2]:
-            return False, "cannot have three repeated characters consecutively"
-    return True, ""
-
-
-def rule_password_has_uppercase(value):
-    """Password must contain at least one uppercase letter."""
-    for ch in value:
-        if ch.isupper():
-            return True, ""
-    return False, "must have an uppercase character"
-
-
-def rule_password_has_digit(value):
-    """Password must contain at least one digit."""
-    for ch in value:
-        if ch.isdigit():
-            return True, ""
-    return False, "must have at least one digit"
-
-
-password_rules = [
-    lambda v: rule_not_empty(v, "password"),
-    rule_password_min_length,
-    rule_password_no_space,
-    rule_password_only_safe_chars,
-    rule_password_has_digit,
-    rule_password_has_uppercase,
-    rule_password_no_triple_repeats
-]
-
-
-# --- Email rules ---
-def valid_email_format(value):
-    """Check standard email formatting rules."""
-    if value.count('@') != 1:
-        return False, "must contain exactly one '@'"
-    if " " in value:
-        return False, "email cannot contain spaces"
-
-    local, _, domain = value.partition('@')
-    if not local:
-        return False, "no characters before '@'"
-    if "." not in domain:
-        return False, "no '.' in domain part"
-    if domain.startswith('.') or domain.endswith('.'):
-        return False, "domain cannot start or end with '.'"
-    if local.startswith(".") or local.endswith("."):
-        return False, "local cannot start or end with '.'"
-    if '..' in domain:
-        return False, "domain has consecutive dots"
-    if ".." in local:
-        return False, "local has consecutive dots"
-
-    tld = domain.split(".")[-1]
-    if len(tld) < 2:
-        return False, "TLD too short"
-    if not tld.isalpha():
-        return False, "TLD can only contain letters"
-
-    return True, ""
-
-
-def rule_email_only_safe_chars(value):
-    """Email may only contain letters, digits, and safe symbols."""
-    allowed = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._-@"
-    for char in value:
-        if char not in allowed:
-            return False, f"contains invalid character {char}"
-    return True, ""
-
-
-email_rules = [
-    lambda v: rule_not_empty(v, "email"),
-    rule_email_only_safe_chars,
-    valid_email_format
-]
 
+def rule_errors(row, rules):
+    """Return one (field, rule, message) error per field that fails its rules."""
+    errors = []
+    for field in ("username", "password", "email"):
+        failure = rules[field].first_failure(row[field])
+        if failure is not None:
+            errors.append((field, failure[0], failure[1]))
+    return errors
 
-# -----------------------------
-# Validation engine
-# -----------------------------
-def is_field_ok(field, rules):
-    """Apply rules to a field; return True and None if all pass."""
-    for rule in rules:
-        passed, message = rule(field)
-        if not passed:
-            return False, message
-    return True, None
+
+def error_text(errors):
+    """Join errors into the "field: message | ..." text of the error column."""
+    return " | ".join(f"{field}: {message}" for field, _, message in errors)
 
 
 # -----------------------------
 # CSV processing
 # -----------------------------
-try:
-    with open(INPUT_FILE, "r", newline="") as file, \
-         open(VALID_OUTPUT, "w", newline="") as valid_file, \
-         open(INVALID_OUTPUT, "w", newline="") as invalid_file:
+def validate_file(input_file=INPUT_FILE, valid_output=VALID_OUTPUT, invalid_output=INVALID_OUTPUT,
+                  summary_output=ERROR_SUMMARY_OUTPUT):
+    """
+    Validate every row of a CSV file and write valid and invalid records,
+    plus a summary of the errors found.
+
+    Returns:
+        (int, int) | None: Valid and invalid row counts, or None if the
+        file could not be validated.
+    """
+    exact_usernames = DuplicateIndex()
+    similar_usernames = NearDuplicateIndex()
+    seen_emails = DuplicateIndex()
+    summary = ErrorSummary()
+    valid_count = invalid_count = 0
+
+    try:
+        config = load_rule_config()
+        rules = config.rules
 
         valid_fieldnames = ["username", "password", "email"]
         invalid_fieldnames = ["username", "password", "email", "error"]
         required_fields = ["username", "password", "email"]
 
-        reader = csv.DictReader(file)
-        valid_writer = csv.DictWriter(valid_file, fieldnames=valid_fieldnames)
-        invalid_writer = csv.DictWriter(invalid_file, fieldnames=invalid_fieldnames)
-
-        # Check if all required columns exist
-        missing_headers = [field for field in required_fields if field not in reader.fieldnames]
-        if missing_headers:
-            raise ValueError(f"CSV is missing required columns: {missing_headers}")
-
-        # Write CSV headers
-        valid_writer.writeheader()
-        invalid_writer.writeheader()
-
-        # Process each row
-        for row in reader:
-            is_username_valid, username_error = is_field_ok(row["username"], username_rules)
-            is_password_valid, password_error = is_field_ok(row["password"], password_rules)
-            is_email_valid, email_error = is_field_ok(row["email"], email_rules)
-
-            if is_username_valid and is_password_valid and is_email_valid:
-                valid_writer.writerow(row)
-            else:
-                errors = []
-                if username_error:
-                    errors.append(f"username: {username_error}")
-                if password_error:
-                    errors.append(f"password: {password_error}")
-                if email_error:
-                    errors.append(f"email: {email_error}")
-
-                row["error"] = " | ".join(errors)
-                invalid_writer.writerow(row)
-
-except FileNotFoundError as e:
-    print("File not found:", e)
-except PermissionError as e:
-    print("Permission denied:", e)
-except Exception as e:
-    print("Unexpected error:", e)
-else:
-    print("Validation completed successfully.")
-finally:
-    print("Validation attempt finished.")
+        with CsvInput(input_file) as reader, \
+             open_sink(valid_output, fieldnames=valid_fieldnames) as valid_writer, \
+             open_sink(invalid_output, fieldnames=invalid_fieldnames,
+                       dictionary_columns=["error"]) as invalid_writer:
+
+            # Check if all required columns exist
+            missing_headers = [field for field in required_fields if field not in reader.fieldnames]
+            if missing_headers:
+                raise ValueError(f"CSV is missing required columns: {missing_headers}")
+
+            # Write CSV headers
+            valid_writer.writeheader()
+            invalid_writer.writeheader()
+
+            # Process each row (line 1 is the header)
+            for row_number, row in enumerate(reader, start=2):
+                # Rows in flight keep the rule set they started with; a newer
+                # rules file is only swapped in between batches
+                if row_number % RELOAD_CHECK_ROWS == 0 and config.reload_if_changed():
+                    rules = config.rules
+
+                errors = rule_errors(row, rules)
+                if not errors:
+                    errors = duplicate_errors(row, row_number, exact_usernames,
+                                              similar_usernames, seen_emails)
+
+                summary.add_row(row_number, errors, row)
+                if not errors:
+                    valid_writer.writerow(row)
+                    valid_count += 1
+                else:
+                    row["error"] = error_text(errors)
+                    invalid_writer.writerow(row)
+                    invalid_count += 1
+
+        summary.write(summary_output)
+
+    except FileNotFoundError as e:
+        print("File not found:", e)
+    except PermissionError as e:
+        print("Permission denied:", e)
+    except Exception as e:
+        print("Unexpected error:", e)
+    else:
+        print("Validation completed successfully.")
+        return valid_count, invalid_count
+    finally:
+        exact_usernames.close()
+        similar_usernames.close()
+        seen_emails.close()
+        print("Validation attempt finished.")
+    return None
+
+
+def validate_spool_file(path, output_dir):
+    """
+    Daemon job: validates one spooled file into output_dir.
+
+    Writes <name>.valid.csv, <name>.invalid.csv and <name>.errors.csv;
+    each appears only once the whole file has been validated.
+
+    Returns:
+        int: Rows validated.
+    """
+    name = spool_stem(path)
+    outputs = [
+        os.path.join(output_dir, f"{name}.valid.csv"),
+        os.path.join(output_dir, f"{name}.invalid.csv"),
+        os.path.join(output_dir, f"{name}.errors.csv"),
+    ]
+    with atomic_outputs(outputs) as (valid_output, invalid_output, summary_output):
+        counts = validate_file(path, valid_output, invalid_output, summary_output)
+        if counts is None:
+            raise RuntimeError(f"could not validate {path}")
+    return sum(counts)
+
+
+# -----------------------------
+# Sample mode
+# -----------------------------
+def estimate_error_rates(input_file=INPUT_FILE, blocks=SAMPLE_BLOCKS, seed=None):
+    """
+    Estimate the invalid-row rate per error type from a sample of the file.
+
+    Rows are checked with the same rules as a full run. Duplicates can
+    only be found by looking at every earlier row, so they are not
+    estimated.
+    """
+    try:
+        with open_compressed(expand_inputs(input_file)[0]) as file:
+            fieldnames = next(csv.reader([file.readline()]))
+        sample = sample_input(input_file, blocks, seed=seed, skip_header=True)
+        rules = load_rule_config().rules
+    except (FileNotFoundError, PermissionError, ValueError) as e:
+        print("Cannot sample input:", e)
+        return
+
+    block_counts = []
+    block_sizes = []
+    for block in sample.blocks:
+        counts = {}
+        size = 0
+        for row in csv.DictReader(block, fieldnames=fieldnames):
+            # A row cut short (e.g. a quoted newline at the block edge) is skipped
+            if None in row.values():
+                continue
+            size += 1
+            errors = rule_errors(row, rules)
+            if errors:
+                counts["invalid"] = counts.get("invalid", 0) + 1
+            for field, _, message in errors:
+                error = f"{field}: {message}"
+                counts[error] = counts.get(error, 0) + 1
+        block_counts.append(counts)
+        block_sizes.append(size)
+
+    shares = estimate_shares(block_counts, block_sizes, exact=sample.exact)
+    sampled_rows = sum(block_sizes)
+    total_rows = sample.total_lines
+    estimate = "" if sample.exact else "~"
+
+    print("\nSample Report")
+    print("---------------------")
+    print(f"Rows checked: {sampled_rows} of {estimate}{total_rows} ({len(block_sizes)} blocks)")
+    invalid = shares.pop("invalid", (0.0, 0.0, 0.0))
+    print(f"Invalid rows: {format_share(*invalid)}, {estimate}{round(invalid[0] * total_rows)} rows")
+    print("Errors (share of rows):")
+    for error, share in sorted(shares.items(), key=lambda item: (-item[1][0], item[0])):
+        print(f"  {error}: {format_share(*share)}")
+    print("Duplicates are not estimated; they need a full run.")
+
+
+if __name__ == "__main__":
+    parser = watch_argument_parser("Validate usernames, passwords and emails in a CSV file.")
+    args = add_sample_arguments(parser).parse_args()
+    if args.watch:
+        run_spool(args.watch, validate_spool_file, args.output, args.done, args.failed,
+                  workers=args.workers, once=args.once)
+    elif args.sample:
+        estimate_error_rates(INPUT_FILE, args.sample_blocks, args.seed)
+    else:
+        validate_file()
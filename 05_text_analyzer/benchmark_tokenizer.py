@@ -0,0 +1,91 @@
+"""
+Tokenizer Benchmark
+
+Compares the original character-by-character clean_text loop with the
+translate-based tokenizer modes in tokenizer.py.
+
+A sample file of the requested size is generated by repeating
+sample.txt. The original loop is only timed on the first few megabytes
+(it is far too slow for a full gigabyte) and its speed is reported in
+MB/s so the numbers can be compared directly.
+
+Usage:
+    python3 benchmark_tokenizer.py --size-mb 1024
+"""
+
+import argparse
+import os
+import string
+import tempfile
+import time
+
+from tokenizer import iter_tokens, iter_tokens_bytes
+
+
+def original_clean_text(text):
+    """The clean_text implementation the tokenizer replaced."""
+    text = text.lower()
+    cleaned = ""
+
+    for ch in text:
+        if ch not in string.punctuation:
+            cleaned += ch
+
+    return " ".join(cleaned.split())
+
+
+def make_input(path, size_mb, source="sample.txt"):
+    """Writes roughly `size_mb` megabytes of text by repeating the sample file."""
+    with open(source, "r", encoding="utf-8") as file:
+        block = file.read()
+
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as file:
+        while written < target:
+            file.write(block)
+            written += len(block.encode("utf-8"))
+    return written
+
+
+def timed(label, size_bytes, func):
+    """Runs func(), prints throughput, and returns the number of tokens."""
+    start = time.perf_counter()
+    tokens = func()
+    elapsed = time.perf_counter() - start
+    speed = size_bytes / (1024 * 1024) / elapsed if elapsed else float("inf")
+    print(f"{label:<28} {elapsed:9.2f} s   {speed:9.1f} MB/s   {tokens} tokens")
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=1024, help="size of the generated input")
+    parser.add_argument("--baseline-mb", type=int, default=5, help="input size for the original loop")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bench.txt")
+        size = make_input(path, args.size_mb)
+        print(f"Input: {size / (1024 * 1024):.0f} MB\n")
+
+        with open(path, "r", encoding="utf-8") as file:
+            baseline = file.read(args.baseline_mb * 1024 * 1024)
+        baseline_size = len(baseline.encode("utf-8"))
+        timed("original loop (baseline)", baseline_size, lambda: len(original_clean_text(baseline).split()))
+
+        def run_text(mode):
+            with open(path, "r", encoding="utf-8") as file:
+                return sum(1 for _ in iter_tokens(file, mode))
+
+        def run_bytes():
+            with open(path, "rb") as file:
+                return sum(1 for _ in iter_tokens_bytes(file))
+
+        timed("translate, ascii", size, lambda: run_text("ascii"))
+        timed("translate, unicode", size, lambda: run_text("unicode"))
+        timed("bytes.translate", size, run_bytes)
+
+
+if __name__ == "__main__":
+    main()
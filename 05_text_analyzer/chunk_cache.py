@@ -0,0 +1,166 @@
+"""
+Chunk Cache
+
+Incremental re-analysis of large, slowly changing documents. The text
+is cut into content-defined chunks, each chunk's partial results are
+cached on disk under a hash of its content, and a re-run only analyzes
+chunks it has not seen before; the rest are loaded and merged.
+
+Chunking:
+- Chunks are whole lines, so no word is ever split. A chunk ends after
+  a line whose CRC-32 has its low bits zero (1 line in CHUNK_LINE_ODDS),
+  once the chunk has at least MIN_CHUNK_CHARS; it is cut at
+  MAX_CHUNK_CHARS regardless.
+- Boundaries depend only on nearby content, not on offsets, so an
+  edited paragraph changes the chunk it is in (and at most the next
+  one); every other chunk keeps its hash and its cached results.
+
+A cached chunk holds its line, sentence and character counts, word
+frequencies and shortest/longest word, which merge exactly: counts add
+up, frequencies are merged in chunk order (so words keep their
+first-seen order), and a later chunk's shortest or longest word only
+wins if it is strictly shorter or longer. N-gram counts are not cached:
+nearly every trigram of a chunk is unique to it, so loading and merging
+them costs as much as counting them again.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import zlib
+
+# A chunk may end after a line whose CRC-32 is a multiple of this
+CHUNK_LINE_ODDS = 64
+
+# Chunk size limits, in characters
+MIN_CHUNK_CHARS = 256 * 1024
+MAX_CHUNK_CHARS = 4 * 1024 * 1024
+
+# Bump when the cached format or the per-chunk analysis changes
+CACHE_VERSION = 1
+
+
+def iter_chunks(lines):
+    """
+    Groups lines into content-defined chunks.
+
+    Args:
+        lines (iterable): Lines including their line endings.
+
+    Yields:
+        str: Chunk text (whole lines).
+    """
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size < MIN_CHUNK_CHARS:
+            continue
+        if size >= MAX_CHUNK_CHARS or zlib.crc32(line.encode("utf-8")) % CHUNK_LINE_ODDS == 0:
+            yield "".join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def cache_folder(root, path):
+    """Cache folder for one input (each input keeps its own chunks)."""
+    return os.path.join(root, re.sub(r"[^\w.-]", "_", os.path.abspath(path)).strip("_"))
+
+
+class ChunkCache:
+    """
+    Per-chunk results of one input, stored as gzipped JSON files named
+    after the chunk's content hash.
+    """
+
+    def __init__(self, folder, mode):
+        self.folder = folder
+        self.mode = mode
+        self.used = set()
+        self.reused = 0
+        self.analyzed = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, text):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{CACHE_VERSION}:{self.mode}:".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def load(self, key):
+        """Returns a cached chunk, or None if missing or unreadable."""
+        try:
+            with gzip.open(os.path.join(self.folder, f"{key}.json.gz"), "rt", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key, result):
+        # Written under a temporary name first, so an interrupted run
+        # never leaves a half-written chunk behind
+        path = os.path.join(self.folder, f"{key}.json.gz")
+        temp_path = path + ".tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=1) as file:
+            json.dump(result, file)
+        os.replace(temp_path, path)
+
+    def results(self, lines, analyze_chunk):
+        """
+        Yields the results of every chunk of the input, in order.
+
+        Args:
+            lines (iterable): Input lines including their line endings.
+            analyze_chunk (callable): text -> result dictionary, used for
+                chunks that are not in the cache.
+        """
+        for text in iter_chunks(lines):
+            key = self.key(text)
+            self.used.add(key)
+            result = self.load(key)
+            if result is None:
+                result = analyze_chunk(text)
+                self.store(key, result)
+                self.analyzed += 1
+            else:
+                self.reused += 1
+            yield result
+
+    def remove_unused(self):
+        """Deletes cached chunks that are no longer part of the input."""
+        for name in os.listdir(self.folder):
+            if name.split(".")[0] not in self.used:
+                os.remove(os.path.join(self.folder, name))
+
+
+def merge_results(results):
+    """
+    Merges chunk results (in input order) into whole-input results.
+
+    Returns:
+        dict: Summed counts, frequency (in first-seen order), and the
+        shortest and longest word.
+    """
+    merged = {"lines": 0, "sentences": 0, "chars": 0, "chars_no_space": 0, "words": 0,
+              "shortest": None, "longest": None}
+    frequency = {}
+
+    for result in results:
+        for name in ("lines", "sentences", "chars", "chars_no_space", "words"):
+            merged[name] += result[name]
+        for word, count in result["frequency"].items():
+            frequency[word] = frequency.get(word, 0) + count
+
+        # Strict comparisons keep the earlier word, like a single pass
+        shortest, longest = result["shortest"], result["longest"]
+        if shortest is not None and (merged["shortest"] is None or len(shortest) < len(merged["shortest"])):
+            merged["shortest"] = shortest
+        if longest is not None and (merged["longest"] is None or len(longest) > len(merged["longest"])):
+            merged["longest"] = longest
+
+    merged["frequency"] = frequency
+    return merged
@@ -0,0 +1,398 @@
+"""
+Inverted Index
+
+Builds an on-disk word -> (line, position) index while the text is
+analyzed, and answers term, phrase, and prefix queries from it without
+reading the document again.
+
+Index folder layout:
+
+- postings.bin   every word's postings, one after another. A posting is
+                 (line delta, word position) written as varints, so
+                 common words on nearby lines take one or two bytes.
+- terms.tsv      sorted "word <tab> offset <tab> length <tab> count"
+                 lines pointing into postings.bin
+- lines.bin      byte offset of each line in the source file (only
+                 when the source is a single uncompressed file), used to
+                 print matching lines
+- meta.json      source path and line count
+
+With a memory budget (``--max-memory``) the builder writes its postings
+to disk as runs sorted by word whenever the budget is exceeded, and
+``write`` merges the runs, joining each word's postings back into one
+list (see common/memory.py).
+"""
+
+import json
+import mmap
+import os
+from array import array
+from operator import itemgetter
+
+from common.memory import SpillRuns, SpillTrigger
+from tokenizer import normalize
+
+
+def encode_varint(value, out):
+    """Appends an unsigned int to a bytearray using 7 bits per byte."""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, start=0):
+    """
+    Reads one varint.
+
+    Returns:
+        tuple: (value, offset just past the varint)
+    """
+    value = shift = 0
+    while True:
+        byte = data[start]
+        start += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, start
+        shift += 7
+
+
+def decode_postings(data):
+    """
+    Decodes a postings list.
+
+    Args:
+        data (bytes): Encoded postings for one word.
+
+    Returns:
+        list: (line_number, position) tuples in order.
+    """
+    postings = []
+    numbers = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        numbers.append(value)
+        value = shift = 0
+
+    line = 0
+    for i in range(0, len(numbers), 2):
+        line += numbers[i]
+        postings.append((line, numbers[i + 1]))
+    return postings
+
+
+class IndexBuilder:
+    """
+    Collects postings line by line and writes them to an index folder.
+
+    Postings are varint-encoded as they are added, so the in-memory
+    index is already compressed.
+
+    Args:
+        mode (str): Tokenizer mode (see tokenizer.py).
+        budget (MemoryBudget | None): Spill postings to disk when the
+            process goes over this budget (None keeps them in memory).
+    """
+
+    def __init__(self, mode="ascii", budget=None):
+        self.mode = mode
+        self.postings = {}
+        self.line_count = 0
+        # Postings held in memory since the last spill
+        self.pending = 0
+        self.runs = None
+        self.spill_trigger = None
+        if budget is not None:
+            self.runs = SpillRuns(budget, "index postings", key=itemgetter(0))
+            self.spill_trigger = SpillTrigger(budget)
+
+    def add_line(self, line):
+        """Indexes the words of the next line."""
+        line_number = self.line_count
+        self.line_count += 1
+
+        words = normalize(line, self.mode).split()
+        for position, word in enumerate(words):
+            entry = self.postings.get(word)
+            if entry is None:
+                entry = self.postings[word] = [bytearray(), 0, 0]
+            data, last_line, _ = entry
+            encode_varint(line_number - last_line, data)
+            encode_varint(position, data)
+            entry[1] = line_number
+            entry[2] += 1
+
+        self.pending += len(words)
+        if self.spill_trigger is not None and self.spill_trigger(self.pending, len(words)):
+            self.spill()
+
+    def sorted_postings(self):
+        """The postings in memory as (word, data, last_line, count), sorted by word."""
+        return [(word, bytes(data), last_line, count)
+                for word, (data, last_line, count) in sorted(self.postings.items())]
+
+    def spill(self):
+        """Writes the postings held in memory to disk as one sorted run."""
+        self.runs.spill(self.sorted_postings())
+        self.postings = {}
+        self.pending = 0
+
+    def finish(self):
+        """
+        Moves the postings still in memory to disk once every line is
+        indexed, if the postings have spilled before.
+        """
+        if self.runs is not None and self.runs.paths and self.postings:
+            self.spill()
+
+    def merged_postings(self):
+        """
+        Yields (word, data, count) for every word in sorted order,
+        joining the parts of a word's postings from different runs.
+        """
+        self.finish()
+        if self.runs is None or not self.runs.paths:
+            for word, data, _, count in self.sorted_postings():
+                yield word, data, count
+            return
+
+        current = None
+        for word, data, last_line, count in self.runs.merge(self.sorted_postings()):
+            if current is not None and current[0] == word:
+                # A later part starts with its first line as a delta
+                # from line 0; make it a delta from the previous part
+                first_line, start = decode_varint(data)
+                encode_varint(first_line - current[2], current[1])
+                current[1] += data[start:]
+                current[2] = last_line
+                current[3] += count
+            else:
+                if current is not None:
+                    yield current[0], current[1], current[3]
+                current = [word, bytearray(data), last_line, count]
+        if current is not None:
+            yield current[0], current[1], current[3]
+
+    def indexed(self, lines):
+        """Yields the given lines unchanged, indexing each one on the way."""
+        for line in lines:
+            self.add_line(line)
+            yield line
+
+    def write(self, folder, source_path=None):
+        """
+        Writes the index files.
+
+        Args:
+            folder (str): Output folder (created if needed).
+            source_path (str | None): Source text file; line offsets
+                are stored when it is a single plain file.
+
+        Returns:
+            int: Number of distinct words indexed.
+        """
+        os.makedirs(folder, exist_ok=True)
+
+        offset = 0
+        word_count = 0
+        try:
+            with open(os.path.join(folder, "postings.bin"), "wb") as postings_file, \
+                 open(os.path.join(folder, "terms.tsv"), "w", encoding="utf-8") as terms_file:
+                for word, data, count in self.merged_postings():
+                    postings_file.write(data)
+                    terms_file.write(f"{word}\t{offset}\t{len(data)}\t{count}\n")
+                    offset += len(data)
+                    word_count += 1
+        finally:
+            if self.runs is not None:
+                self.runs.close()
+
+        line_offsets = array("Q")
+        if source_path and os.path.isfile(source_path) and not source_path.endswith((".gz", ".bz2", ".xz", ".zst")):
+            position = 0
+            with open(source_path, "rb") as source:
+                for raw_line in source:
+                    line_offsets.append(position)
+                    position += len(raw_line)
+            with open(os.path.join(folder, "lines.bin"), "wb") as lines_file:
+                line_offsets.tofile(lines_file)
+
+        meta = {
+            "source": os.path.abspath(source_path) if line_offsets else None,
+            "lines": self.line_count,
+            "mode": self.mode,
+        }
+        with open(os.path.join(folder, "meta.json"), "w", encoding="utf-8") as meta_file:
+            json.dump(meta, meta_file)
+        return word_count
+
+
+class IndexReader:
+    """
+    Opens an index folder and answers queries against it.
+
+    Nothing is loaded up front: words are found by binary search in the
+    sorted terms.tsv (mapped into memory), and a line's offset is read
+    from lines.bin only when the line is printed, so a single query on
+    a large index starts straight away.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, "meta.json"), encoding="utf-8") as meta_file:
+            self.meta = json.load(meta_file)
+
+        self.terms_file = open(os.path.join(folder, "terms.tsv"), "rb")
+        # mmap cannot map an empty file (an index of an empty text)
+        if os.fstat(self.terms_file.fileno()).st_size:
+            self.terms = mmap.mmap(self.terms_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.terms = b""
+
+        self.postings_file = open(os.path.join(folder, "postings.bin"), "rb")
+
+        self.lines_file = None
+        lines_path = os.path.join(folder, "lines.bin")
+        if self.meta.get("source") and os.path.exists(lines_path):
+            self.lines_file = open(lines_path, "rb")
+
+    def find_term(self, word):
+        """
+        Returns the byte offset in terms.tsv of the first line whose word
+        is not smaller than `word` (the file size if there is none).
+
+        UTF-8 bytes sort like the words they encode, so the search
+        compares bytes without decoding.
+        """
+        key = word.encode("utf-8")
+        terms = self.terms
+        # Lines starting before low hold smaller words; lines starting
+        # at or after high do not. low is always the start of a line.
+        low, high = 0, len(terms)
+        while low < high:
+            middle = (low + high) // 2
+            newline = terms.rfind(b"\n", low, middle)
+            start = newline + 1 if newline >= 0 else low
+            end = terms.find(b"\n", start)
+            if terms[start:terms.find(b"\t", start, end)] < key:
+                low = end + 1
+            else:
+                high = start
+        return low
+
+    def iter_terms(self, position):
+        """Yields (word, offset, length) for the terms.tsv lines from position on."""
+        terms = self.terms
+        while position < len(terms):
+            end = terms.find(b"\n", position)
+            word, offset, length, _ = terms[position:end].split(b"\t")
+            yield word.decode("utf-8"), int(offset), int(length)
+            position = end + 1
+
+    def read_postings(self, offset, length):
+        self.postings_file.seek(offset)
+        return decode_postings(self.postings_file.read(length))
+
+    def postings(self, word):
+        """Returns the (line, position) postings of a word, or []."""
+        for found, offset, length in self.iter_terms(self.find_term(word)):
+            if found == word:
+                return self.read_postings(offset, length)
+            break
+        return []
+
+    def term_lines(self, word):
+        """Returns the sorted line numbers containing a word."""
+        return sorted({line for line, _ in self.postings(word)})
+
+    def prefix_entries(self, prefix):
+        """Yields (word, offset, length) for every indexed word starting with `prefix`."""
+        for entry in self.iter_terms(self.find_term(prefix)):
+            if not entry[0].startswith(prefix):
+                return
+            yield entry
+
+    def prefix_terms(self, prefix):
+        """Returns every indexed word starting with `prefix`."""
+        return [word for word, _, _ in self.prefix_entries(prefix)]
+
+    def prefix_lines(self, prefix):
+        """Returns the sorted line numbers containing a word with this prefix."""
+        lines = set()
+        for _, offset, length in self.prefix_entries(prefix):
+            lines.update(line for line, _ in self.read_postings(offset, length))
+        return sorted(lines)
+
+    def phrase_lines(self, words):
+        """
+        Returns the lines where `words` appear next to each other, in order.
+
+        Args:
+            words (list): Normalized words of the phrase.
+
+        Returns:
+            list: Sorted line numbers.
+        """
+        if not words:
+            return []
+
+        matches = set(self.postings(words[0]))
+        for shift, word in enumerate(words[1:], start=1):
+            following = {(line, position - shift) for line, position in self.postings(word)}
+            matches &= following
+            if not matches:
+                return []
+        return sorted({line for line, _ in matches})
+
+    def query(self, text):
+        """
+        Runs a query string.
+
+        - ``word``            lines containing the word
+        - ``"two words"``     lines containing the exact phrase
+        - ``pre*``            lines containing a word starting with 'pre'
+
+        Returns:
+            list: Sorted line numbers (0-based).
+        """
+        text = text.strip()
+        mode = self.meta.get("mode", "ascii")
+
+        if len(text) > 1 and text.startswith('"') and text.endswith('"'):
+            return self.phrase_lines(normalize(text[1:-1], mode).split())
+
+        if text.endswith("*"):
+            prefix = normalize(text[:-1], mode).strip()
+            return self.prefix_lines(prefix) if prefix else []
+
+        words = normalize(text, mode).split()
+        if len(words) > 1:
+            return self.phrase_lines(words)
+        return self.term_lines(words[0]) if words else []
+
+    def line_text(self, line_number):
+        """Returns the text of a line from the source file, or None."""
+        if self.lines_file is None:
+            return None
+        offsets = array("Q")
+        self.lines_file.seek(line_number * offsets.itemsize)
+        data = self.lines_file.read(offsets.itemsize)
+        if len(data) < offsets.itemsize:
+            return None
+        offsets.frombytes(data)
+        with open(self.meta["source"], "rb") as source:
+            source.seek(offsets[0])
+            return source.readline().decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def close(self):
+        if isinstance(self.terms, mmap.mmap):
+            self.terms.close()
+        self.terms_file.close()
+        self.postings_file.close()
+        if self.lines_file is not None:
+            self.lines_file.close()
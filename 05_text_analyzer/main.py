@@ -5,6 +5,7 @@ Reads a text file and generates a detailed analysis including:
 - Line, word, character, and sentence counts
 - Shortest and longest words
 - Word frequency analysis
+- Bigram/trigram frequency and collocations (PMI)
 - CSV reports for summary, frequency, sorted frequency, and top words
 
 Designed as a portfolio project demonstrating file handling,
@@ -12,14 +13,55 @@ text processing, and CSV report generation.
 """
 
 import csv
-import string
 import os
+import sys
+
+# Make the shared helpers in the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.console import ConsoleReport, add_report_arguments
+from common.memory import MemoryBudget, SpillingCounter, add_memory_argument
+from common.sampling import estimate_shares, format_share, sample_argument_parser, sample_input
+from common.sinks import open_sink
+from common.sources import read_lines
+from chunk_cache import ChunkCache, cache_folder, merge_results
+from inverted_index import IndexBuilder
+from ngrams import NgramCounter, SpillingNgramCounter
+from tokenizer import iter_tokens
+
+# Extension used for the CSV reports: "csv", "csv.gz", "csv.zst",
+# "jsonl", "parquet", "arrow" or "sqlite" (see common/sinks.py)
+OUTPUT_EXTENSION = "csv"
+# Column types of the word and n-gram reports in Parquet/Arrow output
+FREQUENCY_TYPES = {"frequency": "int64"}
+
+# "ascii" removes string.punctuation; "unicode" also removes Unicode
+# punctuation (“ ” — « ») and casefolds (see tokenizer.py)
+TOKENIZER_MODE = "ascii"
+
+# Write an inverted index (word -> lines) for query.py
+BUILD_INDEX = False
+INDEX_FOLDER = "output/index"
+
+# Number of bigrams, trigrams and collocations written to the reports
+TOP_NGRAMS = 20
+
+# Bigrams seen fewer times than this are left out of the collocation report
+MIN_COLLOCATION_COUNT = 3
+
+# Incremental mode (or --incremental): cache per-chunk results here and
+# only analyze the parts of the text that changed since the last run
+# (see chunk_cache.py). N-gram and collocation reports need a full run.
+INCREMENTAL = False
+CHUNK_CACHE_FOLDER = "output/chunk_cache"
 
 
 def get_file_path():
     """
     Prompts the user for a text file path.
 
+    The path may also be a folder or a glob pattern (for example
+    'docs/*.txt.gz'); all matching files are analyzed together.
     If the user presses Enter without providing a path,
     a default sample file path is used.
 
@@ -32,45 +74,24 @@ def get_file_path():
 
 def read_text_file(path):
     """
-    Reads the content of a text file.
+    Reads the lines of one or more (possibly compressed) text files.
+
+    The lines are streamed, so the text is never held in memory as a
+    whole; line endings are translated to '\\n'.
 
     Args:
-        path (str): Path to the text file.
+        path (str): Path, folder, or glob pattern.
 
     Returns:
-        str | None: File content if successful, otherwise None.
+        iterator | None: Lines if the input exists, otherwise None.
     """
     try:
-        with open(path, "r") as file:
-            return file.read()
+        return read_lines(path, newline=None)
     except FileNotFoundError:
         print(f"Error: {path} not found")
         return None
 
 
-def clean_text(text):
-    """
-    Cleans and normalizes text by:
-    - Converting to lowercase
-    - Removing punctuation
-    - Normalizing extra whitespace
-
-    Args:
-        text (str): Raw text content.
-
-    Returns:
-        str: Cleaned text.
-    """
-    text = text.lower()
-    cleaned = ""
-
-    for ch in text:
-        if ch not in string.punctuation:
-            cleaned += ch
-
-    return " ".join(cleaned.split())
-
-
 def count_chars(text):
     """Returns total number of characters including spaces."""
     return len(text)
@@ -91,81 +112,216 @@ def count_sentences(text):
     return sum(1 for ch in text if ch in ["!", ".", "?"])
 
 
-def shortest_longest(text):
+def count_lines(text):
+    """Counts non-empty lines in the text."""
+    lines = text.splitlines()
+    return sum(1 for line in lines if line.strip())
+
+
+def word_statistics(words, ngram_counter=None, frequency=None):
     """
-    Finds the shortest and longest words in the text.
+    Calculates word frequency, word count, and shortest/longest words
+    in a single pass over the words.
 
     Args:
-        text (str): Cleaned text.
+        words (iterable): Cleaned words, e.g. from tokenizer.iter_tokens.
+        ngram_counter (NgramCounter | SpillingNgramCounter | None): If given, bigrams and
+            trigrams are counted in the same pass.
+        frequency (dict | SpillingCounter | None): Counts to add the
+            words to (a new dict if None).
 
     Returns:
-        tuple: (shortest_word, longest_word) or (None, None) if no words exist.
+        tuple: (frequency dict, word_count, shortest_word, longest_word);
+        shortest/longest are None if there are no words.
     """
-    words = text.split()
-    if not words:
-        return None, None
-
-    return min(words, key=len), max(words, key=len)
+    if frequency is None:
+        frequency = {}
+    word_count = 0
+    shortest = longest = None
 
+    for word in words:
+        frequency[word] = frequency.get(word, 0) + 1
+        word_count += 1
 
-def count_lines(text):
-    """Counts non-empty lines in the text."""
-    lines = text.splitlines()
-    return sum(1 for line in lines if line.strip())
+        # Strict comparisons keep the first word of a given length,
+        # the same as min()/max() do
+        if shortest is None or len(word) < len(shortest):
+            shortest = word
+        if longest is None or len(word) > len(longest):
+            longest = word
 
+        if ngram_counter is not None:
+            ngram_counter.add(word)
 
-def count_words(text):
-    """Returns total number of words."""
-    return len(text.split())
+    return frequency, word_count, shortest, longest
 
 
-def word_frequency(text):
+def stream_lines(lines, totals):
     """
-    Calculates frequency of each word in cleaned text.
+    Yields the lines of the text without their newlines (the same lines
+    as splitting the whole text on newlines), adding the line, sentence
+    and character counts to totals on the way.
 
     Args:
-        text (str): Cleaned text.
+        lines (iterable): Input lines including their line endings.
+        totals (dict): Receives "lines", "sentences", "chars" and
+            "chars_no_space" (complete once the lines are consumed).
+    """
+    for name in ("lines", "sentences", "chars", "chars_no_space"):
+        totals[name] = 0
 
-    Returns:
-        dict: Word frequency dictionary.
+    ends_with_newline = True
+    for line in lines:
+        totals["lines"] += count_lines(line)
+        totals["sentences"] += count_sentences(line)
+        totals["chars"] += count_chars(line)
+        totals["chars_no_space"] += count_chars_no_space(line)
+
+        ends_with_newline = line.endswith("\n")
+        yield line[:-1] if ends_with_newline else line
+
+    # split() gives an empty last line after a final newline
+    if ends_with_newline:
+        yield ""
+
+
+def analyze_chunk(text):
     """
-    frequency = {}
-    for word in text.split():
-        frequency[word] = frequency.get(word, 0) + 1
-    return frequency
+    Analyzes one chunk of whole lines for the chunk cache.
 
+    Returns:
+        dict: Line, sentence, character and word counts, word
+        frequencies, and the shortest and longest word.
+    """
+    words = iter_tokens(text.split("\n"), TOKENIZER_MODE)
+    frequency, word_count, shortest, longest = word_statistics(words)
+
+    return {
+        "lines": count_lines(text),
+        "sentences": count_sentences(text),
+        "chars": count_chars(text),
+        "chars_no_space": count_chars_no_space(text),
+        "words": word_count,
+        "frequency": frequency,
+        "shortest": shortest,
+        "longest": longest,
+    }
+
+
+def incremental_statistics(path, report):
+    """
+    Computes the analysis from cached chunk results, analyzing only
+    chunks that changed since the last run.
 
-def text_analyzer():
-    """Main controller function for text analysis workflow."""
-    path = get_file_path()
-    content = read_text_file(path)
+    Returns:
+        dict | None: Merged results (see chunk_cache.merge_results), or
+        None if the file could not be read.
+    """
+    cache = ChunkCache(cache_folder(CHUNK_CACHE_FOLDER, path), TOKENIZER_MODE)
+    try:
+        merged = merge_results(cache.results(read_lines(path, newline=None), analyze_chunk))
+    except FileNotFoundError:
+        print(f"Error: {path} not found")
+        return None
+    cache.remove_unused()
 
-    if content is None:
-        return
+    report.line(f"\nChunks: {cache.reused + cache.analyzed} "
+                f"({cache.reused} from cache, {cache.analyzed} analyzed)")
+    report.line("N-gram and collocation reports are not updated in incremental mode.")
+    return merged
 
-    cleaned = clean_text(content)
 
-    line_count = count_lines(content)
-    word_count = count_words(cleaned)
-    char_count = count_chars(content)
-    char_count_no_space = count_chars_no_space(content)
-    sentence_count = count_sentences(content)
-    shortest_word, longest_word = shortest_longest(cleaned)
-    word_freq = word_frequency(cleaned)
+def text_analyzer(quiet=False, incremental=INCREMENTAL, max_memory=None):
+    """
+    Main controller function for text analysis workflow.
 
-    print("\nAnalysis Report")
-    print("---------------------")
-    print(f"Lines: {line_count}")
-    print(f"Sentences: {sentence_count}")
-    print(f"Words: {word_count}")
-    print(f"Total characters: {char_count}")
-    print(f"Characters without spaces: {char_count_no_space}")
-    print(f"Shortest word: {shortest_word}")
-    print(f"Longest word: {longest_word}")
+    Args:
+        quiet (bool): Print nothing; only the CSV reports are written.
+        incremental (bool): Reuse cached results for unchanged chunks.
+        max_memory (int | None): Memory budget in bytes; word and n-gram
+            counts and index postings above the budget are spilled to
+            disk (see common/memory.py). Not used in incremental mode.
+    """
+    path = get_file_path()
+    report = ConsoleReport(quiet)
+    index_builder = None
+
+    if incremental and BUILD_INDEX:
+        print("The index needs every line; running a full analysis.")
+        incremental = False
+
+    if incremental:
+        merged = incremental_statistics(path, report)
+        if merged is None:
+            return
+
+        line_count = merged["lines"]
+        char_count = merged["chars"]
+        char_count_no_space = merged["chars_no_space"]
+        sentence_count = merged["sentences"]
+        word_freq = merged["frequency"]
+        word_count = merged["words"]
+        shortest_word = merged["shortest"]
+        longest_word = merged["longest"]
+        ngram_counter = None
+    else:
+        # The text is streamed line by line; the counts are added up
+        # while the words are read
+        text_lines = read_text_file(path)
+
+        if text_lines is None:
+            return
+
+        # With a memory budget, the word and n-gram counts and the index
+        # postings are all spilled to disk above it
+        budget = MemoryBudget(max_memory) if max_memory else None
+
+        totals = {}
+        lines = stream_lines(text_lines, totals)
+        if BUILD_INDEX:
+            index_builder = IndexBuilder(TOKENIZER_MODE, budget)
+            lines = index_builder.indexed(lines)
+
+        if budget is not None:
+            frequency = SpillingCounter(budget, "word counts")
+            ngram_counter = SpillingNgramCounter(budget)
+        else:
+            frequency = None
+            ngram_counter = NgramCounter()
+        words = iter_tokens(lines, TOKENIZER_MODE)
+        word_freq, word_count, shortest_word, longest_word = word_statistics(words, ngram_counter, frequency)
+
+        if budget is not None:
+            # Counting is done: whatever has spilled moves to disk in full,
+            # so the reports below only hold their merges in memory
+            word_freq.finish()
+            ngram_counter.finish()
+            if index_builder is not None:
+                index_builder.finish()
+
+        line_count = totals["lines"]
+        char_count = totals["chars"]
+        char_count_no_space = totals["chars_no_space"]
+        sentence_count = totals["sentences"]
+
+    report.line("\nAnalysis Report")
+    report.line("---------------------")
+    report.line(f"Lines: {line_count}")
+    report.line(f"Sentences: {sentence_count}")
+    report.line(f"Words: {word_count}")
+    report.line(f"Total characters: {char_count}")
+    report.line(f"Characters without spaces: {char_count_no_space}")
+    report.line(f"Shortest word: {shortest_word}")
+    report.line(f"Longest word: {longest_word}")
 
     # Ensure output directory exists
     os.makedirs("output", exist_ok=True)
 
+    if index_builder is not None:
+        indexed_words = index_builder.write(INDEX_FOLDER, source_path=path)
+        report.line(f"Index written to {INDEX_FOLDER} ({indexed_words} words)")
+    report.flush()
+
     # Write summary CSV
     summary_file = "output/analysis_summary.csv"
     with open(summary_file, "w", newline="") as file:
@@ -181,32 +337,109 @@ def text_analyzer():
         ])
 
     # Write word frequency CSV
-    frequency_file = "output/frequency_word.csv"
-    with open(frequency_file, "w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=["word", "frequency"])
+    frequency_file = f"output/frequency_word.{OUTPUT_EXTENSION}"
+    with open_sink(frequency_file, fieldnames=["word", "frequency"], column_types=FREQUENCY_TYPES) as writer:
         writer.writeheader()
         for word, count in word_freq.items():
             writer.writerow({"word": word, "frequency": count})
 
-    # Write sorted frequency CSV
-    sorted_frequency = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-    sorted_file = "output/sorted_frequency_word.csv"
-    with open(sorted_file, "w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=["word", "frequency"])
+    # Write sorted frequency CSV (spilled counts are sorted on disk)
+    if isinstance(word_freq, SpillingCounter):
+        sorted_frequency = word_freq.most_common()
+    else:
+        sorted_frequency = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
+    sorted_file = f"output/sorted_frequency_word.{OUTPUT_EXTENSION}"
+    with open_sink(sorted_file, fieldnames=["word", "frequency"], column_types=FREQUENCY_TYPES) as writer:
         writer.writeheader()
         for word, count in sorted_frequency:
             writer.writerow({"word": word, "frequency": count})
 
     # Write top N words CSV
     TOP_N = 10
-    top_words = sorted_frequency[:TOP_N]
-    top_words_file = "output/top_10_words.csv"
-    with open(top_words_file, "w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=["word", "frequency"])
+    if isinstance(word_freq, SpillingCounter):
+        top_words = word_freq.most_common(TOP_N)
+    else:
+        top_words = sorted_frequency[:TOP_N]
+    top_words_file = f"output/top_10_words.{OUTPUT_EXTENSION}"
+    with open_sink(top_words_file, fieldnames=["word", "frequency"], column_types=FREQUENCY_TYPES) as writer:
         writer.writeheader()
         for word, count in top_words:
             writer.writerow({"word": word, "frequency": count})
 
+    if isinstance(word_freq, SpillingCounter):
+        word_freq.close()
+
+    # N-grams are only counted by a full run
+    if ngram_counter is None:
+        return
+
+    # Write bigram and trigram CSVs
+    for n, name in [(2, "bigrams"), (3, "trigrams")]:
+        ngram_file = f"output/top_{name}.{OUTPUT_EXTENSION}"
+        with open_sink(ngram_file, fieldnames=["ngram", "frequency"], column_types=FREQUENCY_TYPES) as writer:
+            writer.writeheader()
+            for ngram, count in ngram_counter.top(n, TOP_NGRAMS):
+                writer.writerow({"ngram": ngram, "frequency": count})
+
+    # Write collocations CSV (bigrams ranked by PMI)
+    collocation_file = f"output/collocations.{OUTPUT_EXTENSION}"
+    with open_sink(collocation_file, fieldnames=["bigram", "frequency", "pmi"],
+                   column_types={"frequency": "int64", "pmi": "float64"}) as writer:
+        writer.writeheader()
+        for bigram, count, pmi in ngram_counter.collocations(TOP_NGRAMS, MIN_COLLOCATION_COUNT):
+            writer.writerow({"bigram": bigram, "frequency": count, "pmi": pmi})
+
+    if isinstance(ngram_counter, SpillingNgramCounter):
+        ngram_counter.close()
+
+
+def sample_preview(blocks, seed=None):
+    """
+    Estimates the word statistics from a sample of the text.
+
+    Each sampled block of lines goes through the same tokenizer and
+    word_statistics as a full run; word shares are reported with
+    confidence intervals.
+    """
+    path = get_file_path()
+    try:
+        sample = sample_input(path, blocks, seed=seed)
+    except (FileNotFoundError, PermissionError) as e:
+        print("Cannot sample input:", e)
+        return
+
+    block_counts = []
+    block_sizes = []
+    non_empty_lines = 0
+    for block in sample.blocks:
+        frequency, word_count, _, _ = word_statistics(iter_tokens(block, TOKENIZER_MODE))
+        block_counts.append(frequency)
+        block_sizes.append(word_count)
+        non_empty_lines += sum(1 for line in block if line.strip())
+
+    shares = estimate_shares(block_counts, block_sizes, exact=sample.exact)
+    sampled_lines = sample.line_count()
+    scale = sample.total_lines / sampled_lines if sampled_lines else 0
+    estimate = "" if sample.exact else "~"
+
+    print("\nSample Report")
+    print("---------------------")
+    print(f"Lines sampled: {sampled_lines} of {estimate}{sample.total_lines} ({len(block_sizes)} blocks)")
+    print(f"Lines: {estimate}{round(non_empty_lines * scale)}")
+    print(f"Words: {estimate}{round(sum(block_sizes) * scale)}")
+    print("Top 10 words (share of words):")
+    top_words = sorted(shares.items(), key=lambda item: (-item[1][0], item[0]))[:10]
+    for word, share in top_words:
+        print(f"  {word}: {format_share(*share)}")
+
 
 if __name__ == "__main__":
-    text_analyzer()
+    parser = add_report_arguments(sample_argument_parser("Analyze a text file."))
+    parser.add_argument("--incremental", action="store_true",
+                        help="reuse cached results for the parts of the text that did not change")
+    add_memory_argument(parser)
+    args = parser.parse_args()
+    if args.sample:
+        sample_preview(args.sample_blocks, args.seed)
+    else:
+        text_analyzer(args.quiet, args.incremental or INCREMENTAL, args.max_memory)
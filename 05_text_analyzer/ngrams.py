@@ -0,0 +1,275 @@
+"""
+N-gram Counting
+
+Counts bigrams and trigrams while the words are being read, and scores
+bigram collocations with pointwise mutual information (PMI).
+
+Words are stored once in a Vocabulary and referred to by small integer
+ids. An n-gram is packed into a single integer (32 bits per word id),
+so the counters hold plain ints instead of tuples of strings. Python
+ints do not overflow, so a trigram key simply grows to 96 bits.
+
+When a counter grows past its memory cap, n-grams seen only a few times
+are dropped (and the cut-off is raised each time), which keeps memory
+bounded on large inputs at the cost of missing some rare n-grams.
+
+With a memory budget (``--max-memory``) a SpillingNgramCounter is used
+instead: it keys its counts by word tuples (so it needs no vocabulary
+in memory) and spills them to disk like the word counts, keeping every
+n-gram (see common/memory.py).
+"""
+
+import heapq
+import math
+
+from common.memory import SpillingCounter, external_sort
+
+# Bits used for each word id inside a packed n-gram key (room for
+# about 4 billion distinct words)
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+# Maximum number of distinct n-grams kept per counter before pruning
+MAX_NGRAMS = 2_000_000
+
+
+class Vocabulary:
+    """Maps each word to a small integer id and back."""
+
+    def __init__(self):
+        self.ids = {}
+        self.words = []
+
+    def add(self, word):
+        """Returns the id of a word, assigning a new one if needed."""
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.ids[word] = word_id
+            self.words.append(word)
+        return word_id
+
+    def unpack(self, key, n):
+        """Turns a packed n-gram key back into its words."""
+        ids = []
+        for _ in range(n):
+            ids.append(key & ID_MASK)
+            key >>= ID_BITS
+        return tuple(self.words[word_id] for word_id in reversed(ids))
+
+
+class PrunedCounter:
+    """
+    Dictionary counter with a size cap.
+
+    Once more than ``max_size`` keys are stored, every key counted
+    ``min_count`` times or fewer is removed and ``min_count`` goes up
+    by one for the next prune.
+    """
+
+    def __init__(self, max_size=MAX_NGRAMS):
+        self.counts = {}
+        self.max_size = max_size
+        self.min_count = 1
+        self.pruned = 0
+
+    def add(self, key):
+        counts = self.counts
+        counts[key] = counts.get(key, 0) + 1
+        if len(counts) > self.max_size:
+            self.prune()
+
+    def prune(self):
+        """Drops low-frequency keys to get back under the size cap."""
+        while len(self.counts) > self.max_size // 2:
+            threshold = self.min_count
+            before = len(self.counts)
+            self.counts = {key: count for key, count in self.counts.items() if count > threshold}
+            self.pruned += before - len(self.counts)
+            self.min_count += 1
+
+
+class NgramCounter:
+    """
+    Counts unigrams, bigrams, and trigrams from a stream of words.
+
+    Call ``add`` for each word in order.
+    """
+
+    def __init__(self, max_ngrams=MAX_NGRAMS):
+        self.vocab = Vocabulary()
+        self.unigrams = []
+        self.bigrams = PrunedCounter(max_ngrams)
+        self.trigrams = PrunedCounter(max_ngrams)
+        self.total = 0
+        self.prev1 = None
+        self.prev2 = None
+
+    def add(self, word):
+        """Counts a word and the bigram/trigram ending at it."""
+        word_id = self.vocab.add(word)
+        if word_id == len(self.unigrams):
+            self.unigrams.append(0)
+        self.unigrams[word_id] += 1
+        self.total += 1
+
+        if self.prev1 is not None:
+            self.bigrams.add((self.prev1 << ID_BITS) | word_id)
+            if self.prev2 is not None:
+                self.trigrams.add((self.prev2 << (2 * ID_BITS)) | (self.prev1 << ID_BITS) | word_id)
+
+        self.prev2 = self.prev1
+        self.prev1 = word_id
+
+    def top(self, n, limit):
+        """
+        Returns the most frequent n-grams.
+
+        Args:
+            n (int): 2 for bigrams, 3 for trigrams.
+            limit (int): Number of n-grams to return.
+
+        Returns:
+            list: (ngram_text, frequency) tuples, most frequent first.
+        """
+        counter = self.bigrams if n == 2 else self.trigrams
+        best = sorted(counter.counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [(" ".join(self.vocab.unpack(key, n)), count) for key, count in best]
+
+    def collocations(self, limit, min_count=3):
+        """
+        Scores bigrams by pointwise mutual information.
+
+        PMI(a, b) = log2(P(a b) / (P(a) * P(b))). Bigrams seen fewer
+        than `min_count` times are skipped because PMI overrates rare
+        pairs.
+
+        Args:
+            limit (int): Number of collocations to return.
+            min_count (int): Minimum bigram frequency.
+
+        Returns:
+            list: (bigram_text, frequency, pmi) tuples, highest PMI first.
+        """
+        if self.total < 2:
+            return []
+
+        bigram_total = self.total - 1
+        scored = []
+        for key, count in self.bigrams.counts.items():
+            if count < min_count:
+                continue
+            first = self.unigrams[key >> ID_BITS]
+            second = self.unigrams[key & ID_MASK]
+            pmi = pmi_score(count, bigram_total, first, second, self.total)
+            scored.append((key, count, pmi))
+
+        scored.sort(key=lambda x: x[2], reverse=True)
+        return [
+            (" ".join(self.vocab.unpack(key, 2)), count, round(pmi, 4))
+            for key, count, pmi in scored[:limit]
+        ]
+
+
+def pmi_score(count, bigram_total, first, second, total):
+    """PMI of a bigram from its count and the counts of its two words."""
+    return math.log2((count / bigram_total) / ((first / total) * (second / total)))
+
+
+def join_counts(records, totals, word_of):
+    """
+    Appends the count of a word to each record.
+
+    Args:
+        records (iterable): Records sorted by word_of(record).
+        totals (iterable): (word, count, first_seen) sorted by word,
+            holding every word the records refer to.
+        word_of (callable): Word of a record.
+
+    Yields:
+        tuple: record + (count of its word,)
+    """
+    totals = iter(totals)
+    word = count = None
+    for record in records:
+        wanted = word_of(record)
+        while word != wanted:
+            word, count, _ = next(totals)
+        yield record + (count,)
+
+
+class SpillingNgramCounter:
+    """
+    NgramCounter with counts kept under a MemoryBudget.
+
+    Unigrams, bigrams and trigrams are counted in SpillingCounters
+    keyed by tuples of words, so nothing grows without bound in memory
+    and no n-gram is pruned. ``top`` and ``collocations`` return what
+    an NgramCounter returns when it did not need to prune; call
+    ``close`` afterwards to delete the spilled counts.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.unigrams = SpillingCounter(budget, "unigram counts")
+        self.bigrams = SpillingCounter(budget, "bigram counts")
+        self.trigrams = SpillingCounter(budget, "trigram counts")
+        self.total = 0
+        self.prev1 = None
+        self.prev2 = None
+
+    def add(self, word):
+        """Counts a word and the bigram/trigram ending at it."""
+        self.unigrams.add(word)
+        self.total += 1
+
+        if self.prev1 is not None:
+            self.bigrams.add((self.prev1, word))
+            if self.prev2 is not None:
+                self.trigrams.add((self.prev2, self.prev1, word))
+
+        self.prev2 = self.prev1
+        self.prev1 = word
+
+    def top(self, n, limit):
+        """Returns the `limit` most frequent n-grams (see NgramCounter.top)."""
+        counter = self.bigrams if n == 2 else self.trigrams
+        return [(" ".join(key), count) for key, count in counter.most_common(limit)]
+
+    def collocations(self, limit, min_count=3):
+        """
+        Scores bigrams by PMI (see NgramCounter.collocations).
+
+        The counts of both words of every frequent bigram are looked up
+        by merging sorted streams: the bigram totals (sorted by first
+        word) with the unigram totals, then again after sorting the
+        bigrams by their second word.
+        """
+        if self.total < 2:
+            return []
+
+        bigram_total = self.total - 1
+        # (bigram, count, first_seen) for the bigrams worth scoring
+        frequent = (total for total in self.bigrams.totals() if total[1] >= min_count)
+        with_first = join_counts(frequent, self.unigrams.totals(), lambda record: record[0][0])
+        by_second = external_sort(with_first, lambda record: record[0][1], self.budget,
+                                  "bigram counts", self.bigrams.trigger.limit)
+        with_both = join_counts(by_second, self.unigrams.totals(), lambda record: record[0][1])
+
+        scored = (
+            (key, count, pmi_score(count, bigram_total, first, second, self.total), first_seen)
+            for key, count, first_seen, first, second in with_both
+        )
+        # Highest PMI first; ties in the order the bigrams were first seen
+        best = heapq.nsmallest(limit, scored, key=lambda record: (-record[2], record[3]))
+        return [(" ".join(key), count, round(pmi, 4)) for key, count, pmi, _ in best]
+
+    def finish(self):
+        """Moves the counts still in memory to disk (see SpillingCounter.finish)."""
+        for counter in (self.unigrams, self.bigrams, self.trigrams):
+            counter.finish()
+
+    def close(self):
+        """Deletes the spilled counts."""
+        for counter in (self.unigrams, self.bigrams, self.trigrams):
+            counter.close()
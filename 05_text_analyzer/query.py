@@ -0,0 +1,56 @@
+"""
+Index Query Tool
+
+Looks up words in the inverted index written by the text analyzer
+(set BUILD_INDEX = True in main.py and run it first).
+
+Query forms:
+    python3 query.py ipsum            lines containing 'ipsum'
+    python3 query.py '"sit amet"'     lines containing the phrase
+    python3 query.py 'lor*'           lines with a word starting with 'lor'
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Make the shared helpers in the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from inverted_index import IndexReader
+
+INDEX_FOLDER = "output/index"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the text analyzer's inverted index.")
+    parser.add_argument("query", help="word, \"phrase\" or prefix*")
+    parser.add_argument("--index", default=INDEX_FOLDER, help="index folder")
+    parser.add_argument("--limit", type=int, default=20, help="number of matching lines to print")
+    args = parser.parse_args()
+
+    # Timed from opening the index, so the figure is what a query costs
+    start = time.perf_counter()
+    try:
+        reader = IndexReader(args.index)
+    except FileNotFoundError:
+        print(f"Error: no index found in {args.index}; run main.py with BUILD_INDEX = True")
+        return
+
+    lines = reader.query(args.query)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{len(lines)} matching lines ({elapsed_ms:.2f} ms)")
+    for line_number in lines[:args.limit]:
+        text = reader.line_text(line_number)
+        if text is None:
+            print(f"line {line_number + 1}")
+        else:
+            print(f"line {line_number + 1}: {text}")
+
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Tests that --max-memory keeps the text analyzer under its budget.
+
+Each analysis runs in its own process, which samples its memory (see
+common/memory.py) while the reports and the index are built.
+
+Run from this folder with:  python3 -m unittest test_memory_budget
+"""
+
+import filecmp
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# Budget under test, and how far over it the sampled peak may go (the
+# budget is checked every few thousand additions, not on every one)
+BUDGET = 60 * 1024 ** 2
+TOLERANCE = 1.3
+
+# Runs the analyzer with the budget in argv[1] on the path read from
+# stdin, and prints the highest memory use seen
+RUN_ANALYZER = f"""
+import sys, threading, time
+sys.path.insert(0, {FOLDER!r})
+import main
+from common.memory import current_memory
+
+peak = 0
+def sample():
+    global peak
+    while True:
+        peak = max(peak, current_memory())
+        time.sleep(0.001)
+
+threading.Thread(target=sample, daemon=True).start()
+main.BUILD_INDEX = True
+main.text_analyzer(quiet=True, max_memory=int(sys.argv[1]) or None)
+print(max(peak, current_memory()))
+"""
+
+
+def write_text(path, lines=25_000, seed=1):
+    """Writes lines of random words: almost every word, bigram and trigram is new."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    with open(path, "w") as file:
+        for _ in range(lines):
+            words = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10)))
+                     for _ in range(rng.randint(5, 14))]
+            file.write(" ".join(words) + ".\n")
+
+
+class MemoryBudgetTest(unittest.TestCase):
+    """The budget is kept, and the reports and index do not change."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp(prefix="budget-test-")
+        cls.text = os.path.join(cls.folder, "text.txt")
+        write_text(cls.text)
+        cls.peak = {}
+        for budget in (0, BUDGET):
+            run_folder = os.path.join(cls.folder, f"run{budget}")
+            os.makedirs(run_folder)
+            result = subprocess.run(
+                [sys.executable, "-c", RUN_ANALYZER, str(budget)],
+                input=cls.text + "\n", cwd=run_folder,
+                capture_output=True, text=True, check=True,
+            )
+            cls.peak[budget] = int(result.stdout.split()[-1])
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def test_unbudgeted_run_needs_more(self):
+        # Otherwise the budget below would not be tested at all
+        self.assertGreater(self.peak[0], BUDGET * TOLERANCE)
+
+    def test_budget_is_kept(self):
+        self.assertLess(self.peak[BUDGET], BUDGET * TOLERANCE)
+
+    def test_same_reports_and_index(self):
+        without = os.path.join(self.folder, "run0", "output")
+        within = os.path.join(self.folder, f"run{BUDGET}", "output")
+        for sub in ("", "index"):
+            names = sorted(os.listdir(os.path.join(without, sub)))
+            names = [name for name in names if name != "index"]
+            _, mismatch, errors = filecmp.cmpfiles(os.path.join(without, sub),
+                                                   os.path.join(within, sub), names, shallow=False)
+            self.assertEqual(mismatch + errors, [], sub or "reports")
+
+
+if __name__ == "__main__":
+    unittest.main()
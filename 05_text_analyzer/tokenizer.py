@@ -0,0 +1,99 @@
+"""
+Tokenizer
+
+Splits text into lowercase words with punctuation removed, using
+translate tables instead of a character-by-character loop.
+
+Two modes are available:
+
+- "ascii":   removes the characters in string.punctuation and lowercases
+             (same result as the original clean_text)
+- "unicode": also removes every Unicode punctuation character
+             (categories Pc, Pd, Ps, Pe, Pi, Pf, Po, e.g. “ ” — ¿ «)
+             and uses casefold() so 'Straße' and 'STRASSE' match
+
+Tokens are produced lazily, one line or chunk at a time, so a full
+cleaned copy of the text is never built.
+"""
+
+import string
+import unicodedata
+
+# str.translate table deleting ASCII punctuation
+ASCII_PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+
+# bytes.translate arguments: lowercase table and bytes to delete
+BYTES_LOWER_TABLE = bytes.maketrans(
+    string.ascii_uppercase.encode("ascii"),
+    string.ascii_lowercase.encode("ascii"),
+)
+BYTES_PUNCTUATION = string.punctuation.encode("ascii")
+
+
+class UnicodePunctuationTable(dict):
+    """
+    Translate table that deletes any Unicode punctuation character.
+
+    Code points are looked up on first use and cached, so only the
+    characters that actually appear in the text are classified.
+    """
+
+    def __missing__(self, code_point):
+        ch = chr(code_point)
+        if ch in string.punctuation or unicodedata.category(ch).startswith("P"):
+            result = None
+        else:
+            result = code_point
+        self[code_point] = result
+        return result
+
+
+UNICODE_PUNCTUATION_TABLE = UnicodePunctuationTable()
+
+
+def normalize(text, mode="ascii"):
+    """
+    Lowercases text and removes punctuation (whitespace is left as is).
+
+    Args:
+        text (str): Raw text.
+        mode (str): "ascii" or "unicode".
+
+    Returns:
+        str: Normalized text.
+    """
+    if mode == "unicode":
+        return text.casefold().translate(UNICODE_PUNCTUATION_TABLE)
+    return text.lower().translate(ASCII_PUNCTUATION_TABLE)
+
+
+def iter_tokens(lines, mode="ascii"):
+    """
+    Yields cleaned words from an iterable of lines (or other text chunks).
+
+    Chunks must not split a word in two; lines are the natural choice.
+
+    Args:
+        lines (iterable): Text lines.
+        mode (str): "ascii" or "unicode".
+
+    Yields:
+        str: Words in order.
+    """
+    for line in lines:
+        yield from normalize(line, mode).split()
+
+
+def iter_tokens_bytes(lines):
+    """
+    Yields cleaned words from ASCII byte lines without decoding the whole input.
+
+    Args:
+        lines (iterable): Lines as bytes (for example a file opened in 'rb').
+
+    Yields:
+        str: Words in order.
+    """
+    for line in lines:
+        for token in line.translate(BYTES_LOWER_TABLE, BYTES_PUNCTUATION).split():
+            yield token.decode("ascii", errors="replace")
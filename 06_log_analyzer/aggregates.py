@@ -0,0 +1,122 @@
+"""
+Log Aggregates
+
+The per-action and per-status totals the log analyzer reports. All of
+them are associative (counts add up, first/last timestamps take the
+min/max), so partial aggregates built over separate parts of a log can
+be merged into exactly the result of a single pass.
+
+With a memory budget (see common/memory.py) the entries are spilled to
+disk as chronologically sorted runs when memory runs short;
+``iter_entries`` merges them back, in the same order ``sort_entries``
+gives.
+
+Sorted runs written by the parallel workers (see parallel.py) are
+added with ``add_run`` and merged in by ``iter_entries`` the same way.
+"""
+
+import heapq
+import shutil
+from operator import itemgetter
+
+from common.memory import SpillRuns, SpillTrigger, read_run
+
+# Sort key of an entry: its timestamp
+entry_time = itemgetter(0)
+
+
+class LogAggregates:
+    """
+    Counts, first/last timestamps per action, and the parsed entries.
+
+    Args:
+        budget (MemoryBudget | None): Spill entries to disk when the
+            process goes over this budget (None keeps them all in memory).
+    """
+
+    def __init__(self, budget=None):
+        self.action_count = {}
+        self.status_count = {}
+        self.first_ts = {}
+        self.last_ts = {}
+        self.entries = []
+        self.spilled = None
+        self.spill_trigger = None
+        self.runs = []
+        self.run_folder = None
+        if budget is not None:
+            self.spilled = SpillRuns(budget, "log entries", key=entry_time)
+            self.spill_trigger = SpillTrigger(budget)
+
+    def add(self, entry):
+        """Adds one parsed LogRecord."""
+        timestamp, action, status = entry.timestamp, entry.action, entry.status
+
+        self.entries.append(entry)
+        if self.spill_trigger is not None and self.spill_trigger(len(self.entries)):
+            self.spill_entries()
+
+        # Count actions and statuses
+        self.action_count[action] = self.action_count.get(action, 0) + 1
+        self.status_count[status] = self.status_count.get(status, 0) + 1
+
+        # Track first and last occurrence timestamps per action
+        if action not in self.first_ts or timestamp < self.first_ts[action]:
+            self.first_ts[action] = timestamp
+
+        if action not in self.last_ts or timestamp > self.last_ts[action]:
+            self.last_ts[action] = timestamp
+
+    def merge(self, other):
+        """Folds another partial aggregate into this one."""
+        for action, count in other.action_count.items():
+            self.action_count[action] = self.action_count.get(action, 0) + count
+        for status, count in other.status_count.items():
+            self.status_count[status] = self.status_count.get(status, 0) + count
+
+        for action, timestamp in other.first_ts.items():
+            if action not in self.first_ts or timestamp < self.first_ts[action]:
+                self.first_ts[action] = timestamp
+        for action, timestamp in other.last_ts.items():
+            if action not in self.last_ts or timestamp > self.last_ts[action]:
+                self.last_ts[action] = timestamp
+
+        self.entries.extend(other.entries)
+        if self.spill_trigger is not None and self.spill_trigger(len(self.entries), len(other.entries)):
+            self.spill_entries()
+
+    def spill_entries(self):
+        """Writes the entries held in memory to disk as a sorted run."""
+        self.entries.sort(key=entry_time)
+        self.spilled.spill(self.entries)
+        self.entries = []
+
+    def add_run(self, path):
+        """Adds a run file of entries sorted by timestamp."""
+        self.runs.append(path)
+
+    def sort_entries(self):
+        """Sorts entries chronologically."""
+        self.entries.sort(key=entry_time)
+
+    def iter_entries(self):
+        """
+        Returns all entries in chronological order (call sort_entries
+        first), merging spilled runs back in. Each call starts over.
+        """
+        runs = [read_run(path) for path in self.runs]
+        if self.spilled is not None and self.spilled.paths:
+            runs.append(self.spilled.merge(self.entries))
+        elif runs:
+            runs.append(self.entries)
+        else:
+            return iter(self.entries)
+        return heapq.merge(*runs, key=entry_time)
+
+    def close(self):
+        """Deletes spilled entries and run files."""
+        if self.spilled is not None:
+            self.spilled.close()
+        if self.run_folder is not None:
+            shutil.rmtree(self.run_folder, ignore_errors=True)
+            self.run_folder = None
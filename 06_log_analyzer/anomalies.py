@@ -0,0 +1,161 @@
+"""
+Rate Anomaly Detection
+
+Watches the event rate of every (action, status) pair, for example
+UPLOAD/ERROR, and flags a spike as soon as the count in the sliding
+time window goes well above what is normal for that pair.
+
+The window (WINDOW_SECONDS long) slides forward in WINDOW_STEPS steps.
+For each pair only a handful of numbers are kept: a ring buffer with
+the event count of every step in the window, their sum, plus an
+exponentially weighted moving average (EWMA) and variance of the window
+count at the end of each past step. Memory therefore stays constant
+per pair no matter how long the log is.
+
+A spike is flagged (once, until the count drops below the threshold
+again) when the window count reaches
+
+    max(MIN_EVENTS, mean + SIGMA * standard deviation)
+
+after the pair has had events in WARMUP_WINDOWS windows' worth of steps.
+"""
+
+import math
+from datetime import datetime
+
+# Length of the sliding rate window in seconds
+WINDOW_SECONDS = 60
+
+# Steps the window slides forward in (6 steps of 10 seconds)
+WINDOW_STEPS = 6
+
+# Weight of the newest window in the moving average (0-1); the weight
+# of each step is set so the average spans as many windows
+ALPHA = 0.2
+
+# How many standard deviations above the average counts as a spike
+SIGMA = 3.0
+
+# A window needs at least this many events to be flagged
+MIN_EVENTS = 5
+
+# Windows of data (with events) seen before a pair can be flagged
+WARMUP_WINDOWS = 5
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class RateTracker:
+    """Sliding window count and EWMA statistics for one (action, status) pair."""
+
+    __slots__ = ("step", "buckets", "count", "mean", "variance", "steps_seen", "flagged")
+
+    def __init__(self, step, steps):
+        self.step = step
+        self.buckets = [0] * steps  # events per step, indexed by step % steps
+        self.count = 0              # events in the window (sum of buckets)
+        self.mean = 0.0
+        self.variance = 0.0
+        self.steps_seen = 0
+        self.flagged = False
+
+    def threshold(self, sigma, min_events):
+        return max(min_events, self.mean + sigma * math.sqrt(self.variance))
+
+    def fold(self, value, alpha):
+        """Adds one window count to the EWMA mean and variance."""
+        diff = value - self.mean
+        self.mean += alpha * diff
+        self.variance = (1 - alpha) * (self.variance + alpha * diff * diff)
+
+    def advance(self, new_step, alpha, sigma, min_events):
+        """Folds every step up to new_step into the EWMA and slides the window."""
+        size = len(self.buckets)
+        gap = new_step - self.step
+
+        # Steps whose window may still hold events, one by one
+        for _ in range(min(gap, size)):
+            self.fold(self.count, alpha)
+            if self.count:
+                self.steps_seen += 1
+            self.step += 1
+            slot = self.step % size
+            self.count -= self.buckets[slot]
+            self.buckets[slot] = 0
+            if self.flagged and self.count < self.threshold(sigma, min_events):
+                self.flagged = False
+
+        # The rest saw no events at all: k zero counts in closed form.
+        # Each one decays the mean by (1 - alpha) and adds
+        # alpha * mean^2 to the variance before decaying it.
+        empty = gap - size
+        if empty > 0:
+            decay = (1 - alpha) ** empty
+            self.variance = decay * (self.variance + self.mean * self.mean * (1 - decay))
+            self.mean *= decay
+            self.step = new_step
+
+
+class RateAnomalyDetector:
+    """
+    Tracks event rates per (action, status) and reports spikes.
+
+    Feed events in time order with ``add``; it returns an anomaly
+    record the moment a window crosses its threshold.
+    """
+
+    def __init__(self, window_seconds=WINDOW_SECONDS, alpha=ALPHA, sigma=SIGMA,
+                 min_events=MIN_EVENTS, warmup_windows=WARMUP_WINDOWS, window_steps=WINDOW_STEPS):
+        self.window_steps = window_steps
+        self.step_seconds = window_seconds / window_steps
+        # Same averaging span as `alpha` per window
+        self.alpha = 1 - (1 - alpha) ** (1 / window_steps)
+        self.sigma = sigma
+        self.min_events = min_events
+        self.warmup_steps = warmup_windows * window_steps
+        self.trackers = {}
+        self.anomalies = []
+
+    def add(self, timestamp, action, status):
+        """
+        Records one event.
+
+        Args:
+            timestamp (datetime): Event time.
+            action (str): Action name.
+            status (str): Status name.
+
+        Returns:
+            dict | None: Anomaly record if this event made the window a spike.
+        """
+        step = int((timestamp - EPOCH).total_seconds() // self.step_seconds)
+        key = (action, status)
+
+        tracker = self.trackers.get(key)
+        if tracker is None:
+            tracker = self.trackers[key] = RateTracker(step, self.window_steps)
+        elif step > tracker.step:
+            tracker.advance(step, self.alpha, self.sigma, self.min_events)
+
+        # Late (out-of-order) events are counted in the current step
+        tracker.buckets[tracker.step % self.window_steps] += 1
+        tracker.count += 1
+
+        if tracker.flagged or tracker.steps_seen < self.warmup_steps:
+            return None
+
+        threshold = tracker.threshold(self.sigma, self.min_events)
+        if tracker.count < threshold:
+            return None
+
+        tracker.flagged = True
+        anomaly = {
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            "action": action,
+            "status": status,
+            "window_count": tracker.count,
+            "expected": round(tracker.mean, 2),
+            "threshold": round(threshold, 2),
+        }
+        self.anomalies.append(anomaly)
+        return anomaly
@@ -0,0 +1,461 @@
+"""
+Log Parser
+
+Schema-driven parsing for the log analyzer. A schema declares the field
+separator, the field order, and the timestamp formats it accepts:
+
+    {
+        "name": "extended",
+        "delimiter": ",",
+        "fields": ["timestamp", "action", "status", "user", "host", "duration"],
+        "timestamp_formats": ["%Y-%m-%d %H:%M:%S"]
+    }
+
+Known field names are timestamp, action, status, user, host and
+duration (seconds); other names are accepted and ignored. Each schema
+is compiled into an extractor function with the field positions and
+timestamp parser fixed up front. The schema is picked automatically
+from the first lines of the log, and lines that do not fit are counted
+by reason instead of being skipped silently.
+
+Lines may also be given as bytes (for example from an mmap of the log).
+The bytes extractor splits fields on raw bytes and decodes only the
+timestamp token plus the action and status tokens; the latter go
+through a small intern cache, since a log usually has only a handful
+of distinct values for them.
+"""
+
+import json
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+LogRecord = namedtuple(
+    "LogRecord",
+    ["timestamp", "action", "status", "user", "host", "duration"],
+    defaults=[None, None, None],
+)
+
+# Fields besides timestamp/action/status that are carried into the output
+EXTRA_FIELDS = ["user", "host", "duration"]
+
+# Lines looked at when picking a schema
+DETECT_LINES = 50
+
+# Distinct action/status values remembered by the intern cache
+MAX_INTERNED = 100_000
+
+# Timestamp formats datetime.fromisoformat() parses directly (much
+# faster than strptime)
+ISO_FORMATS = {"%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S.%f"}
+
+BUILTIN_SCHEMAS = [
+    {
+        "name": "basic",
+        "delimiter": ",",
+        "fields": ["timestamp", "action", "status"],
+        "timestamp_formats": ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"],
+    },
+    {
+        "name": "extended",
+        "delimiter": ",",
+        "fields": ["timestamp", "action", "status", "user", "host", "duration"],
+        "timestamp_formats": ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"],
+    },
+    {
+        "name": "pipe",
+        "delimiter": "|",
+        "fields": ["timestamp", "action", "status", "user"],
+        "timestamp_formats": ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"],
+    },
+    {
+        "name": "apache_time",
+        "delimiter": ",",
+        "fields": ["timestamp", "action", "status"],
+        "timestamp_formats": ["%d/%b/%Y:%H:%M:%S"],
+    },
+]
+
+
+class ParseStats:
+    """Counts parsed and malformed lines, by reason."""
+
+    def __init__(self):
+        self.parsed = 0
+        self.malformed = {}
+
+    def reject(self, reason):
+        self.malformed[reason] = self.malformed.get(reason, 0) + 1
+
+    def malformed_total(self):
+        return sum(self.malformed.values())
+
+    def merge(self, other):
+        """Adds the counts from another ParseStats (e.g. from a worker)."""
+        self.parsed += other.parsed
+        for reason, count in other.malformed.items():
+            self.malformed[reason] = self.malformed.get(reason, 0) + count
+
+
+def load_schemas(path=None):
+    """
+    Returns the built-in schemas, plus any defined in a JSON file.
+
+    Args:
+        path (str | None): JSON file with a list of schema objects.
+
+    Returns:
+        list: Schema dictionaries (file schemas first).
+    """
+    schemas = []
+    if path:
+        with open(path, "r", encoding="utf-8") as file:
+            schemas.extend(json.load(file))
+    return schemas + BUILTIN_SCHEMAS
+
+
+def make_iso_parser(fmt):
+    """
+    Builds datetime.fromisoformat limited to exactly one of ISO_FORMATS.
+
+    fromisoformat also accepts time zone offsets, dates without a time,
+    other separators and compact forms, which strptime with the declared
+    format rejects. A time zone in particular would crash the later
+    sort (naive and aware datetimes cannot be compared), so anything
+    that is not shaped like `fmt` raises ValueError.
+    """
+    separator = "T" if "T" in fmt else " "
+    fraction = fmt.endswith(".%f")
+    parse_iso = datetime.fromisoformat
+
+    def parse(value):
+        size = len(value)
+        if (
+            (not 21 <= size <= 26 if fraction else size != 19)
+            or value[10] != separator
+            or value[4] != "-" or value[7] != "-"
+            or value[13] != ":" or value[16] != ":"
+            or (fraction and value[19] != ".")
+        ):
+            raise ValueError(f"timestamp does not match {fmt}: {value!r}")
+        result = parse_iso(value)
+        if result.tzinfo is not None:
+            raise ValueError(f"timestamp has a time zone: {value!r}")
+        return result
+
+    return parse
+
+
+def make_timestamp_parser(formats):
+    """
+    Builds a function turning a timestamp string into a datetime.
+
+    The format that worked last time is tried first, so a log in a
+    single format pays for one attempt per line.
+
+    Raises:
+        ValueError: From the returned function, if no format matches.
+    """
+    parsers = []
+    for fmt in formats:
+        if fmt in ISO_FORMATS:
+            parsers.append(make_iso_parser(fmt))
+        else:
+            parsers.append(lambda value, fmt=fmt: datetime.strptime(value, fmt))
+
+    if len(parsers) == 1:
+        return parsers[0]
+
+    order = list(parsers)
+
+    def parse(value):
+        for i, parser in enumerate(order):
+            try:
+                result = parser(value)
+            except ValueError:
+                continue
+            if i:
+                order.insert(0, order.pop(i))
+            return result
+        raise ValueError(f"unknown timestamp format: {value!r}")
+
+    return parse
+
+
+def make_interner(cache):
+    """
+    Builds a function that decodes a bytes token to a shared str.
+
+    Each distinct token is decoded once and stored in `cache`
+    (bytes -> str); later occurrences return the cached string.
+    """
+    def intern(raw):
+        value = cache.get(raw)
+        if value is None:
+            value = sys.intern(raw.decode("utf-8", errors="replace"))
+            if len(cache) < MAX_INTERNED:
+                cache[raw] = value
+        return value
+
+    return intern
+
+
+def make_bytes_timestamp_parser(formats):
+    """
+    Builds a function turning a bytes timestamp into a datetime.
+
+    Only the short timestamp token is decoded (as ASCII, which is a
+    plain copy) before it goes to the str parser; for ISO timestamps
+    that is a checked datetime.fromisoformat, which beats rebuilding the value
+    from int() slices in Python.
+    """
+    text_parser = make_timestamp_parser(formats)
+
+    def parse(raw):
+        return text_parser(raw.decode("ascii", errors="replace"))
+
+    return parse
+
+
+def compile_schema_bytes(schema, stats):
+    """
+    Compiles a schema into an extractor for bytes lines.
+
+    Args:
+        schema (dict): Schema definition.
+        stats (ParseStats): Receives parsed/malformed counts.
+
+    Returns:
+        callable: extract(line_bytes) -> LogRecord | None
+    """
+    delimiter = schema.get("delimiter", ",").encode("utf-8")
+    fields = schema["fields"]
+    field_count = len(fields)
+    ts_index = fields.index("timestamp")
+    action_index = fields.index("action")
+    status_index = fields.index("status")
+    extras = [(name, fields.index(name)) for name in EXTRA_FIELDS if name in fields]
+    parse_timestamp = make_bytes_timestamp_parser(schema.get("timestamp_formats", ["%Y-%m-%d %H:%M:%S"]))
+    interned = {}
+    intern = make_interner(interned)
+
+    def extract(line):
+        parts = line.split(delimiter)
+        if len(parts) != field_count:
+            stats.reject(f"expected {field_count} fields, got {len(parts)}")
+            return None
+
+        try:
+            timestamp = parse_timestamp(parts[ts_index].strip())
+        except ValueError:
+            stats.reject("bad timestamp")
+            return None
+
+        values = {}
+        for name, index in extras:
+            value = parts[index].strip()
+            if name == "duration":
+                try:
+                    value = float(value) if value else None
+                except ValueError:
+                    stats.reject("bad duration")
+                    return None
+            else:
+                value = value.decode("utf-8", errors="replace")
+            values[name] = value
+
+        # Look in the cache directly; only new tokens pay for a decode
+        raw_action = parts[action_index].strip()
+        action = interned.get(raw_action) or intern(raw_action)
+        raw_status = parts[status_index].strip()
+        status = interned.get(raw_status) or intern(raw_status)
+
+        stats.parsed += 1
+        if values:
+            return LogRecord(timestamp, action, status, **values)
+        return LogRecord(timestamp, action, status)
+
+    return extract
+
+
+def compile_schema(schema, stats):
+    """
+    Compiles a schema into a fast extractor.
+
+    Args:
+        schema (dict): Schema definition.
+        stats (ParseStats): Receives parsed/malformed counts.
+
+    Returns:
+        callable: extract(line) -> LogRecord | None
+    """
+    delimiter = schema.get("delimiter", ",")
+    fields = schema["fields"]
+    field_count = len(fields)
+    ts_index = fields.index("timestamp")
+    action_index = fields.index("action")
+    status_index = fields.index("status")
+    extras = [(name, fields.index(name)) for name in EXTRA_FIELDS if name in fields]
+    parse_timestamp = make_timestamp_parser(schema.get("timestamp_formats", ["%Y-%m-%d %H:%M:%S"]))
+
+    def extract(line):
+        parts = line.split(delimiter)
+        if len(parts) != field_count:
+            stats.reject(f"expected {field_count} fields, got {len(parts)}")
+            return None
+
+        try:
+            timestamp = parse_timestamp(parts[ts_index].strip())
+        except ValueError:
+            stats.reject("bad timestamp")
+            return None
+
+        values = {}
+        for name, index in extras:
+            value = parts[index].strip()
+            if name == "duration":
+                try:
+                    value = float(value) if value else None
+                except ValueError:
+                    stats.reject("bad duration")
+                    return None
+            values[name] = value
+
+        stats.parsed += 1
+        return LogRecord(
+            timestamp,
+            parts[action_index].strip(),
+            parts[status_index].strip(),
+            **values,
+        )
+
+    return extract
+
+
+def make_sort_key(schema):
+    """
+    Builds a sort key for raw text lines in a schema.
+
+    Args:
+        schema (dict): Schema definition.
+
+    Returns:
+        callable: key(line) -> the line's parsed timestamp, or
+        datetime.min for a line without one (the parser skips it).
+    """
+    delimiter = schema.get("delimiter", ",")
+    ts_index = schema["fields"].index("timestamp")
+    parse_timestamp = make_timestamp_parser(schema.get("timestamp_formats", ["%Y-%m-%d %H:%M:%S"]))
+
+    def key(line):
+        parts = line.split(delimiter)
+        try:
+            return parse_timestamp(parts[ts_index].strip())
+        except (IndexError, ValueError):
+            return datetime.min
+
+    return key
+
+
+def detect_schema(lines, schemas):
+    """
+    Picks the schema that parses the most of the given sample lines.
+
+    Args:
+        lines (list): First non-empty lines of the log.
+        schemas (list): Candidate schemas, in order of preference.
+
+    Returns:
+        dict: The best schema (the first one on a tie).
+    """
+    best, best_score = schemas[0], -1
+    for schema in schemas:
+        extract = compile_schema(schema, ParseStats())
+        score = sum(1 for line in lines if extract(line) is not None)
+        if score > best_score:
+            best, best_score = schema, score
+    return best
+
+
+class LogParser:
+    """
+    Parses log lines with a schema detected from the first lines.
+
+    Use ``parse_lines`` to turn an iterator of raw lines into records;
+    malformed lines are counted in ``stats``.
+    """
+
+    def __init__(self, schema_file=None):
+        self.schemas = load_schemas(schema_file)
+        self.schema = None
+        self.stats = ParseStats()
+
+    def extra_fields(self):
+        """Extra fields (user, host, duration) present in the chosen schema."""
+        if self.schema is None:
+            return []
+        return [name for name in EXTRA_FIELDS if name in self.schema["fields"]]
+
+    def detect(self, sample):
+        """
+        Picks the schema for the log from its first non-empty lines.
+
+        Args:
+            sample (list): Sample lines, as str or as bytes.
+
+        Returns:
+            callable: Extractor for lines of the same type as the sample.
+        """
+        if sample and isinstance(sample[0], bytes):
+            decoded = [line.decode("utf-8", errors="replace") for line in sample]
+            self.schema = detect_schema(decoded, self.schemas)
+            return compile_schema_bytes(self.schema, self.stats)
+
+        self.schema = detect_schema(sample, self.schemas)
+        return compile_schema(self.schema, self.stats)
+
+    def sort_key(self, sample):
+        """
+        Sort key for the raw text lines of the log, e.g. to merge rotated
+        shards in time order.
+
+        Args:
+            sample (list): First non-empty lines of the log, as str.
+
+        Returns:
+            callable: key(line) -> timestamp (see make_sort_key).
+        """
+        self.detect(sample)
+        return make_sort_key(self.schema)
+
+    def parse_lines(self, lines):
+        """
+        Yields a LogRecord for every well-formed, non-empty line.
+
+        Args:
+            lines (iterator): Raw log lines, as str or as bytes.
+
+        Yields:
+            LogRecord: Parsed entries.
+        """
+        lines = iter(lines)
+        sample = []
+        for line in lines:
+            if line.strip():
+                sample.append(line)
+                if len(sample) >= DETECT_LINES:
+                    break
+
+        extract = self.detect(sample)
+
+        for line in sample:
+            record = extract(line)
+            if record is not None:
+                yield record
+
+        for line in lines:
+            if not line.strip():
+                continue
+            record = extract(line)
+            if record is not None:
+                yield record
@@ -8,18 +8,53 @@ Designed as a portfolio project demonstrating:
 - File parsing
 - Datetime handling
 - Dictionary-based aggregation
+- Streaming rate anomaly detection
+- LOGIN/LOGOUT session reconstruction
 - CSV report generation
 """
 
-import csv
-from datetime import datetime
 import os
+import sys
+
+# Make the shared helpers in the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.console import ConsoleReport, add_report_arguments, preview, preview_bounds
+from common.memory import MemoryBudget, add_memory_argument
+from common.sampling import estimate_shares, format_share, sample_argument_parser, sample_input
+from common.sinks import open_sink
+from common.sources import expand_inputs, file_lines, is_compressed, merge_sorted_lines, mmap_lines
+from aggregates import LogAggregates
+from anomalies import RateAnomalyDetector
+from log_parser import DETECT_LINES, LogParser
+from parallel import analyze_parallel
+from sessions import SessionTracker
+
+# Extension used for the CSV reports: "csv", "csv.gz", "csv.zst",
+# "jsonl", "parquet", "arrow" or "sqlite" (see common/sinks.py)
+OUTPUT_EXTENSION = "csv"
+
+# Optional JSON file with extra log schemas (see log_parser.py);
+# the schema is detected from the first lines of the log
+LOG_SCHEMA_FILE = None
+
+# Read a single uncompressed log as raw bytes through mmap and decode
+# only the action/status tokens (fastest for ASCII logs)
+BYTES_MODE = True
+
+# Worker processes for a single uncompressed log; 1 analyzes in this
+# process. Set to os.cpu_count() on batch hosts. Files smaller than
+# PARALLEL_MIN_BYTES are always analyzed in one process.
+PARALLEL_WORKERS = 1
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
 
 
 def get_file_path():
     """
     Prompts the user for a log file path.
 
+    The path may also be a folder or a glob pattern such as
+    'logs/app.log*' to read rotated (and .gz/.zst compressed) shards.
     If the user presses Enter, a default sample file path is used.
 
     Returns:
@@ -29,111 +64,292 @@ def get_file_path():
     return input("Enter the file path or press Enter to use default: ") or INPUT_FILE
 
 
-def read_text_file(path):
+def first_lines(path):
+    """Returns the first non-empty lines of the first file at path."""
+    sample = []
+    lines = file_lines(expand_inputs(path)[0])
+    try:
+        for line in lines:
+            if line.strip():
+                sample.append(line)
+                if len(sample) >= DETECT_LINES:
+                    break
+    finally:
+        lines.close()
+    return sample
+
+
+def read_text_file(path, parser):
     """
-    Reads the contents of a text file.
+    Reads the lines of one or more log files.
+
+    Each rotated shard is already in time order, so the shards are
+    merged chronologically while they are read, on the timestamps as
+    parsed with the schema detected from the first shard. A single
+    uncompressed file is read as bytes through mmap when BYTES_MODE
+    is on.
 
     Args:
-        path (str): Path to the file.
+        path (str): Path, folder, or glob pattern.
+        parser (LogParser): Detects the schema of the shards.
 
     Returns:
-        str | None: File content if successful, otherwise None.
+        iterator | None: Log lines (str, or bytes in bytes mode) if
+        successful, otherwise None.
     """
     try:
-        with open(path, "r", newline="") as file:
-            return file.read()
+        if BYTES_MODE and os.path.isfile(path) and not is_compressed(path):
+            return mmap_lines(path)
+        return merge_sorted_lines(path, key=parser.sort_key(first_lines(path)))
     except FileNotFoundError:
         print(f"Error: {path} not found")
         return None
 
 
-def log_analyzer():
-    """
-    Main controller function for log analysis workflow.
-    """
-    path = get_file_path()
-    log = read_text_file(path)
+def use_parallel(path):
+    """Returns True if the log should be split across worker processes."""
+    return (
+        PARALLEL_WORKERS > 1
+        and os.path.isfile(path)
+        and not is_compressed(path)
+        and os.path.getsize(path) >= PARALLEL_MIN_BYTES
+    )
 
-    if log is None:
-        return
 
-    action_count = {}
-    status_count = {}
-    first_ts = {}
-    last_ts = {}
-    all_entries = []
+def watch_entry(entry, sessions, detector, report):
+    """Feeds one entry to the session tracker and the anomaly detector."""
+    timestamp, action, status = entry.timestamp, entry.action, entry.status
 
-    lines = log.splitlines()
+    sessions.add(timestamp, action, status, entry.user)
 
-    for line in lines:
-        # Skip empty lines
-        if not line.strip():
-            continue
+    # Flag rate spikes as soon as they happen: the alert is flushed
+    # right away instead of waiting in the report buffer
+    anomaly = detector.add(timestamp, action, status)
+    if anomaly:
+        report.line(
+            f"ANOMALY {anomaly['timestamp']} {action}/{status}: "
+            f"{anomaly['window_count']} events in window "
+            f"(expected ~{anomaly['expected']})"
+        )
+        report.flush()
 
-        parts = line.split(",")
 
-        # Skip malformed log entries
-        if len(parts) != 3:
-            continue
+def format_entry(entry, extra_fields):
+    """Formats an entry as a 'timestamp | action | status | ...' line."""
+    columns = [str(entry.timestamp), entry.action, entry.status]
+    columns += [str(getattr(entry, name)) for name in extra_fields]
+    return " | ".join(columns)
 
-        timestamp_str = parts[0].strip()
-        action = parts[1].strip()
-        status = parts[2].strip()
 
-        timestamp = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
+def log_analyzer(quiet=False, head=None, tail=None, max_memory=None):
+    """
+    Main controller function for log analysis workflow.
 
-        all_entries.append((timestamp, action, status))
+    Args:
+        quiet (bool): Print nothing; only the CSV reports are written.
+        head (int | None): List only the first `head` entries of the
+            chronological log (all entries if head and tail are None).
+        tail (int | None): List only the last `tail` entries.
+        max_memory (int | None): Memory budget in bytes; above it the
+            parsed entries are spilled to disk (see common/memory.py).
+    """
+    path = get_file_path()
+    budget = MemoryBudget(max_memory) if max_memory else None
+    with ConsoleReport(quiet) as report:
+        analyze_log(path, report, head, tail, budget)
+
+
+def analyze_log(path, report, head=None, tail=None, budget=None):
+    """Analyzes the log at path, printing through report (see log_analyzer)."""
+    detector = RateAnomalyDetector()
+    sessions = SessionTracker()
+    parser = LogParser(LOG_SCHEMA_FILE)
+
+    if use_parallel(path):
+        # Sessions and rate windows see the entries in file order, just
+        # like the streaming pass below
+        aggregates = analyze_parallel(
+            path, parser, PARALLEL_WORKERS, budget=budget,
+            watch=lambda entry: watch_entry(entry, sessions, detector, report)
+        )
+    else:
+        log = read_text_file(path, parser)
 
-        # Count actions and statuses
-        action_count[action] = action_count.get(action, 0) + 1
-        status_count[status] = status_count.get(status, 0) + 1
+        if log is None:
+            return
 
-        # Track first and last occurrence timestamps per action
-        if action not in first_ts or timestamp < first_ts[action]:
-            first_ts[action] = timestamp
+        aggregates = LogAggregates(budget)
 
-        if action not in last_ts or timestamp > last_ts[action]:
-            last_ts[action] = timestamp
+        # Empty and malformed lines are skipped (and counted) by the parser
+        for entry in parser.parse_lines(log):
+            aggregates.add(entry)
+            watch_entry(entry, sessions, detector, report)
 
-    # Sort log entries chronologically
-    all_entries.sort(key=lambda x: x[0])
+    try:
+        write_reports(aggregates, parser, sessions, detector, report, head, tail)
+    finally:
+        aggregates.close()
 
-    print("\nChronological Log")
-    print("-----------------")
-    for ts, action, status in all_entries:
-        print(f"{ts} | {action} | {status}")
 
-    print("\nAction Summary")
-    print("-----------------")
+def write_reports(aggregates, parser, sessions, detector, report, head=None, tail=None):
+    """Prints the summaries and writes the CSV reports of an analyzed log."""
+    # Sort log entries chronologically
+    aggregates.sort_entries()
+
+    action_count = aggregates.action_count
+    status_count = aggregates.status_count
+    first_ts = aggregates.first_ts
+    last_ts = aggregates.last_ts
+    extra_fields = parser.extra_fields()
+
+    if not report.quiet:
+        report.line("\nChronological Log")
+        report.line("-----------------")
+        # Only the entries that are shown get formatted
+        first, skipped, last = preview(aggregates.iter_entries(), head, tail)
+        for entry in first:
+            report.line(format_entry(entry, extra_fields))
+        if skipped:
+            report.line(f"... {skipped} entries not shown ...")
+        for entry in last:
+            report.line(format_entry(entry, extra_fields))
+
+    report.line("\nAction Summary")
+    report.line("-----------------")
     for action, count in action_count.items():
-        print(
+        report.line(
             f"{action}: {count} times "
             f"(first: {first_ts[action]}, last: {last_ts[action]})"
         )
 
-    print("\nStatus Summary")
-    print("-----------------")
+    report.line("\nStatus Summary")
+    report.line("-----------------")
     for status, count in status_count.items():
-        print(f"{status}: {count}")
+        report.line(f"{status}: {count}")
+
+    report.line("\nParser Summary")
+    report.line("-----------------")
+    report.line(f"Schema: {parser.schema['name']}")
+    report.line(f"Parsed lines: {parser.stats.parsed}")
+    report.line(f"Malformed lines: {parser.stats.malformed_total()}")
+    for reason, count in parser.stats.malformed.items():
+        report.line(f"  {reason}: {count}")
+
+    report.line("\nSession Summary")
+    report.line("-----------------")
+    session_summary = sessions.summary()
+    for metric, value in session_summary:
+        report.line(f"{metric}: {value}")
+    for label, count in sessions.histogram.items():
+        report.line(f"{label}: {count}")
+
+    report.line("\nAnomalies")
+    report.line("-----------------")
+    report.line(f"{len(detector.anomalies)} rate spikes detected")
 
     # Ensure output directory exists
     os.makedirs("output", exist_ok=True)
 
-    # Write chronological log CSV
-    chronological_log = "output/chronological_log.csv"
+    # Write anomalies CSV
+    anomalies_file = f"output/anomalies.{OUTPUT_EXTENSION}"
+    with open_sink(
+        anomalies_file,
+        fieldnames=["timestamp", "action", "status", "window_count", "expected", "threshold"],
+        dictionary_columns=["action", "status"],
+        column_types={"window_count": "int64", "expected": "float64", "threshold": "float64"}
+    ) as writer:
+        writer.writeheader()
+        writer.writerows(detector.anomalies)
 
-    with open(chronological_log, "w", newline="") as file:
-        fieldnames = ["timestamp", "action", "status"]
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
+    # Write session summary and duration histogram CSVs
+    with open_sink(f"output/session_summary.{OUTPUT_EXTENSION}", fieldnames=["metric", "value"],
+                   column_types={"value": "float64"}) as writer:
+        writer.writeheader()
+        for metric, value in session_summary:
+            writer.writerow({"metric": metric, "value": value})
 
+    with open_sink(f"output/session_histogram.{OUTPUT_EXTENSION}", fieldnames=["duration", "sessions"],
+                   column_types={"sessions": "int64"}) as writer:
         writer.writeheader()
-        for timestamp, action, status in all_entries:
-            writer.writerow({
-                "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                "action": action,
-                "status": status
-            })
+        for label, count in sessions.histogram.items():
+            writer.writerow({"duration": label, "sessions": count})
+
+    # Write chronological log CSV
+    chronological_log = f"output/chronological_log.{OUTPUT_EXTENSION}"
+    fieldnames = ["timestamp", "action", "status"] + extra_fields
+
+    with open_sink(
+        chronological_log,
+        fieldnames=fieldnames,
+        dictionary_columns=["action", "status"],
+        column_types={"duration": "float64"}
+    ) as writer:
+        writer.writeheader()
+        for entry in aggregates.iter_entries():
+            row = {
+                "timestamp": entry.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "action": entry.action,
+                "status": entry.status
+            }
+            for name in extra_fields:
+                row[name] = getattr(entry, name)
+            writer.writerow(row)
+
+
+def sample_preview(blocks, seed=None):
+    """
+    Estimates the action and status distributions from a sample of the log.
+
+    Sampled lines go through the same parser and LogAggregates as a
+    full run; shares are reported with confidence intervals.
+    """
+    path = get_file_path()
+    try:
+        sample = sample_input(path, blocks, seed=seed)
+    except (FileNotFoundError, PermissionError) as e:
+        print("Cannot sample input:", e)
+        return
+
+    parser = LogParser(LOG_SCHEMA_FILE)
+    detect_sample = [line for block in sample.blocks for line in block if line.strip()]
+    extract = parser.detect(detect_sample[:DETECT_LINES])
+
+    action_counts = []
+    status_counts = []
+    block_sizes = []
+    for block in sample.blocks:
+        part = LogAggregates()
+        for line in block:
+            if line.strip():
+                entry = extract(line)
+                if entry is not None:
+                    part.add(entry)
+        action_counts.append(part.action_count)
+        status_counts.append(part.status_count)
+        block_sizes.append(len(part.entries))
+
+    scale = sample.total_lines / sample.line_count() if sample.line_count() else 0
+    estimate = "" if sample.exact else "~"
+
+    print("\nSample Report")
+    print("---------------------")
+    print(f"Lines sampled: {sample.line_count()} of {estimate}{sample.total_lines} ({len(block_sizes)} blocks)")
+    print(f"Entries: {estimate}{round(sum(block_sizes) * scale)} "
+          f"(malformed: {estimate}{round(parser.stats.malformed_total() * scale)})")
+
+    for title, counts in [("Action", action_counts), ("Status", status_counts)]:
+        print(f"\n{title} Summary (share of entries)")
+        print("---------------------")
+        shares = estimate_shares(counts, block_sizes, exact=sample.exact)
+        for key, share in sorted(shares.items(), key=lambda item: (-item[1][0], item[0])):
+            print(f"{key}: {format_share(*share)}")
 
 
 if __name__ == "__main__":
-    log_analyzer()
+    parser = sample_argument_parser("Analyze a log file.")
+    add_memory_argument(parser)
+    args = add_report_arguments(parser, listing=True).parse_args()
+    if args.sample:
+        sample_preview(args.sample_blocks, args.seed)
+    else:
+        log_analyzer(args.quiet, *preview_bounds(args.head, args.tail, args.limit), args.max_memory)
@@ -0,0 +1,120 @@
+"""
+Parallel Log Analysis
+
+Splits a single uncompressed log into newline-aligned byte ranges and
+parses each range in its own process, which maps only its own range.
+Every worker sorts its entries by timestamp and writes them to disk as
+a run (see common/memory.py), then returns just its counts and parse
+statistics. The parent merges the counts in file order and k-way merges
+the sorted runs, which gives the same result a single pass would.
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from common.memory import read_run, write_run
+from common.sources import mmap_lines, newline_aligned_ranges
+from aggregates import LogAggregates, entry_time
+from log_parser import DETECT_LINES, ParseStats, compile_schema_bytes
+
+
+def analyze_range(path, start, end, schema, folder):
+    """
+    Worker: parses one byte range of the log into a sorted run.
+
+    Args:
+        path (str): Path to the log file.
+        start (int): Byte offset of the range (a line boundary).
+        end (int): End of the range (a line boundary).
+        schema (dict): Log schema to parse with.
+        folder (str): Folder for the run files.
+
+    Returns:
+        tuple: (LogAggregates with counts only, ParseStats, path of the
+        run sorted by timestamp, path of the run in file order or None
+        if the range was already in time order)
+    """
+    stats = ParseStats()
+    extract = compile_schema_bytes(schema, stats)
+    partial = LogAggregates()
+
+    in_order = True
+    last = None
+    for line in mmap_lines(path, start, end):
+        if not line.strip():
+            continue
+        entry = extract(line)
+        if entry is not None:
+            partial.add(entry)
+            if last is not None and entry.timestamp < last:
+                in_order = False
+            last = entry.timestamp
+
+    name = os.path.join(folder, f"range{start:012d}")
+    order_path = None
+    if not in_order:
+        # Sessions and rate windows still need the entries in file order
+        order_path = name + "-order.pickle"
+        write_run(order_path, partial.entries)
+        partial.sort_entries()
+
+    sorted_path = name + ".pickle"
+    write_run(sorted_path, partial.entries)
+    partial.entries = []
+
+    return partial, stats, sorted_path, order_path
+
+
+def analyze_parallel(path, parser, workers, watch=None, budget=None):
+    """
+    Parses and aggregates a log using several processes.
+
+    Args:
+        path (str): Path to an uncompressed log file.
+        parser (LogParser): Supplies the schema; its stats receive the
+            merged parse counts.
+        workers (int): Number of worker processes.
+        watch (callable | None): Called with every entry in file order,
+            as each partial result comes in.
+        budget (MemoryBudget | None): Its folder (or the system temp
+            folder) holds the sorted runs.
+
+    Returns:
+        LogAggregates: Merged counts, with the entries in sorted runs
+        on disk (see LogAggregates.add_run).
+    """
+    sample = []
+    for line in mmap_lines(path):
+        if line.strip():
+            sample.append(line)
+            if len(sample) >= DETECT_LINES:
+                break
+    parser.detect(sample)
+
+    ranges = newline_aligned_ranges(path, workers)
+    folder = tempfile.mkdtemp(prefix="log-runs-", dir=budget.folder if budget else None)
+    total = LogAggregates()
+    total.run_folder = folder
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(analyze_range, path, start, end, parser.schema, folder)
+                for start, end in ranges
+            ]
+            # Merge in file order so the counts and watched entries line
+            # up with a serial read
+            for future in futures:
+                partial, stats, sorted_path, order_path = future.result()
+                if watch is not None:
+                    for entry in read_run(order_path or sorted_path):
+                        watch(entry)
+                total.merge(partial)
+                total.add_run(sorted_path)
+                parser.stats.merge(stats)
+    except BaseException:
+        total.close()
+        raise
+
+    return total
@@ -0,0 +1,202 @@
+"""
+Session Reconstruction
+
+Pairs LOGIN and LOGOUT events into sessions and summarizes how long
+sessions last, without keeping a list of every duration.
+
+- Open sessions live in a table keyed by user (logs without a user
+  column share a single key). The table is bounded: sessions idle
+  longer than SESSION_TIMEOUT are evicted as timed out, and if the
+  table is full the oldest open session is evicted.
+- Durations go into a QuantileSketch, a log-bucket histogram (the
+  DDSketch idea): each bucket covers a 2% relative range, so any
+  percentile is accurate to about 1% while memory depends only on the
+  spread of durations, not on their number.
+"""
+
+import math
+from collections import OrderedDict
+from datetime import timedelta
+
+# Sessions with no LOGOUT after this long are dropped as timed out
+SESSION_TIMEOUT = timedelta(hours=8)
+
+# Maximum number of sessions open at the same time
+MAX_OPEN_SESSIONS = 100_000
+
+# Relative accuracy of reported percentiles
+RELATIVE_ACCURACY = 0.01
+
+# Upper bounds (in seconds) of the duration histogram buckets
+HISTOGRAM_BOUNDS = [
+    ("< 1 min", 60),
+    ("1-5 min", 5 * 60),
+    ("5-15 min", 15 * 60),
+    ("15-60 min", 60 * 60),
+    ("1-4 h", 4 * 60 * 60),
+    ("> 4 h", math.inf),
+]
+
+
+class QuantileSketch:
+    """
+    Streaming quantile estimate with bounded relative error.
+
+    Values are counted in logarithmic buckets; a quantile is answered
+    from the cumulative bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Adds one non-negative value."""
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        """Adds the values counted by another sketch into this one."""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimates the q-th quantile (0 <= q <= 1).
+
+        Returns:
+            float | None: Estimated value, or None if the sketch is empty.
+        """
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Middle of the bucket (gamma^(i-1), gamma^i]
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class SessionTracker:
+    """
+    Builds sessions from a time-ordered stream of log events.
+
+    A successful LOGIN opens a session for its user; the next LOGOUT
+    for that user closes it. A second LOGIN while a session is open
+    replaces the old session, which is counted as abandoned. Sessions
+    open longer than the timeout are closed as timed out (a LOGOUT after
+    that counts as unmatched).
+    """
+
+    def __init__(self, timeout=SESSION_TIMEOUT, max_open=MAX_OPEN_SESSIONS):
+        self.timeout = timeout
+        self.max_open = max_open
+        self.open_sessions = OrderedDict()
+        self.durations = QuantileSketch()
+        self.histogram = {label: 0 for label, _ in HISTOGRAM_BOUNDS}
+        self.abandoned = 0
+        self.timed_out = 0
+        self.evicted = 0
+        self.unmatched_logouts = 0
+
+    def add(self, timestamp, action, status, user=None):
+        """Processes one log event; only LOGIN and LOGOUT open or close sessions."""
+        # Every event moves the clock, so a session past its timeout is
+        # closed even if its user only logs out (or is never seen) later
+        self.expire(timestamp)
+
+        action = action.upper()
+        if action == "LOGIN":
+            if status.upper() != "SUCCESS":
+                return
+            if user in self.open_sessions:
+                del self.open_sessions[user]
+                self.abandoned += 1
+            elif len(self.open_sessions) >= self.max_open:
+                self.open_sessions.popitem(last=False)
+                self.evicted += 1
+            self.open_sessions[user] = timestamp
+
+        elif action == "LOGOUT":
+            start = self.open_sessions.pop(user, None)
+            if start is None:
+                self.unmatched_logouts += 1
+                return
+            self.record(max((timestamp - start).total_seconds(), 0.0))
+
+    def expire(self, now):
+        """Evicts sessions that have been open longer than the timeout."""
+        # The table is ordered by login time, so stop at the first fresh session
+        while self.open_sessions:
+            user, start = next(iter(self.open_sessions.items()))
+            if now - start <= self.timeout:
+                break
+            del self.open_sessions[user]
+            self.timed_out += 1
+
+    def record(self, seconds):
+        """Adds a finished session's duration to the sketch and histogram."""
+        self.durations.add(seconds)
+        for label, bound in HISTOGRAM_BOUNDS:
+            if seconds < bound:
+                self.histogram[label] += 1
+                break
+
+    def summary(self):
+        """
+        Returns the session statistics.
+
+        Returns:
+            list: (metric, value) tuples; durations are in seconds.
+        """
+        sketch = self.durations
+
+        def seconds(value):
+            return None if value is None else round(value, 1)
+
+        return [
+            ("sessions", sketch.count),
+            ("still_open", len(self.open_sessions)),
+            ("timed_out", self.timed_out),
+            ("abandoned", self.abandoned),
+            ("evicted", self.evicted),
+            ("unmatched_logouts", self.unmatched_logouts),
+            ("min_seconds", seconds(sketch.min)),
+            ("mean_seconds", seconds(sketch.mean())),
+            ("p50_seconds", seconds(sketch.quantile(0.50))),
+            ("p90_seconds", seconds(sketch.quantile(0.90))),
+            ("p95_seconds", seconds(sketch.quantile(0.95))),
+            ("p99_seconds", seconds(sketch.quantile(0.99))),
+            ("max_seconds", seconds(sketch.max)),
+        ]
@@ -0,0 +1,90 @@
+"""
+Tests for the log parser's timestamp handling.
+
+Run from this folder with:  python3 -m unittest test_log_parser
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from aggregates import LogAggregates
+from log_parser import LogParser
+from main import read_text_file
+
+MIXED_LOG = [
+    "2026-01-19 09:12:01,LOGIN,SUCCESS\n",
+    "2026-01-19 09:13:01+05:00,UPLOAD,ERROR\n",
+    "2026-01-19,UPLOAD,SUCCESS\n",
+    "2026-01-19T09:14:01Z,UPLOAD,SUCCESS\n",
+    "2026-01-19 09:15:42,UPLOAD,ERROR\n",
+    "2026-01-19 09:17:05,LOGOUT,SUCCESS\n",
+]
+
+
+class MixedTimestampTest(unittest.TestCase):
+    """Lines whose timestamps only fromisoformat accepts are malformed."""
+
+    def check(self, lines):
+        parser = LogParser()
+        aggregates = LogAggregates()
+        for entry in parser.parse_lines(lines):
+            aggregates.add(entry)
+
+        # Would raise TypeError if an offset-aware timestamp got through
+        aggregates.sort_entries()
+
+        self.assertEqual(parser.stats.parsed, 3)
+        self.assertEqual(parser.stats.malformed_total(), 3)
+        self.assertEqual([entry.action for entry in aggregates.entries], ["LOGIN", "UPLOAD", "LOGOUT"])
+        self.assertTrue(all(entry.timestamp.tzinfo is None for entry in aggregates.entries))
+
+    def test_text_lines(self):
+        self.check(MIXED_LOG)
+
+    def test_bytes_lines(self):
+        self.check([line.encode("ascii") for line in MIXED_LOG])
+
+
+# Two rotated shards with day-first timestamps, each in time order: as
+# strings, "02/Feb" would sort before "28/Jan"
+APACHE_SHARDS = {
+    "app.log.1": [
+        "28/Jan/2026:09:00:00,LOGIN,SUCCESS\n",
+        "02/Feb/2026:09:00:00,LOGOUT,SUCCESS\n",
+    ],
+    "app.log.2": [
+        "30/Jan/2026:09:00:00,UPLOAD,SUCCESS\n",
+        "\n",
+        "01/Feb/2026:09:00:00,DOWNLOAD,ERROR\n",
+    ],
+}
+
+
+class RotatedShardTest(unittest.TestCase):
+    """Shards are merged on the timestamps the detected schema parses."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="shards-")
+        for name, lines in APACHE_SHARDS.items():
+            with open(os.path.join(self.folder, name), "w") as file:
+                file.writelines(lines)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_apache_time_order(self):
+        parser = LogParser()
+        lines = read_text_file(os.path.join(self.folder, "app.log.*"), parser)
+        actions = [entry.action for entry in parser.parse_lines(lines)]
+
+        self.assertEqual(parser.schema["name"], "apache_time")
+        self.assertEqual(actions, ["LOGIN", "UPLOAD", "DOWNLOAD", "LOGOUT"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,10 +12,20 @@ Designed as a portfolio project demonstrating:
 - Output organization
 """
 
-import csv
 import os
+import sys
+
+# Make the shared helpers in the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.dedup import DuplicateIndex, NearDuplicateIndex
+from common.sinks import open_sink
+from common.sources import CsvInput
+from common.spool import atomic_outputs, run_spool, spool_stem, watch_argument_parser
 
 # Default input and output files
+# (the output format follows the extension, see common/sinks.py)
+# INPUT_FILE may also be a folder or a glob such as 'exports/*.csv.gz'
 INPUT_FILE = "input.csv"
 OUTPUT_FILE = "output/validoutput.csv"
 
@@ -54,12 +64,12 @@ def no_space_lower(value: str) -> str:
     return cleaned.lower()
 
 
-def clean_csv():
+def clean_csv(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
     """
     Main function to clean the CSV file.
 
-    Reads INPUT_FILE, removes spaces from all values, lowercases
-    usernames and emails, and writes the cleaned data to OUTPUT_FILE.
+    Reads input_file, removes spaces from all values, lowercases
+    usernames and emails, and writes the cleaned data to output_file.
 
     Handles:
     - Missing file
@@ -67,30 +77,38 @@ def clean_csv():
     - Missing columns
     - Unexpected row errors
 
+    Rows whose cleaned email was already written are skipped, and
+    usernames that look like an earlier one are reported.
+
     Creates the output folder if it doesn't exist.
+
+    Returns:
+        int | None: Rows written, or None if the file could not be cleaned.
     """
     # Ensure output folder exists
-    os.makedirs("output", exist_ok=True)
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
 
     fieldnames = ["username", "password", "email"]
 
-    try:
-        with open(INPUT_FILE, 'r', newline="") as infile, \
-             open(OUTPUT_FILE, 'w', newline="") as outfile:
+    seen_emails = DuplicateIndex()
+    similar_usernames = NearDuplicateIndex()
+    rows_written = 0
 
-            reader = csv.DictReader(infile)
+    try:
+        with CsvInput(input_file) as reader, \
+             open_sink(output_file, fieldnames=fieldnames) as writer:
 
             # Check required columns
             required_fields = {"username", "password", "email"}
             missing = required_fields - set(reader.fieldnames or [])
             if missing:
                 print(f"CSV missing required columns: {missing}")
-                return
+                return None
 
-            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
             writer.writeheader()
 
-            for row in reader:
+            # Row numbers start at 2 because line 1 is the header
+            for row_number, row in enumerate(reader, start=2):
                 try:
                     username = row.get("username") or ""
                     password = row.get("password") or ""
@@ -100,11 +118,24 @@ def clean_csv():
                     clean_password = no_space(password)
                     clean_email = no_space_lower(email)
 
+                    first_row = seen_emails.check(clean_email, row_number)
+                    if first_row is not None:
+                        print(f"Row {row_number}: duplicate of row {first_row}, skipping")
+                        continue
+
+                    earlier = similar_usernames.check(clean_username, row_number)
+                    if earlier is not None:
+                        print(
+                            f"Row {row_number}: username '{clean_username}' looks like "
+                            f"'{earlier[0]}' (row {earlier[1]})"
+                        )
+
                     writer.writerow({
                         "username": clean_username,
                         "password": clean_password,
                         "email": clean_email
                     })
+                    rows_written += 1
 
                 except KeyError as e:
                     print(f"Row missing key {e}, skipping")
@@ -119,9 +150,36 @@ def clean_csv():
         print("Unexpected error:", e)
     else:
         print("CSV file cleaned successfully")
+        return rows_written
     finally:
+        seen_emails.close()
+        similar_usernames.close()
         print("CSV file cleaning attempt finished")
+    return None
+
+
+def clean_spool_file(path, output_dir):
+    """
+    Daemon job: cleans one spooled file into output_dir.
+
+    The cleaned file only appears (as <name>.clean.csv) once it is
+    complete.
+
+    Returns:
+        int: Rows written.
+    """
+    output_file = os.path.join(output_dir, f"{spool_stem(path)}.clean.csv")
+    with atomic_outputs([output_file]) as (temp_file,):
+        rows = clean_csv(path, temp_file)
+        if rows is None:
+            raise RuntimeError(f"could not clean {path}")
+    return rows
 
 
 if __name__ == "__main__":
-    clean_csv()
+    args = watch_argument_parser("Clean usernames, passwords and emails in a CSV file.").parse_args()
+    if args.watch:
+        run_spool(args.watch, clean_spool_file, args.output, args.done, args.failed,
+                  workers=args.workers, once=args.once)
+    else:
+        clean_csv()
@@ -0,0 +1,7 @@
+"""
+Shared helpers for the portfolio projects.
+
+Each project folder is still run on its own (``python3 main.py``);
+the scripts add the repository root to ``sys.path`` so they can
+import from this package.
+"""
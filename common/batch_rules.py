@@ -0,0 +1,304 @@
+"""
+Batch Rule Evaluation
+
+Checks a whole block of values against a field's rules at once with
+NumPy, instead of running each rule's Python loop over the characters
+of every value.
+
+- A block of ASCII values is packed into a padded uint8 matrix (one row
+  per value) plus a vector of lengths.
+- Every rule type that can be vectorized becomes a mask over the block.
+  Character classes and allowed characters are 128-entry lookup tables,
+  merged into one table with a bit per rule: a single lookup plus an OR
+  over each row tells which classes occur in every value. Repeated
+  characters are found by comparing the matrix with shifted copies of
+  itself; starts_with_letter looks at the first column only.
+- Rules are applied in order to the rows that have not failed yet, so
+  each row gets the first failing rule, exactly like the scalar engine.
+  Messages come from the rule's own scalar check, called only for rows
+  that failed (once per rule when the message is fixed).
+
+Rule types without a vector form (regex, email_format), values with
+non-ASCII or NUL characters and values longer than MAX_WIDTH are checked with
+the scalar rules, so results never differ. Without NumPy everything
+runs through the scalar rules.
+"""
+
+from common.rules import CHARACTER_CLASSES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Longer values are checked one by one (keeps the padded matrix small)
+MAX_WIDTH = 128
+
+ASCII_SIZE = 128
+
+
+# -----------------------------
+# Packing
+# -----------------------------
+
+class PackedValues:
+    """
+    A block of ASCII strings as a padded uint8 matrix plus lengths.
+
+    ``row_bits`` is the OR of the field's lookup-table bits (see
+    BatchFieldRules) over the characters of each value, ``first_bits``
+    the bits of its first character. Values contain no NUL characters,
+    so the zero padding never matches a table.
+    """
+
+    def __init__(self, text, lengths, table):
+        count = len(lengths)
+        width = max(int(lengths.max()), 1) if count else 1
+        self.lengths = lengths
+        # True for positions inside the value, False for padding
+        self.inside = np.arange(width) < lengths[:, None]
+        # The mask is row-major, so assigning the joined characters to it
+        # fills each row with its own value
+        self.codes = np.zeros((count, width), dtype=np.uint8)
+        self.codes[self.inside] = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        bits = np.take(table, self.codes)
+        self.row_bits = np.bitwise_or.reduce(bits, axis=1)
+        self.first_bits = bits[:, 0]
+
+    def none(self):
+        return np.zeros(len(self.lengths), dtype=bool)
+
+
+def class_table(test):
+    """Lookup table: ASCII code -> test(character)."""
+    return np.array([test(chr(code)) for code in range(ASCII_SIZE)], dtype=bool)
+
+
+def chars_table(chars):
+    """Lookup table: ASCII code -> character is in chars."""
+    table = np.zeros(ASCII_SIZE, dtype=bool)
+    for char in chars:
+        if ord(char) < ASCII_SIZE:
+            table[ord(char)] = True
+    return table
+
+
+# -----------------------------
+# Vectorized rule types
+# -----------------------------
+# Each builder takes the rule's settings plus add_table(table), which
+# registers a 128-entry lookup table and returns its bit in
+# ``packed.row_bits``. It returns mask(packed): True for every value that
+# fails the rule.
+
+def vector_not_empty(rule, add_table):
+    return lambda packed: packed.lengths == 0
+
+
+def vector_min_length(rule, add_table):
+    limit = int(rule["value"])
+    return lambda packed: packed.lengths < limit
+
+
+def vector_max_length(rule, add_table):
+    limit = int(rule["value"])
+    return lambda packed: packed.lengths > limit
+
+
+def vector_not_contains(rule, add_table):
+    text = rule["value"]
+    if not text:
+        return lambda packed: ~packed.none()
+    if not text.isascii():
+        # An ASCII value cannot contain it
+        return lambda packed: packed.none()
+    pattern = text.encode("ascii")
+    size = len(pattern)
+
+    def mask(packed):
+        width = packed.codes.shape[1]
+        if width < size:
+            return packed.none()
+        # found[:, i]: the pattern starts at position i (and ends inside the value)
+        found = packed.inside[:, size - 1:].copy()
+        for offset, code in enumerate(pattern):
+            found &= packed.codes[:, offset:width - size + 1 + offset] == code
+        return found.any(axis=1)
+    return mask
+
+
+def vector_no_whitespace(rule, add_table):
+    bit = add_table(class_table(str.isspace))
+    return lambda packed: (packed.row_bits & bit) != 0
+
+
+def vector_not_digits_only(rule, add_table):
+    # Digits only = not empty and no character outside the digits
+    bit = add_table(~class_table(str.isdigit))
+    return lambda packed: (packed.lengths > 0) & ((packed.row_bits & bit) == 0)
+
+
+def vector_starts_with_letter(rule, add_table):
+    bit = add_table(class_table(str.isalpha))
+    return lambda packed: (packed.first_bits & bit) == 0
+
+
+def vector_allowed_chars(rule, add_table):
+    bit = add_table(~chars_table(rule["chars"]))
+    return lambda packed: (packed.row_bits & bit) != 0
+
+
+def vector_requires(rule, add_table):
+    bit = add_table(class_table(CHARACTER_CLASSES[rule["class"]]))
+    return lambda packed: (packed.row_bits & bit) == 0
+
+
+def vector_max_repeats(rule, add_table):
+    limit = int(rule["value"])
+
+    def mask(packed):
+        width = packed.codes.shape[1]
+        if width <= limit:
+            return packed.none()
+        # run[:, i]: the next `limit` characters all equal character i
+        start = packed.codes[:, :width - limit]
+        run = packed.inside[:, limit:].copy()
+        for shift in range(1, limit + 1):
+            run &= packed.codes[:, shift:width - limit + shift] == start
+        return run.any(axis=1)
+    return mask
+
+
+# Rule type -> (builder, the rule always gives the same message)
+VECTOR_RULES = {
+    "not_empty": (vector_not_empty, True),
+    "min_length": (vector_min_length, True),
+    "max_length": (vector_max_length, True),
+    "not_contains": (vector_not_contains, True),
+    "no_whitespace": (vector_no_whitespace, True),
+    "not_digits_only": (vector_not_digits_only, True),
+    "starts_with_letter": (vector_starts_with_letter, True),
+    "allowed_chars": (vector_allowed_chars, False),
+    "requires": (vector_requires, True),
+    "max_repeats": (vector_max_repeats, True),
+}
+
+
+# -----------------------------
+# Evaluation
+# -----------------------------
+
+class BatchFieldRules:
+    """
+    Batch version of a field's compiled rules (a FieldRules object).
+
+    ``evaluate(values)`` gives, for every value, what
+    ``field_rules.first_failure(value)`` would: None for a valid value,
+    otherwise the (rule name, message) of the first failing rule.
+    """
+
+    def __init__(self, field_rules):
+        self.field_rules = field_rules
+        self.steps = []
+        if np is None:
+            return
+
+        tables = []
+
+        def add_table(table):
+            tables.append(table)
+            return 1 << (len(tables) - 1)
+
+        for rule, check, name in zip(field_rules.rules, field_rules.checks, field_rules.names):
+            mask, fixed_message = None, False
+            if rule["type"] in VECTOR_RULES:
+                builder, fixed_message = VECTOR_RULES[rule["type"]]
+                mask = builder(rule, add_table)
+            self.steps.append((mask, fixed_message, check, name))
+
+        # All lookup tables of the field in one table, one bit each, so a
+        # block needs a single lookup
+        dtype = np.uint8 if len(tables) <= 8 else np.uint16 if len(tables) <= 16 else np.uint64
+        self.table = np.zeros(ASCII_SIZE, dtype=dtype)
+        for i, table in enumerate(tables):
+            self.table[table] |= dtype(1 << i)
+        # Code 0 is the padding
+        self.table[0] = 0
+
+    def evaluate(self, values):
+        """
+        Args:
+            values (list): The field's values (str) for a block of rows.
+
+        Returns:
+            list: None or (rule name, message) per value.
+        """
+        first_failure = self.field_rules.first_failure
+        if np is None:
+            return [first_failure(value) for value in values]
+
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        text = "".join(values)
+        if text.isascii() and "\0" not in text and (not values or lengths.max() <= MAX_WIDTH):
+            return self.evaluate_packed(values, text, lengths)
+
+        # Mixed block: pack what can be packed, check the rest one by one
+        results = [None] * len(values)
+        positions = []
+        for i, value in enumerate(values):
+            if value.isascii() and "\0" not in value and len(value) <= MAX_WIDTH:
+                positions.append(i)
+            else:
+                results[i] = first_failure(value)
+        if positions:
+            packable = [values[i] for i in positions]
+            packed_results = self.evaluate_packed(packable, "".join(packable), lengths[positions])
+            for i, failure in zip(positions, packed_results):
+                results[i] = failure
+        return results
+
+    def evaluate_packed(self, values, text, lengths):
+        """evaluate() for values that are all ASCII, without NUL, and short enough."""
+        packed = PackedValues(text, lengths, self.table)
+        pending = np.ones(len(values), dtype=bool)
+        # Index of the step each row failed (len(steps) = passed), the
+        # failure of every fixed-message step, and per-row failures of
+        # the other steps
+        failed_step = np.full(len(values), len(self.steps), dtype=np.int64)
+        step_failures = [None] * (len(self.steps) + 1)
+        row_failures = {}
+
+        for step, (mask, fixed_message, check, name) in enumerate(self.steps):
+            if mask is None:
+                # No vector form: scalar check of the rows still pending
+                for j in np.flatnonzero(pending).tolist():
+                    message = check(values[j])
+                    if message is not None:
+                        row_failures[j] = (name, message)
+                        pending[j] = False
+                continue
+
+            failed = mask(packed) & pending
+            rows = np.flatnonzero(failed)
+            if not len(rows):
+                continue
+            pending &= ~failed
+            if fixed_message:
+                step_failures[step] = (name, check(values[rows[0]]))
+                failed_step[rows] = step
+            else:
+                for j in rows.tolist():
+                    row_failures[j] = (name, check(values[j]))
+
+        results = [step_failures[step] for step in failed_step.tolist()]
+        for j, failure in row_failures.items():
+            results[j] = failure
+        return results
+
+
+def compile_batch_rules(rules):
+    """
+    Returns:
+        dict: Field name -> BatchFieldRules, for a compiled rule set.
+    """
+    return {field: BatchFieldRules(field_rules) for field, field_rules in rules.items()}
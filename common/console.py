@@ -0,0 +1,122 @@
+"""
+Console Reports
+
+Buffered console output for the analyzers. A large log produces one
+line per entry, and a print() per line makes terminal or pipe writes
+the slowest part of the run; ``ConsoleReport`` collects lines and
+writes them in blocks of about BUFFER_CHARS characters instead.
+
+- ``quiet`` drops all report output, so only the CSV outputs are
+  written.
+- ``preview`` cuts a long listing down to its first and last entries
+  (``--head``, ``--tail``, ``--limit``); the entries in between are
+  never formatted.
+"""
+
+import sys
+from collections import deque
+from itertools import islice
+
+# Characters collected before they are written in one call
+BUFFER_CHARS = 64 * 1024
+
+
+class ConsoleReport:
+    """
+    Collects report lines and writes them to the console in blocks.
+
+    Use as a context manager (or call ``flush``) so the last block is
+    written.
+    """
+
+    def __init__(self, quiet=False, stream=None, buffer_chars=BUFFER_CHARS):
+        self.quiet = quiet
+        self.stream = stream if stream is not None else sys.stdout
+        self.buffer_chars = buffer_chars
+        self.buffer = []
+        self.buffered = 0
+
+    def line(self, text=""):
+        """Adds one line (like print(text))."""
+        if self.quiet:
+            return
+        self.buffer.append(text)
+        self.buffered += len(text) + 1
+        if self.buffered >= self.buffer_chars:
+            self.flush()
+
+    def flush(self):
+        """Writes the collected lines."""
+        if self.buffer:
+            self.stream.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
+            self.buffered = 0
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+
+def preview(items, head=None, tail=None):
+    """
+    Picks the part of a listing to show.
+
+    Args:
+        items (list | iterator): All entries. An iterator is read once:
+            only the first and last entries are kept, the rest counted.
+        head (int | None): Entries to show from the start.
+        tail (int | None): Entries to show from the end.
+        With neither set, every entry is shown.
+
+    Returns:
+        (list | iterator, int, list): First entries, number of entries
+        left out, last entries.
+    """
+    if head is None and tail is None:
+        return items, 0, []
+
+    if not isinstance(items, list):
+        first = list(islice(items, max(head or 0, 0)))
+        last = deque(maxlen=max(tail or 0, 0))
+        seen = 0
+        for item in items:
+            last.append(item)
+            seen += 1
+        return first, seen - len(last), list(last)
+
+    head = min(max(head or 0, 0), len(items))
+    tail = min(max(tail or 0, 0), len(items) - head)
+    last = items[len(items) - tail:] if tail else []
+    return items[:head], len(items) - head - tail, last
+
+
+def preview_bounds(head=None, tail=None, limit=None):
+    """
+    Turns --head/--tail/--limit into (head, tail).
+
+    --limit N shows at most N entries, split between the start and the
+    end of the listing; explicit --head/--tail take precedence.
+    """
+    if limit is not None and head is None and tail is None:
+        return limit - limit // 2, limit // 2
+    return head, tail
+
+
+def add_report_arguments(parser, listing=False):
+    """
+    Adds --quiet (and, for reports with a long listing, --head, --tail
+    and --limit) to an ArgumentParser.
+    """
+    parser.add_argument("--quiet", action="store_true",
+                        help="print nothing, only write the output files")
+    if listing:
+        parser.add_argument("--head", type=int, metavar="N",
+                            help="list only the first N entries")
+        parser.add_argument("--tail", type=int, metavar="N",
+                            help="list only the last N entries")
+        parser.add_argument("--limit", type=int, metavar="N",
+                            help="list at most N entries (first and last)")
+    return parser
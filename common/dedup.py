@@ -0,0 +1,258 @@
+"""
+Duplicate Detection Helpers
+
+Streaming duplicate checks for the CSV tools. Rows are checked one at
+a time while the file is read, so nothing has to be loaded into memory
+up front.
+
+- DuplicateIndex finds exact repeats of a key (for example an email
+  address compared case-insensitively). Keys are stored as short
+  hashes and moved to an on-disk table once the in-memory index
+  grows past a limit.
+- NearDuplicateIndex finds usernames that only differ in separators,
+  case, or look-alike characters (john.doe / john-doe / JohnDoe). It
+  spills to disk the same way.
+"""
+
+import dbm
+import hashlib
+import os
+import shutil
+import tempfile
+
+# Number of keys kept in memory before the index spills to disk
+MAX_MEMORY_KEYS = 1_000_000
+
+# Characters ignored when comparing usernames
+SEPARATOR_CHARS = "._- "
+
+# Look-alike characters mapped to the letter they are confused with
+CONFUSABLE_CHARS = str.maketrans({
+    "0": "o",
+    "1": "l",
+    "i": "l",
+    "3": "e",
+    "5": "s",
+    "$": "s",
+    "@": "a",
+})
+
+
+def hash_key(key):
+    """
+    Hashes a key into a short fixed-size digest.
+
+    Args:
+        key (str): Key to hash.
+
+    Returns:
+        bytes: 16-byte digest of the key.
+    """
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+def normalize_email(value):
+    """Returns the comparison key for an email (trimmed and casefolded)."""
+    return value.strip().casefold()
+
+
+def normalize_username(value):
+    """
+    Builds the comparison key used to spot near-duplicate usernames.
+
+    The key is casefolded, has separators removed, and maps look-alike
+    characters to a single letter, so 'John.Doe', 'john-doe' and
+    'j0hndoe' all share the key 'johndoe'.
+
+    Args:
+        value (str): Raw username.
+
+    Returns:
+        str: Normalized key.
+    """
+    key = value.strip().casefold()
+    for ch in SEPARATOR_CHARS:
+        key = key.replace(ch, "")
+    return key.translate(CONFUSABLE_CHARS)
+
+
+class SpillingIndex:
+    """
+    Dictionary of hashed keys that moves to disk when it grows too big.
+
+    Up to ``max_memory_keys`` entries are kept in a dictionary. After
+    that, the dictionary is moved into a dbm file in a temporary folder
+    and later lookups fall back to it. Subclasses say how a value is
+    stored on disk (``encode``/``decode``).
+    """
+
+    # Name used in the spill message
+    label = "Index"
+
+    def __init__(self, max_memory_keys=MAX_MEMORY_KEYS):
+        self.max_memory_keys = max_memory_keys
+        self.memory = {}
+        self.disk = None
+        self.spill_dir = None
+
+    def encode(self, value):
+        return str(value)
+
+    def decode(self, stored):
+        return stored.decode("utf-8")
+
+    def get(self, digest):
+        """Returns the value stored for a digest, or None."""
+        value = self.memory.get(digest)
+        if value is not None:
+            return value
+
+        if self.disk is not None:
+            stored = self.disk.get(digest)
+            if stored is not None:
+                return self.decode(stored)
+        return None
+
+    def put(self, digest, value):
+        """Stores a value for a digest (spilling to disk when full)."""
+        self.memory[digest] = value
+        if len(self.memory) >= self.max_memory_keys:
+            self._spill()
+
+    def _spill(self):
+        """Moves the in-memory keys into the on-disk table."""
+        if self.disk is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="dedup_")
+            self.disk = dbm.open(os.path.join(self.spill_dir, "keys"), "c")
+            print(f"{self.label} spilling to disk: {self.spill_dir}")
+
+        for digest, value in self.memory.items():
+            self.disk[digest] = self.encode(value)
+        self.memory.clear()
+
+    def close(self):
+        """Releases the on-disk table, if one was created."""
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DuplicateIndex(SpillingIndex):
+    """
+    Remembers which keys have been seen and on which row.
+
+    Keys are stored as short hashes (see SpillingIndex for how the
+    index moves to disk).
+
+    ``check`` looks a key up and records it in one step. To record only
+    keys of rows that are accepted, use ``find`` and later ``add``. An
+    empty key (a blank field) is never recorded or reported.
+    """
+
+    label = "Duplicate index"
+
+    def decode(self, stored):
+        return int(stored)
+
+    def find(self, key):
+        """
+        Returns the row number of the first occurrence of a key, or None
+        if the key has not been recorded.
+        """
+        if not key:
+            return None
+        return self.get(hash_key(key))
+
+    def add(self, key, row_number):
+        """Records the row a key was first seen on."""
+        if not key:
+            return
+        self.put(hash_key(key), row_number)
+
+    def check(self, key, row_number):
+        """
+        Records a key and reports whether it was seen before.
+
+        Args:
+            key (str): Normalized key for the row.
+            row_number (int): Row number of the current record.
+
+        Returns:
+            int | None: Row number of the first occurrence, or None
+            if this is the first time the key is seen (or it is empty).
+        """
+        first_row = self.find(key)
+        if first_row is None:
+            self.add(key, row_number)
+        return first_row
+
+
+class NearDuplicateIndex(SpillingIndex):
+    """
+    Flags usernames that normalize to the same key as an earlier one.
+
+    Only the first username seen for each key is stored, under a hash of
+    the key, so memory grows with the number of distinct keys, not with
+    the input size; past ``max_memory_keys`` the index moves to disk like
+    a DuplicateIndex.
+    """
+
+    label = "Near-duplicate index"
+
+    def encode(self, value):
+        username, row_number = value
+        return f"{row_number}\t{username}"
+
+    def decode(self, stored):
+        row_number, username = stored.decode("utf-8").split("\t", 1)
+        return username, int(row_number)
+
+    def find(self, value):
+        """
+        Returns (first_value, first_row) of an earlier look-alike
+        username, or None. Exact repeats (same raw value) are not
+        reported here; use a DuplicateIndex for those.
+        """
+        key = normalize_username(value)
+        if not key:
+            return None
+
+        earlier = self.get(hash_key(key))
+        if earlier is None or earlier[0] == value:
+            return None
+        return earlier
+
+    def add(self, value, row_number):
+        """Records a username, unless its key already has a first username."""
+        key = normalize_username(value)
+        if not key:
+            return
+        digest = hash_key(key)
+        if self.get(digest) is None:
+            self.put(digest, (value, row_number))
+
+    def check(self, value, row_number):
+        """
+        Records a username and reports a near-duplicate if there is one.
+
+        Args:
+            value (str): Raw username.
+            row_number (int): Row number of the current record.
+
+        Returns:
+            tuple | None: (first_value, first_row) of the earlier
+            look-alike username, or None.
+        """
+        earlier = self.find(value)
+        if earlier is None:
+            self.add(value, row_number)
+        return earlier
@@ -0,0 +1,138 @@
+"""
+Error Summaries
+
+Counts why rows were rejected while a validator runs, so a summary does
+not mean re-reading the invalid-records CSV and splitting its free-text
+error column.
+
+- Every distinct (field, rule) pair, e.g. ("password", "min_length"),
+  is interned once to a small integer id; per-row bookkeeping only
+  touches those ids, so the counters stay the same size however many
+  rows are checked.
+- Errors that fail together in one row are counted as pairs (a single
+  int key per pair), to show which problems usually come together.
+- For each error the first MAX_EXAMPLES rejected rows are kept as
+  examples (row number, message, value), so a report can point at
+  concrete rows to look at.
+
+``write`` saves one line per error through open_sink, so the report can
+be CSV, JSONL, Parquet, ... like the other outputs.
+"""
+
+from array import array
+
+from common.sinks import open_sink
+
+# Example rows kept per error
+MAX_EXAMPLES = 5
+
+# Longest value stored in an example (longer values are cut)
+MAX_EXAMPLE_CHARS = 60
+
+# Co-occurring errors listed per error in the report
+TOP_PAIRS = 3
+
+# Pair keys pack two ids into one int: smaller_id * PAIR_STRIDE + larger_id
+PAIR_STRIDE = 1 << 20
+
+SUMMARY_FIELDS = ["error", "rows", "share_of_rows", "share_of_invalid", "often_with", "examples"]
+
+
+class ErrorSummary:
+    """
+    Rejection counts per field and rule, their co-occurrence, and a few
+    example rows for each.
+    """
+
+    def __init__(self, max_examples=MAX_EXAMPLES):
+        self.max_examples = max_examples
+        self.ids = {}             # (field, rule) -> id
+        self.labels = []          # id -> "field.rule"
+        self.counts = array("q")  # id -> rejected rows
+        self.examples = []        # id -> [(row_number, message, value)]
+        self.pairs = {}           # packed id pair -> rows with both errors
+        self.rows = 0
+        self.invalid_rows = 0
+
+    def error_id(self, field, rule):
+        """Returns the id of a (field, rule) error, creating it on first use."""
+        key = (field, rule)
+        error_id = self.ids.get(key)
+        if error_id is None:
+            error_id = len(self.labels)
+            self.ids[key] = error_id
+            self.labels.append(f"{field}.{rule}")
+            self.counts.append(0)
+            self.examples.append([])
+        return error_id
+
+    def add_row(self, row_number, failures, row=None):
+        """
+        Counts one checked row.
+
+        Args:
+            row_number (int): Line number of the row, for the examples.
+            failures (list): (field, rule, message) for every failed
+                check; empty for a valid row.
+            row (dict | None): The row, to keep failing values as examples.
+        """
+        self.rows += 1
+        if not failures:
+            return
+        self.invalid_rows += 1
+
+        ids = []
+        for field, rule, message in failures:
+            error_id = self.error_id(field, rule)
+            self.counts[error_id] += 1
+            examples = self.examples[error_id]
+            if len(examples) < self.max_examples:
+                value = row.get(field, "") if row else ""
+                examples.append((row_number, message, value[:MAX_EXAMPLE_CHARS]))
+            ids.append(error_id)
+
+        if len(ids) > 1:
+            ids.sort()
+            for i, first in enumerate(ids):
+                for second in ids[i + 1:]:
+                    key = first * PAIR_STRIDE + second
+                    self.pairs[key] = self.pairs.get(key, 0) + 1
+
+    def often_with(self, error_id, limit=TOP_PAIRS):
+        """Returns the errors most often seen in the same row, as (label, rows)."""
+        partners = []
+        for key, count in self.pairs.items():
+            first, second = divmod(key, PAIR_STRIDE)
+            if first == error_id:
+                partners.append((count, second))
+            elif second == error_id:
+                partners.append((count, first))
+        partners.sort(key=lambda item: (-item[0], item[1]))
+        return [(self.labels[other], count) for count, other in partners[:limit]]
+
+    def report_rows(self):
+        """
+        Returns:
+            list: One report dictionary per error, most frequent first.
+        """
+        rows = []
+        order = sorted(range(len(self.labels)), key=lambda i: (-self.counts[i], i))
+        for error_id in order:
+            count = self.counts[error_id]
+            rows.append({
+                "error": self.labels[error_id],
+                "rows": count,
+                "share_of_rows": f"{count / self.rows * 100:.2f}%",
+                "share_of_invalid": f"{count / self.invalid_rows * 100:.2f}%",
+                "often_with": "; ".join(f"{label} ({pair_count})"
+                                        for label, pair_count in self.often_with(error_id)),
+                "examples": "; ".join(f"row {row_number}: {value!r} ({message})"
+                                      for row_number, message, value in self.examples[error_id]),
+            })
+        return rows
+
+    def write(self, path):
+        """Writes the report to path (format from the extension, see open_sink)."""
+        with open_sink(path, fieldnames=SUMMARY_FIELDS, column_types={"rows": "int64"}) as writer:
+            writer.writeheader()
+            writer.writerows(self.report_rows())
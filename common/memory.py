@@ -0,0 +1,360 @@
+"""
+Memory Budget
+
+Keeps the analyzers' big in-memory structures under a memory budget
+(``--max-memory``) by spilling them to disk and merging them back at
+the end, instead of growing until the process is killed.
+
+- ``MemoryBudget`` samples the process's resident memory (from
+  /proc/self/statm, without file-backed pages such as an mmapped log;
+  elsewhere the memory traced by tracemalloc) every CHECK_INTERVAL
+  additions. Each spill is logged to stderr.
+- Python reuses freed memory rather than handing it back, so resident
+  memory stays high after a spill. ``SpillTrigger`` therefore remembers
+  how big a structure was when the budget was first exceeded (scaled
+  down by how far over the budget the process was) and spills again
+  whenever it reaches that size.
+- ``SpillRuns`` writes sorted runs (pickled batches of records) to a
+  temporary folder and merges them back with heapq.merge. Runs are
+  merged in the order they were written, and earlier runs win ties, so
+  the result is the same as one stable sort of everything.
+- ``external_sort`` and ``SpillingCounter`` build on it: a sort that
+  works on more records than fit in memory, and a counter that spills
+  sorted partial counts and adds them up while merging.
+"""
+
+import heapq
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from operator import itemgetter
+
+# Additions between two memory samples
+CHECK_INTERVAL = 10_000
+
+# A structure is never spilled with fewer items than this
+MIN_SPILL_ITEMS = 10_000
+
+# Records per pickled batch inside a run file. A merge holds one batch
+# of every open run in memory, so this is kept small.
+RUN_BATCH = 1_000
+
+# Runs merged at once; more runs are first merged into one bigger run
+MAX_OPEN_RUNS = 50
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(text):
+    """
+    Parses a size such as '512M', '2G' or '1500000' (bytes).
+
+    Raises:
+        ValueError: If the text is not a size.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid size: {text!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def current_memory():
+    """
+    Resident memory of this process in bytes, not counting file-backed
+    pages (a log read through mmap is not memory the process holds).
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            fields = file.read().split()
+        return (int(fields[1]) - int(fields[2])) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    # No /proc: count what Python allocates from now on
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def format_bytes(size):
+    return f"{size / 1024 ** 2:.0f} MB"
+
+
+class MemoryBudget:
+    """A memory limit shared by the structures of one run."""
+
+    def __init__(self, max_bytes, check_interval=CHECK_INTERVAL, folder=None):
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.folder = folder
+        self.spills = 0
+
+    def log_spill(self, what, count, path):
+        """Reports one spill on stderr."""
+        self.spills += 1
+        print(
+            f"Memory: {format_bytes(current_memory())} in use, budget "
+            f"{format_bytes(self.max_bytes)}; spilled {count} {what} to {path}",
+            file=sys.stderr,
+        )
+
+
+class SpillTrigger:
+    """
+    Decides when one growing structure should be spilled.
+
+    Call with the structure's current size after every addition (or
+    with the number added, after adding several at once). A known
+    ``limit`` (the size another structure of the same records spilled
+    at) is used from the start, and is lowered like a measured one if
+    the process still goes over the budget.
+    """
+
+    def __init__(self, budget, limit=None):
+        self.budget = budget
+        self.limit = limit
+        self.calls = 0
+
+    def __call__(self, size, added=1):
+        if self.limit is not None and size >= self.limit:
+            return True
+        self.calls += added
+        if self.calls < self.budget.check_interval:
+            return False
+        self.calls = 0
+        used = current_memory()
+        if used > self.budget.max_bytes and size >= MIN_SPILL_ITEMS:
+            # Shrink by how far the process is over the budget, since the
+            # other structures may already be at their limits
+            self.limit = max(MIN_SPILL_ITEMS, size * self.budget.max_bytes // used)
+            return True
+        return False
+
+
+def write_run(path, records):
+    """
+    Writes records to a run file as pickled batches.
+
+    Returns:
+        int: Number of records written.
+    """
+    count = 0
+    batch = []
+    with open(path, "wb") as file:
+        for record in records:
+            batch.append(record)
+            if len(batch) == RUN_BATCH:
+                pickle.dump(batch, file, protocol=pickle.HIGHEST_PROTOCOL)
+                count += len(batch)
+                batch = []
+        if batch:
+            pickle.dump(batch, file, protocol=pickle.HIGHEST_PROTOCOL)
+            count += len(batch)
+    return count
+
+
+def read_run(path):
+    """Yields the records of a run file in the order they were written."""
+    with open(path, "rb") as file:
+        while True:
+            try:
+                batch = pickle.load(file)
+            except EOFError:
+                return
+            yield from batch
+
+
+class SpillRuns:
+    """
+    Sorted runs of records on disk, merged back in sorted order.
+
+    Args:
+        budget (MemoryBudget): Receives the spill log; its folder (or
+            the system temp folder) holds the runs.
+        what (str): What the records are, for the log ("log entries").
+        key (callable | None): Sort key of the records.
+    """
+
+    def __init__(self, budget, what, key=None):
+        self.budget = budget
+        self.what = what
+        self.key = key
+        self.folder = None
+        self.paths = []
+        self.written = 0
+
+    def write_run(self, records):
+        """Writes records (already sorted) as a new run file."""
+        if self.folder is None:
+            self.folder = tempfile.mkdtemp(prefix="spill-", dir=self.budget.folder)
+        path = os.path.join(self.folder, f"run{self.written:05d}.pickle")
+        self.written += 1
+        return path, write_run(path, records)
+
+    def spill(self, records):
+        """Writes sorted records (any iterable) to disk as one run."""
+        path, count = self.write_run(records)
+        self.paths.append(path)
+        self.budget.log_spill(self.what, count, path)
+
+        # Too many runs to keep open at once: merge them into one
+        if len(self.paths) >= MAX_OPEN_RUNS:
+            path, _ = self.write_run(self.merge())
+            for old_path in self.paths:
+                os.remove(old_path)
+            self.paths = [path]
+
+    def merge(self, last=()):
+        """
+        Yields every spilled record, plus the sorted records in `last`
+        (the part still in memory), in sorted order.
+        """
+        runs = [read_run(path) for path in self.paths]
+        return heapq.merge(*runs, last, key=self.key)
+
+    def close(self):
+        """Deletes the run files."""
+        if self.folder is not None:
+            shutil.rmtree(self.folder, ignore_errors=True)
+            self.folder = None
+        self.paths = []
+
+
+def external_sort(records, key, budget, what="records", limit=None):
+    """
+    Yields records sorted by key (a stable sort), spilling sorted runs
+    to disk whenever the budget is exceeded, or every `limit` records
+    if that is given.
+    """
+    runs = SpillRuns(budget, what, key)
+    trigger = SpillTrigger(budget, limit)
+    batch = []
+    try:
+        for record in records:
+            batch.append(record)
+            if trigger(len(batch)):
+                batch.sort(key=key)
+                runs.spill(batch)
+                batch = []
+        batch.sort(key=key)
+        yield from runs.merge(batch)
+    finally:
+        runs.close()
+
+
+class SpillingCounter:
+    """
+    Counts keys like a dictionary of counts, spilling sorted partial
+    counts to disk when over the budget.
+
+    Supports ``counter[key] = counter.get(key, 0) + 1`` like a dict
+    (``add`` does the same in one call), and remembers where each key
+    was first seen, so ``items()`` and ``most_common()`` give the same
+    order a dict would.
+    """
+
+    def __init__(self, budget, what="counts"):
+        self.budget = budget
+        self.counts = {}
+        self.segment = 0
+        # Records are (key, count, segment, index): plain tuple order sorts
+        # them by key, and merges faster than a key function
+        self.runs = SpillRuns(budget, what)
+        self.trigger = SpillTrigger(budget)
+
+    def get(self, key, default=None):
+        return self.counts.get(key, default)
+
+    def __setitem__(self, key, value):
+        self.counts[key] = value
+        if self.trigger(len(self.counts)):
+            self.spill()
+
+    def add(self, key, count=1):
+        """Adds count to a key."""
+        counts = self.counts
+        counts[key] = counts.get(key, 0) + count
+        if self.trigger(len(counts)):
+            self.spill()
+
+    def spilled(self):
+        return bool(self.runs.paths)
+
+    def sorted_records(self):
+        """
+        Yields (key, count, segment, index) for the counts in memory,
+        sorted by key; segment and index order keys by first appearance
+        across spills.
+        """
+        counts = self.counts
+        keys = list(counts)
+        # Sorting the positions (not a list of tuples) keeps the extra
+        # memory of a spill small
+        for index in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[index]
+            yield key, counts[key], self.segment, index
+
+    def spill(self):
+        self.runs.spill(self.sorted_records())
+        self.counts = {}
+        self.segment += 1
+
+    def finish(self):
+        """
+        Moves the counts still in memory to disk once counting is done,
+        if the counter has spilled before, so reading the counts back
+        only holds the merge's batches in memory.
+        """
+        if self.spilled() and self.counts:
+            self.spill()
+
+    def totals(self):
+        """Yields (key, count, first_seen) for every key, sorted by key."""
+        self.finish()
+        current = None
+        for key, count, segment, index in self.runs.merge(self.sorted_records()):
+            if current is not None and current[0] == key:
+                current[1] += count
+                # Equal keys come in count order, not run order
+                current[2] = min(current[2], (segment, index))
+            else:
+                if current is not None:
+                    yield tuple(current)
+                current = [key, count, (segment, index)]
+        if current is not None:
+            yield tuple(current)
+
+    def items(self):
+        """Yields (key, count) in first-seen order."""
+        if not self.spilled():
+            yield from self.counts.items()
+            return
+        for key, count, _ in external_sort(self.totals(), itemgetter(2), self.budget,
+                                           self.runs.what, self.trigger.limit):
+            yield key, count
+
+    def most_common(self, limit=None):
+        """(key, count) by count, highest first; ties in first-seen order."""
+        if not self.spilled():
+            ranked = sorted(self.counts.items(), key=lambda x: x[1], reverse=True)
+            return iter(ranked[:limit] if limit is not None else ranked)
+
+        def rank(total):
+            return -total[1], total[2]
+        if limit is not None:
+            return ((key, count) for key, count, _ in heapq.nsmallest(limit, self.totals(), key=rank))
+        return ((key, count) for key, count, _ in
+                external_sort(self.totals(), rank, self.budget, self.runs.what, self.trigger.limit))
+
+    def close(self):
+        self.runs.close()
+
+
+def add_memory_argument(parser):
+    """Adds --max-memory to an ArgumentParser."""
+    parser.add_argument("--max-memory", type=parse_size, metavar="SIZE",
+                        help="spill to disk instead of using more memory than this (e.g. 512M, 2G)")
+    return parser
@@ -0,0 +1,413 @@
+"""
+Validation Rule Sets
+
+Lets the validators read their rules from a config file instead of
+hardcoded Python lists. A rule set maps each field to an ordered list of
+rules; every rule names a rule type from RULE_TYPES plus its settings:
+
+    # rules.toml
+    [[password]]
+    type = "min_length"
+    value = 5
+    message = "must be at least 5 characters"
+
+    [[password]]
+    type = "allowed_chars"
+    chars = "abc...XYZ0123456789!#$%^&*()-"
+    message = "invalid character '{char}'"
+
+The same structure works as JSON (``{"password": [{"type": ...}]}``).
+A rule may also set ``name``, the label it is counted under in error
+summaries (see common/error_summary.py); by default that is its type.
+At load time every rule is compiled into a small check function with
+its settings fixed (character sets become frozensets, repeat limits a
+regex), and each field's checks are combined into one evaluator.
+
+``RuleConfig`` keeps the compiled rules of a file and can reload them
+while a long run is going: ``reload_if_changed`` compiles the new file
+first and only then swaps in the new rule set, so a half-written or
+broken file never replaces working rules. Callers take ``config.rules``
+once per batch, so rows already in flight finish with the rules they
+started with.
+"""
+
+import json
+import os
+import re
+import time
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# Seconds between checks for a changed rules file
+RELOAD_INTERVAL = 2.0
+
+# Default messages of the email_format rule; each can be replaced
+# through the rule's "messages" table
+EMAIL_FORMAT_MESSAGES = {
+    "at_sign": "must contain exactly one '@'",
+    "spaces": "email cannot contain spaces",
+    "empty_local": "no characters before '@'",
+    "domain_dot": "no '.' in domain part",
+    "domain_edge": "domain starts or ends with '.'",
+    "local_edge": "local part starts or ends with '.'",
+    "domain_dots": "domain has consecutive dots",
+    "local_dots": "local part has consecutive dots",
+    "tld_short": "TLD too short",
+    "tld_alpha": "TLD can only contain alphabets",
+}
+
+# Character classes usable with the "requires" rule
+CHARACTER_CLASSES = {
+    "upper": str.isupper,
+    "lower": str.islower,
+    "digit": str.isdigit,
+    "alpha": str.isalpha,
+}
+
+
+# -----------------------------
+# Rule types
+# -----------------------------
+# Each builder takes the rule's settings and returns check(value),
+# which gives an error message, or None if the value passes.
+
+def build_not_empty(rule):
+    message = rule.get("message", "cannot be empty")
+
+    def check(value):
+        return None if value else message
+    return check
+
+
+def build_min_length(rule):
+    limit = int(rule["value"])
+    message = rule.get("message", f"must be at least {limit} characters")
+
+    def check(value):
+        return message if len(value) < limit else None
+    return check
+
+
+def build_max_length(rule):
+    limit = int(rule["value"])
+    message = rule.get("message", f"must be at most {limit} characters")
+
+    def check(value):
+        return message if len(value) > limit else None
+    return check
+
+
+def build_not_contains(rule):
+    text = rule["value"]
+    message = rule.get("message", f"must not contain '{text}'")
+
+    def check(value):
+        return message if text in value else None
+    return check
+
+
+def build_no_whitespace(rule):
+    message = rule.get("message", "no spaces allowed")
+
+    def check(value):
+        for char in value:
+            if char.isspace():
+                return message
+        return None
+    return check
+
+
+def build_not_digits_only(rule):
+    message = rule.get("message", "cannot be digits only")
+
+    def check(value):
+        return message if value.isdigit() else None
+    return check
+
+
+def build_starts_with_letter(rule):
+    message = rule.get("message", "must start with a letter")
+
+    def check(value):
+        return None if value[:1].isalpha() else message
+    return check
+
+
+def build_allowed_chars(rule):
+    allowed = frozenset(rule["chars"])
+    message = rule.get("message", "invalid character '{char}'")
+
+    def check(value):
+        # Set check in C first; only a failing value is scanned for the culprit
+        if allowed.issuperset(value):
+            return None
+        for char in value:
+            if char not in allowed:
+                return message.replace("{char}", char)
+        return None
+    return check
+
+
+def build_requires(rule):
+    name = rule["class"]
+    if name not in CHARACTER_CLASSES:
+        raise ValueError(f"unknown character class {name!r} (use one of {sorted(CHARACTER_CLASSES)})")
+    test = CHARACTER_CLASSES[name]
+    message = rule.get("message", f"must contain a {name} character")
+
+    def check(value):
+        for char in value:
+            if test(char):
+                return None
+        return message
+    return check
+
+
+def build_max_repeats(rule):
+    limit = int(rule["value"])
+    if limit < 1:
+        raise ValueError("max_repeats value must be at least 1")
+    repeated = re.compile(r"(.)\1{%d}" % limit, re.DOTALL)
+    message = rule.get("message", f"cannot repeat a character more than {limit} times in a row")
+
+    def check(value):
+        return message if repeated.search(value) else None
+    return check
+
+
+def build_regex(rule):
+    pattern = re.compile(rule["pattern"])
+    message = rule.get("message", f"must match {rule['pattern']}")
+
+    def check(value):
+        return None if pattern.fullmatch(value) else message
+    return check
+
+
+def build_email_format(rule):
+    unknown = set(rule.get("messages", {})) - set(EMAIL_FORMAT_MESSAGES)
+    if unknown:
+        raise ValueError(f"unknown email_format messages: {sorted(unknown)}")
+    messages = dict(EMAIL_FORMAT_MESSAGES, **rule.get("messages", {}))
+
+    def check(value):
+        if value.count("@") != 1:
+            return messages["at_sign"]
+        if " " in value:
+            return messages["spaces"]
+
+        local, _, domain = value.partition("@")
+        if not local:
+            return messages["empty_local"]
+        if "." not in domain:
+            return messages["domain_dot"]
+        if domain.startswith(".") or domain.endswith("."):
+            return messages["domain_edge"]
+        if local.startswith(".") or local.endswith("."):
+            return messages["local_edge"]
+        if ".." in domain:
+            return messages["domain_dots"]
+        if ".." in local:
+            return messages["local_dots"]
+
+        tld = domain.split(".")[-1]
+        if len(tld) < 2:
+            return messages["tld_short"]
+        if not tld.isalpha():
+            return messages["tld_alpha"]
+        return None
+    return check
+
+
+RULE_TYPES = {
+    "not_empty": build_not_empty,
+    "min_length": build_min_length,
+    "max_length": build_max_length,
+    "not_contains": build_not_contains,
+    "no_whitespace": build_no_whitespace,
+    "not_digits_only": build_not_digits_only,
+    "starts_with_letter": build_starts_with_letter,
+    "allowed_chars": build_allowed_chars,
+    "requires": build_requires,
+    "max_repeats": build_max_repeats,
+    "regex": build_regex,
+    "email_format": build_email_format,
+}
+
+
+# -----------------------------
+# Compiling
+# -----------------------------
+
+def rule_name(rule):
+    """Name a rule is counted under in error summaries (defaults to its type)."""
+    if "name" in rule:
+        return rule["name"]
+    if rule.get("type") == "requires":
+        return f"requires_{rule.get('class')}"
+    return rule.get("type")
+
+
+class FieldRules:
+    """
+    The compiled rules of one field.
+
+    Calling it gives (bool, message) like a hand-written rule function;
+    ``first_failure`` also tells which rule failed, for error summaries.
+    """
+
+    def __init__(self, rules, checks, names):
+        self.rules = rules
+        self.checks = checks
+        self.names = names
+
+    def __call__(self, value):
+        for check in self.checks:
+            message = check(value)
+            if message is not None:
+                return False, message
+        return True, None
+
+    def first_failure(self, value):
+        """
+        Returns:
+            (str, str) | None: Name and message of the first failing
+            rule, or None if the value passes.
+        """
+        for check, name in zip(self.checks, self.names):
+            message = check(value)
+            if message is not None:
+                return name, message
+        return None
+
+
+def compile_field(rules):
+    """
+    Compiles a field's rule list into a single evaluator.
+
+    Args:
+        rules (list): Rule dictionaries, in the order they are applied.
+
+    Returns:
+        FieldRules: check(value) -> (bool, str | None), stopping at the
+        first failing rule.
+
+    Raises:
+        ValueError: If a rule type is unknown or a setting is invalid.
+    """
+    checks = []
+    names = []
+    for rule in rules:
+        kind = rule.get("type")
+        if kind not in RULE_TYPES:
+            raise ValueError(f"unknown rule type {kind!r}")
+        try:
+            checks.append(RULE_TYPES[kind](rule))
+        except KeyError as e:
+            raise ValueError(f"rule {kind!r} is missing setting {e}") from None
+
+        # A second rule of the same type gets its position added to the name
+        name = rule_name(rule)
+        if name in names:
+            name = f"{name}_{len(names) + 1}"
+        names.append(name)
+
+    return FieldRules(tuple(rules), tuple(checks), tuple(names))
+
+
+def compile_rule_set(config):
+    """
+    Compiles a whole rule set.
+
+    Args:
+        config (dict): Field name -> list of rule dictionaries.
+
+    Returns:
+        dict: Field name -> evaluator (see compile_field).
+    """
+    if not isinstance(config, dict):
+        raise ValueError("a rule set must map field names to rule lists")
+
+    compiled = {}
+    for field, rules in config.items():
+        try:
+            compiled[field] = compile_field(rules)
+        except ValueError as e:
+            raise ValueError(f"{field}: {e}") from None
+    return compiled
+
+
+def load_rule_file(path):
+    """
+    Reads a rule set from a .toml or .json file.
+
+    Returns:
+        dict: The parsed (not yet compiled) rule set.
+    """
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise RuntimeError("TOML rule files need Python 3.11+ or 'pip install tomli'")
+        with open(path, "rb") as file:
+            return tomllib.load(file)
+
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+class RuleConfig:
+    """
+    Compiled rules from a config file, reloaded when the file changes.
+
+    ``rules`` is replaced in one assignment, so a reader sees either the
+    old or the new rule set, never a mix.
+    """
+
+    def __init__(self, path, reload_interval=RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.signature = self.file_signature()
+        self.rules = compile_rule_set(load_rule_file(path))
+        self.next_check = time.monotonic() + reload_interval
+        self.version = 1
+
+    def file_signature(self):
+        status = os.stat(self.path)
+        return status.st_mtime_ns, status.st_size
+
+    def reload_if_changed(self):
+        """
+        Recompiles the rules if the file changed since the last load.
+
+        Checks at most once per reload interval. A file that cannot be
+        read or compiled is reported and the current rules are kept.
+
+        Returns:
+            bool: True if a new rule set was swapped in.
+        """
+        now = time.monotonic()
+        if now < self.next_check:
+            return False
+        self.next_check = now + self.reload_interval
+
+        try:
+            signature = self.file_signature()
+            if signature == self.signature:
+                return False
+            # Remember the signature even if the file is broken, so the
+            # error is reported once rather than on every check
+            self.signature = signature
+            rules = compile_rule_set(load_rule_file(self.path))
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"Keeping current rules, could not reload {self.path}: {e}")
+            return False
+
+        self.rules = rules
+        self.version += 1
+        print(f"Reloaded rules from {self.path} (version {self.version})")
+        return True
@@ -0,0 +1,221 @@
+"""
+Sampling and Approximate Statistics
+
+Quick previews of very large inputs: instead of reading every line,
+read a few hundred short blocks of consecutive lines and estimate the
+usual summaries from them, with a confidence interval for each share.
+
+- A single uncompressed file is sampled with random access: the file is
+  cut into SAMPLE_BLOCKS equal byte ranges and one block is read from a
+  random position in each (after skipping to the next line start), so
+  the sample covers the whole file and only the sampled bytes are read.
+- Compressed files, folders and globs cannot be seeked, so their blocks
+  are reservoir-sampled while streaming through the lines.
+
+Lines inside a block are not independent (neighbouring log lines share
+a time window, neighbouring text lines a topic), so intervals are
+computed from the spread between blocks rather than between lines.
+"""
+
+import argparse
+import math
+import os
+import random
+
+from common.sources import expand_inputs, is_compressed, iter_files
+
+# Blocks read per sample
+SAMPLE_BLOCKS = 200
+
+# Consecutive lines per block
+LINES_PER_BLOCK = 50
+
+# z-value of the reported intervals (1.96 = 95% confidence)
+CONFIDENCE_Z = 1.96
+
+# Plain files smaller than this are read completely (the "sample" is exact)
+FULL_READ_BYTES = 4 * 1024 * 1024
+
+
+class Sample:
+    """Sampled blocks of lines plus the estimated size of the input."""
+
+    def __init__(self, blocks, total_lines, exact):
+        self.blocks = blocks
+        self.total_lines = total_lines
+        self.exact = exact
+
+    def line_count(self):
+        return sum(len(block) for block in self.blocks)
+
+
+def decode_line(raw):
+    return raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def seek_sample(path, blocks, lines_per_block, rng, skip_header):
+    """Block sample of one plain file using seeks (see module docstring)."""
+    size = os.path.getsize(path)
+    sampled = []
+    sampled_bytes = sampled_lines = 0
+
+    with open(path, "rb") as file:
+        if skip_header:
+            file.readline()
+        data_start = file.tell()
+        span = size - data_start
+
+        # Small file: every line is read, in blocks, and the result is exact
+        if span <= FULL_READ_BYTES:
+            block = []
+            count = 0
+            for raw in file:
+                block.append(decode_line(raw))
+                count += 1
+                if len(block) == lines_per_block:
+                    sampled.append(block)
+                    block = []
+            if block:
+                sampled.append(block)
+            return Sample(sampled, count, exact=True)
+
+        stratum = span / blocks
+        for i in range(blocks):
+            offset = data_start + int(i * stratum + rng.random() * stratum)
+            file.seek(offset)
+            if offset > data_start:
+                file.readline()  # skip the partial line we landed in
+
+            block = []
+            while len(block) < lines_per_block:
+                raw = file.readline()
+                if not raw:
+                    break
+                sampled_bytes += len(raw)
+                block.append(decode_line(raw))
+            if block:
+                sampled.append(block)
+                sampled_lines += len(block)
+
+    average = sampled_bytes / sampled_lines if sampled_lines else 1
+    return Sample(sampled, round(span / average), exact=False)
+
+
+def reservoir_sample(paths, blocks, lines_per_block, rng, skip_header):
+    """Block sample of a stream of files, keeping a reservoir of blocks."""
+    reservoir = []
+    seen_blocks = 0
+    total = 0
+
+    def offer(block):
+        nonlocal seen_blocks
+        seen_blocks += 1
+        if len(reservoir) < blocks:
+            reservoir.append(block)
+        else:
+            slot = rng.randrange(seen_blocks)
+            if slot < blocks:
+                reservoir[slot] = block
+
+    for _, lines in iter_files(paths, newline=None):
+        block = []
+        for i, line in enumerate(lines):
+            if skip_header and i == 0:
+                continue
+            block.append(line.rstrip("\r\n"))
+            total += 1
+            if len(block) == lines_per_block:
+                offer(block)
+                block = []
+        if block:
+            offer(block)
+
+    return Sample(reservoir, total, exact=seen_blocks <= blocks)
+
+
+def sample_input(pattern, blocks=SAMPLE_BLOCKS, lines_per_block=LINES_PER_BLOCK,
+                 seed=None, skip_header=False):
+    """
+    Draws a block sample from a file, folder, or glob.
+
+    Args:
+        pattern (str): Input path, folder, or glob.
+        blocks (int): Number of blocks to read.
+        lines_per_block (int): Consecutive lines per block.
+        seed (int | None): Random seed, for repeatable samples.
+        skip_header (bool): Leave out the first line of every file.
+
+    Returns:
+        Sample: The blocks (lists of lines without line endings) and the
+        total number of lines (estimated unless ``exact``).
+    """
+    rng = random.Random(seed)
+    paths = expand_inputs(pattern)
+    if len(paths) == 1 and not is_compressed(paths[0]):
+        return seek_sample(paths[0], blocks, lines_per_block, rng, skip_header)
+    return reservoir_sample(paths, blocks, lines_per_block, rng, skip_header)
+
+
+def estimate_shares(block_counts, block_sizes, exact=False, z=CONFIDENCE_Z):
+    """
+    Estimates the share of every key from per-block counts.
+
+    The share is the ratio estimate sum(counts) / sum(sizes); its
+    standard error comes from how much the blocks disagree (a cluster
+    sample), so correlated lines do not make the interval too narrow.
+
+    Args:
+        block_counts (list): One {key: count} dictionary per block.
+        block_sizes (list): Units (rows, words, entries) in each block.
+        exact (bool): The blocks are the whole input, so the shares are
+            exact and the intervals collapse to a single value.
+        z (float): z-value of the interval.
+
+    Returns:
+        dict: key -> (share, low, high), shares between 0 and 1.
+    """
+    k = len(block_sizes)
+    total = sum(block_sizes)
+    if total == 0:
+        return {}
+
+    keys = set()
+    for counts in block_counts:
+        keys.update(counts)
+
+    mean_size = total / k
+    shares = {}
+    for key in keys:
+        share = sum(counts.get(key, 0) for counts in block_counts) / total
+        if exact:
+            error = 0.0
+        elif k > 1:
+            spread = sum(
+                (counts.get(key, 0) - share * size) ** 2
+                for counts, size in zip(block_counts, block_sizes)
+            )
+            error = math.sqrt(spread / (k * (k - 1))) / mean_size
+        else:
+            error = math.sqrt(share * (1 - share) / total)
+        shares[key] = (share, max(0.0, share - z * error), min(1.0, share + z * error))
+    return shares
+
+
+def format_share(share, low, high):
+    """Formats an estimate as '12.34% (11.80-12.90%)'."""
+    return f"{share * 100:.2f}% ({low * 100:.2f}-{high * 100:.2f}%)"
+
+
+def add_sample_arguments(parser):
+    """Adds --sample, --sample-blocks and --seed to an ArgumentParser."""
+    parser.add_argument("--sample", action="store_true",
+                        help="estimate the summaries from a random sample of the input")
+    parser.add_argument("--sample-blocks", type=int, default=SAMPLE_BLOCKS,
+                        help=f"blocks of {LINES_PER_BLOCK} lines to sample")
+    parser.add_argument("--seed", type=int, help="random seed, for repeatable samples")
+    return parser
+
+
+def sample_argument_parser(description):
+    """Returns an ArgumentParser with just the sampling flags."""
+    return add_sample_arguments(argparse.ArgumentParser(description=description))
@@ -0,0 +1,301 @@
+"""
+Output Sinks
+
+A small output layer shared by the portfolio scripts. ``open_sink``
+picks a writer from the output file name, so switching a report to a
+different format only means changing its extension:
+
+- ``.csv``               plain CSV (the default)
+- ``.csv.gz`` / ``.csv.zst``   compressed CSV
+- ``.jsonl`` (optionally ``.gz`` / ``.zst``)   one JSON object per line
+- ``.parquet``           Apache Parquet (needs ``pyarrow``)
+- ``.arrow``             Arrow IPC file (needs ``pyarrow``)
+- ``.sqlite`` / ``.db``  SQLite database with one table, named after the
+  file, and indexes on the usual lookup columns (timestamp, action,
+  status, error), so follow-up questions are SQL queries instead of
+  full CSV scans
+
+Every sink behaves like ``csv.DictWriter`` (``writeheader``,
+``writerow``, ``writerows``) but buffers rows and writes them in
+batches instead of one call per row.
+"""
+
+import csv
+import io
+import json
+import os
+import sqlite3
+
+from common.sources import open_compressed
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Rows buffered before they are handed to the underlying writer
+BATCH_SIZE = 10_000
+
+# SQLite: rows inserted per transaction, and columns that get an index
+# when a table has them
+SQLITE_TRANSACTION_ROWS = 500_000
+SQLITE_INDEX_COLUMNS = ("timestamp", "action", "status", "error")
+
+
+class BatchedSink:
+    """
+    Base class for sinks: buffers rows and flushes them in batches.
+
+    Subclasses implement ``write_batch`` and optionally ``writeheader``
+    and ``close_output``.
+    """
+
+    def __init__(self, path, fieldnames, extrasaction="raise", batch_size=BATCH_SIZE):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.extrasaction = extrasaction
+        self.batch_size = batch_size
+        self.batch = []
+
+    def writeheader(self):
+        """Writes the header row (only CSV has one)."""
+
+    def writerow(self, row):
+        """Adds a single row (a dict) to the current batch."""
+        if self.extrasaction == "raise":
+            extras = [key for key in row if key not in self.fieldnames]
+            if extras:
+                raise ValueError(f"dict contains fields not in fieldnames: {extras}")
+
+        self.batch.append([row.get(name, "") for name in self.fieldnames])
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def writerows(self, rows):
+        """Adds several rows to the current batch."""
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self):
+        """Writes out any buffered rows."""
+        if self.batch:
+            self.write_batch(self.batch)
+            self.batch = []
+
+    def write_batch(self, batch):
+        raise NotImplementedError
+
+    def close_output(self):
+        """Closes the underlying file."""
+
+    def close(self):
+        """Flushes remaining rows and closes the sink."""
+        self.flush()
+        self.close_output()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvSink(BatchedSink):
+    """CSV output, optionally gzip or zstd compressed."""
+
+    def __init__(self, path, fieldnames, **options):
+        super().__init__(path, fieldnames, **options)
+        self.file = open_compressed(path, "w")
+        self.writer = csv.writer(self.file)
+
+    def writeheader(self):
+        self.writer.writerow(self.fieldnames)
+
+    def write_batch(self, batch):
+        self.writer.writerows(batch)
+
+    def close_output(self):
+        self.file.close()
+
+
+class JsonLinesSink(BatchedSink):
+    """JSON Lines output, optionally gzip or zstd compressed."""
+
+    def __init__(self, path, fieldnames, **options):
+        super().__init__(path, fieldnames, **options)
+        self.file = open_compressed(path, "w")
+
+    def write_batch(self, batch):
+        buffer = io.StringIO()
+        for values in batch:
+            buffer.write(json.dumps(dict(zip(self.fieldnames, values)), default=str))
+            buffer.write("\n")
+        self.file.write(buffer.getvalue())
+
+    def close_output(self):
+        self.file.close()
+
+
+class ArrowSink(BatchedSink):
+    """
+    Parquet or Arrow IPC output through pyarrow.
+
+    The schema is fixed up front from the fieldnames: every column is
+    nullable text, except the ones given a type in ``column_types``
+    (e.g. {"frequency": "int64"}). Other values are written as str(),
+    the same text a CSV file would hold. In Parquet files the columns
+    listed in ``dictionary_columns`` (low-cardinality text such as
+    status or error) are dictionary encoded; Arrow IPC files keep them
+    as plain text, since an IPC file allows only one dictionary per
+    column across all batches.
+    """
+
+    def __init__(self, path, fieldnames, file_format="parquet", dictionary_columns=(),
+                 column_types=None, **options):
+        if pyarrow is None:
+            raise RuntimeError("pyarrow is not installed; run 'pip install pyarrow'")
+        super().__init__(path, fieldnames, **options)
+        self.file_format = file_format
+        self.dictionary_columns = [name for name in dictionary_columns if name in self.fieldnames]
+        self.column_types = column_types or {}
+        self.schema = self.make_schema()
+        self.writer = None
+
+    def make_schema(self):
+        """Schema from the fieldnames: text unless column_types says otherwise."""
+        fields = []
+        for name in self.fieldnames:
+            type_name = self.column_types.get(name, "string")
+            fields.append(pyarrow.field(name, pyarrow.type_for_alias(type_name), nullable=True))
+        return pyarrow.schema(fields)
+
+    def make_table(self, batch):
+        """Turns a batch of row lists into a pyarrow Table with the sink's schema."""
+        columns = []
+        for index, field in enumerate(self.schema):
+            values = [row[index] for row in batch]
+            if field.type == pyarrow.string():
+                values = [None if value is None else str(value) for value in values]
+            else:
+                # A blank cell (a missing key) is a null number
+                values = [None if value is None or value == "" else value for value in values]
+            columns.append(pyarrow.array(values, type=field.type))
+        return pyarrow.Table.from_arrays(columns, schema=self.schema)
+
+    def open_writer(self):
+        if self.file_format == "parquet":
+            self.writer = pyarrow.parquet.ParquetWriter(
+                self.path,
+                self.schema,
+                use_dictionary=self.dictionary_columns or False,
+                compression="zstd",
+            )
+        else:
+            self.writer = pyarrow.ipc.new_file(self.path, self.schema)
+
+    def write_batch(self, batch):
+        if self.writer is None:
+            self.open_writer()
+        self.writer.write_table(self.make_table(batch))
+
+    def close_output(self):
+        # No rows: still write a file with the columns, like the CSV
+        # sinks write a header-only file
+        if self.writer is None:
+            self.open_writer()
+        self.writer.close()
+
+
+def quote_identifier(name):
+    """Quotes a table or column name for SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqliteSink(BatchedSink):
+    """
+    SQLite output: one table named after the file (``anomalies.sqlite``
+    -> table ``anomalies``), replaced on every run.
+
+    Rows go in with executemany, many batches per transaction, in WAL
+    mode with relaxed syncing. Indexes are built once at the end, which
+    is much faster than keeping them up to date during the load.
+    """
+
+    def __init__(self, path, fieldnames, index_columns=SQLITE_INDEX_COLUMNS,
+                 transaction_rows=SQLITE_TRANSACTION_ROWS, **options):
+        super().__init__(path, fieldnames, **options)
+        self.table = os.path.splitext(os.path.basename(path))[0]
+        self.index_columns = [name for name in index_columns if name in self.fieldnames]
+        self.transaction_rows = transaction_rows
+        self.pending_rows = 0
+
+        # isolation_level=None: transactions are started and committed here
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+
+        table = quote_identifier(self.table)
+        columns = ", ".join(quote_identifier(name) for name in self.fieldnames)
+        self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+        self.connection.execute(f"CREATE TABLE {table} ({columns})")
+        placeholders = ", ".join("?" for _ in self.fieldnames)
+        self.insert = f"INSERT INTO {table} VALUES ({placeholders})"
+
+    def write_batch(self, batch):
+        if self.pending_rows == 0:
+            self.connection.execute("BEGIN")
+        self.connection.executemany(self.insert, batch)
+        self.pending_rows += len(batch)
+        if self.pending_rows >= self.transaction_rows:
+            self.connection.execute("COMMIT")
+            self.pending_rows = 0
+
+    def close_output(self):
+        if self.pending_rows:
+            self.connection.execute("COMMIT")
+            self.pending_rows = 0
+        for name in self.index_columns:
+            index = quote_identifier(f"{self.table}_{name}")
+            self.connection.execute(
+                f"CREATE INDEX {index} ON {quote_identifier(self.table)} ({quote_identifier(name)})"
+            )
+        self.connection.execute("ANALYZE")
+        self.connection.close()
+
+
+def open_sink(path, fieldnames, extrasaction="raise", dictionary_columns=(), column_types=None,
+              batch_size=BATCH_SIZE):
+    """
+    Opens the right sink for an output file based on its extension.
+
+    Args:
+        path (str): Output file path.
+        fieldnames (list): Column names, in order.
+        extrasaction (str): 'raise' or 'ignore', same as csv.DictWriter.
+        dictionary_columns (list): Columns to dictionary encode
+            (Parquet only).
+        column_types (dict | None): pyarrow type names of the numeric
+            columns, e.g. {"frequency": "int64"}; other columns are
+            text (Parquet/Arrow only).
+        batch_size (int): Number of rows buffered per write.
+
+    Returns:
+        BatchedSink: Sink with a DictWriter-like interface.
+    """
+    options = {"extrasaction": extrasaction, "batch_size": batch_size}
+    name = path
+    for suffix in (".gz", ".zst"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+
+    if name.endswith(".parquet"):
+        return ArrowSink(path, fieldnames, "parquet", dictionary_columns, column_types, **options)
+    if name.endswith(".arrow"):
+        return ArrowSink(path, fieldnames, "arrow", dictionary_columns, column_types, **options)
+    if name.endswith(".jsonl"):
+        return JsonLinesSink(path, fieldnames, **options)
+    if name.endswith((".sqlite", ".sqlite3", ".db")):
+        return SqliteSink(path, fieldnames, **options)
+    return CsvSink(path, fieldnames, **options)
@@ -0,0 +1,405 @@
+"""
+Input Sources
+
+Lets the portfolio scripts read more than one plain-text file. An input
+can be:
+
+- a single file path
+- a directory (every file inside it is read, in name order)
+- a glob pattern such as ``logs/app.log*``
+
+Files ending in ``.gz``, ``.bz2``, ``.xz`` or ``.zst`` are decompressed
+on the fly. Up to ``WORKERS`` files are decompressed ahead of time in
+background threads (zlib, bz2, lzma and zstandard release the GIL while
+they work), and the lines are handed to the caller as one stream, so
+nothing is unpacked to a temporary file first. No more than
+``WORKERS`` threads run at once, however many files there are.
+"""
+
+import bz2
+import csv
+import glob
+import gzip
+import heapq
+import lzma
+import mmap
+import os
+import queue
+import threading
+from collections import deque
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Number of files decompressed in parallel
+WORKERS = 4
+
+# Lines handed from a worker thread to the reader at a time
+CHUNK_LINES = 5_000
+
+# Chunks a worker may read ahead before it waits for the reader
+MAX_PENDING_CHUNKS = 8
+
+# Bytes sliced from a memory-mapped file at a time
+MMAP_BLOCK_SIZE = 1 << 20
+
+
+def open_compressed(path, mode="r", newline=""):
+    """
+    Opens a text file, compressing or decompressing based on the extension.
+
+    Args:
+        path (str): File path ending in '.gz', '.bz2', '.xz', '.zst',
+            or anything else for plain text.
+        mode (str): 'r' or 'w'.
+        newline (str | None): Passed to open(); '' keeps line endings
+            as they are (needed for CSV), None translates them to '\n'.
+
+    Returns:
+        file: Text-mode file object.
+    """
+    options = {"newline": newline, "encoding": "utf-8"}
+
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", **options)
+    if path.endswith(".bz2"):
+        return bz2.open(path, mode + "t", **options)
+    if path.endswith(".xz"):
+        return lzma.open(path, mode + "t", **options)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; run 'pip install zstandard'")
+        return zstandard.open(path, mode + "t", **options)
+
+    return open(path, mode, **options)
+
+
+def expand_inputs(pattern):
+    """
+    Turns a file path, directory, or glob pattern into a list of files.
+
+    Args:
+        pattern (str): Path, directory, or glob pattern.
+
+    Returns:
+        list: Matching file paths in name order.
+
+    Raises:
+        FileNotFoundError: If nothing matches.
+    """
+    if os.path.isdir(pattern):
+        paths = [
+            os.path.join(pattern, name)
+            for name in os.listdir(pattern)
+            if os.path.isfile(os.path.join(pattern, name))
+        ]
+    elif glob.has_magic(pattern):
+        paths = [path for path in glob.glob(pattern) if os.path.isfile(path)]
+    elif os.path.isfile(pattern):
+        paths = [pattern]
+    else:
+        paths = []
+
+    if not paths:
+        raise FileNotFoundError(f"No input files match '{pattern}'")
+    return sorted(paths)
+
+
+class FileReader:
+    """
+    Reads one file in a background thread, in chunks of lines.
+
+    The thread stops early if ``stop`` is called, so a caller that
+    breaks out of its loop does not leave a worker blocked forever.
+    """
+
+    def __init__(self, path, newline=""):
+        self.path = path
+        self.newline = newline
+        self.chunks = queue.Queue(maxsize=MAX_PENDING_CHUNKS)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            with open_compressed(self.path, "r", self.newline) as file:
+                chunk = []
+                for line in file:
+                    chunk.append(line)
+                    if len(chunk) >= CHUNK_LINES:
+                        if not self._put(chunk):
+                            return
+                        chunk = []
+                if chunk:
+                    self._put(chunk)
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._put(None)
+
+    def lines(self):
+        """Yields the lines of the file in order."""
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield from chunk
+
+    def stop(self):
+        """Asks the worker thread to stop reading."""
+        self.stopped.set()
+
+
+def iter_files(paths, workers=WORKERS, newline=""):
+    """
+    Yields (path, lines) for each file, reading up to `workers` files ahead.
+
+    Args:
+        paths (list): File paths, in the order they should be returned.
+        workers (int): Number of files decompressed at the same time.
+        newline (str | None): Line ending handling, see open_compressed.
+
+    Yields:
+        tuple: (path, iterator over the file's lines)
+    """
+    pending = deque(paths)
+    running = deque()
+    # The reader whose lines were handed out last; it is no longer in
+    # running, but still has to be stopped if the caller stops early
+    current = None
+
+    try:
+        while pending or running:
+            while pending and len(running) < max(1, workers):
+                running.append(FileReader(pending.popleft(), newline))
+
+            current = running.popleft()
+            yield current.path, current.lines()
+    finally:
+        if current is not None:
+            current.stop()
+        for reader in running:
+            reader.stop()
+
+
+def read_lines(pattern, workers=WORKERS, newline=""):
+    """
+    Returns every line of every input file as one stream.
+
+    The file list is resolved straight away, so a missing input raises
+    FileNotFoundError here rather than on the first read.
+
+    Args:
+        pattern (str): Path, directory, or glob pattern.
+        workers (int): Number of files decompressed at the same time.
+        newline (str | None): Line ending handling, see open_compressed.
+
+    Returns:
+        iterator: Lines, including their line endings.
+    """
+    paths = expand_inputs(pattern)
+
+    def chained():
+        for _, lines in iter_files(paths, workers, newline):
+            yield from lines
+
+    return chained()
+
+
+def file_lines(path, newline=""):
+    """Yields the lines of one file, read in the calling thread."""
+    with open_compressed(path, "r", newline) as file:
+        yield from file
+
+
+def merge_sorted_lines(pattern, key, workers=WORKERS):
+    """
+    Merges files whose lines are each already sorted into one sorted stream.
+
+    Useful for rotated log shards: every shard is in time order, so a
+    k-way merge on the timestamp gives a fully chronological stream
+    without sorting everything again.
+
+    At most `workers` shards are read in background threads (compressed
+    shards first, since they gain the most); the others are read in the
+    calling thread, so a folder of hundreds of rotated logs does not
+    start hundreds of threads.
+
+    Args:
+        pattern (str): Path, directory, or glob pattern.
+        key (callable): Returns the sort key for a line.
+        workers (int): Most shards read in background threads.
+
+    Returns:
+        iterator: Lines in key order.
+    """
+    paths = expand_inputs(pattern)
+    by_cost = sorted(paths, key=lambda path: not is_compressed(path))
+    threaded = set(by_cost[:max(0, workers)])
+
+    def merged():
+        readers = []
+        streams = []
+        try:
+            for path in paths:
+                if path in threaded:
+                    reader = FileReader(path)
+                    readers.append(reader)
+                    streams.append(reader.lines())
+                else:
+                    streams.append(file_lines(path))
+            yield from heapq.merge(*streams, key=key)
+        finally:
+            for reader in readers:
+                reader.stop()
+            for stream in streams:
+                stream.close()
+
+    return merged()
+
+
+def is_compressed(path):
+    """Returns True if the file name has a compression extension."""
+    return path.endswith((".gz", ".bz2", ".xz", ".zst"))
+
+
+def newline_aligned_ranges(path, parts):
+    """
+    Splits a file into byte ranges that start and end on line boundaries.
+
+    Args:
+        path (str): Path to an uncompressed file.
+        parts (int): Number of ranges wanted.
+
+    Returns:
+        list: (start, end) byte offsets; fewer than `parts` ranges if
+        the file has too few lines.
+    """
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, "rb") as file:
+        for i in range(1, parts):
+            file.seek(max(size * i // parts, boundaries[-1]))
+            if file.tell() > 0:
+                file.readline()  # move to the start of the next line
+            position = min(file.tell(), size)
+            if position > boundaries[-1]:
+                boundaries.append(position)
+    boundaries.append(size)
+    return [
+        (start, end)
+        for start, end in zip(boundaries, boundaries[1:])
+        if end > start
+    ]
+
+
+def mmap_lines(path, start=0, end=None):
+    """
+    Returns the lines of a plain (uncompressed) file as bytes, via mmap.
+
+    The operating system pages the file in on demand, and no text
+    decoding happens, which makes this the cheapest way to scan a large
+    ASCII file. Only the requested byte range is mapped, and the map is
+    sliced in large blocks that are split on b"\n" in one call, instead
+    of one readline() call per line.
+
+    Args:
+        path (str): Path to an uncompressed file.
+        start (int): Byte offset to start at (a line boundary).
+        end (int | None): Byte offset to stop at (a line boundary),
+            or None for the end of the file.
+
+    Returns:
+        iterator: Byte lines without the trailing b"\n" (a b"\r" from
+        Windows line endings is kept).
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    file = open(path, "rb")
+
+    def lines():
+        with file:
+            file_size = os.fstat(file.fileno()).st_size
+            stop = file_size if end is None else min(end, file_size)
+            if start >= stop:
+                return
+            # Map only [start, stop); the offset of a map must be a
+            # multiple of the allocation granularity
+            offset = start - start % mmap.ALLOCATIONGRANULARITY
+            with mmap.mmap(file.fileno(), stop - offset, access=mmap.ACCESS_READ,
+                           offset=offset) as mapped:
+                size = stop - offset
+                block_start = start - offset
+                while block_start < size:
+                    block_end = min(block_start + MMAP_BLOCK_SIZE, size)
+                    if block_end < size:
+                        newline = mapped.rfind(b"\n", block_start, block_end)
+                        if newline == -1:
+                            newline = mapped.find(b"\n", block_end, size)
+                            block_end = size if newline == -1 else newline + 1
+                        else:
+                            block_end = newline + 1
+
+                    block = mapped[block_start:block_end]
+                    if block.endswith(b"\n"):
+                        block = block[:-1]
+                    yield from block.split(b"\n")
+                    block_start = block_end
+
+    return lines()
+
+
+class CsvInput:
+    """
+    Reads CSV rows from one or more (possibly compressed) files.
+
+    Every file must start with a header row. ``fieldnames`` is the
+    header of the first file; later files with a different header are
+    reported and skipped.
+    """
+
+    def __init__(self, pattern, workers=WORKERS):
+        self.files = iter_files(expand_inputs(pattern), workers)
+        self.current = self._next_reader()
+        self.fieldnames = self.current.fieldnames if self.current else None
+
+    def _next_reader(self):
+        for path, lines in self.files:
+            self.path = path
+            return csv.DictReader(lines)
+        return None
+
+    def __iter__(self):
+        while self.current is not None:
+            if self.current.fieldnames == self.fieldnames:
+                yield from self.current
+            else:
+                print(f"Skipping {self.path}: columns differ from the first file")
+                for _ in self.current:
+                    pass
+            self.current = self._next_reader()
+
+    def close(self):
+        """Stops any background readers that are still running."""
+        self.files.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
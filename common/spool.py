@@ -0,0 +1,387 @@
+"""
+Spool Directory Daemon
+
+Runs a CSV tool as a long-lived process that picks up files dropped
+into a spool directory, instead of starting the interpreter once per
+file:
+
+- New files are noticed through inotify on Linux; elsewhere (or if
+  inotify cannot be set up) the directory is polled and a file is taken
+  once its size and modification time stop changing.
+- Each file is handed to a pool of worker processes running the tool's
+  normal processing function.
+- Outputs are written under a temporary name and renamed into place
+  when the file is finished, so readers never see a half-written
+  report. The input then moves to a done folder (or a failed folder).
+- Throughput and queue depth are printed every STATS_INTERVAL seconds
+  and kept in ``stats.json`` in the output folder.
+
+A tool provides ``process_file(path, output_dir) -> rows`` and calls
+``run_spool``; ``watch_argument_parser`` has the shared command-line flags.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import shutil
+import signal
+import struct
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+
+from common.sources import is_compressed
+
+# Worker processes handling files at the same time
+WORKERS = os.cpu_count() or 1
+
+# Seconds between directory scans when inotify is not available
+POLL_INTERVAL = 1.0
+
+# Seconds between stats reports
+STATS_INTERVAL = 30.0
+
+# File names the daemon picks up (optionally compressed)
+INPUT_EXTENSIONS = (".csv",)
+
+# inotify event flags (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_spool_input(name):
+    """Returns True for finished CSV files (not hidden or partial ones)."""
+    if name.startswith(".") or name.endswith((".tmp", ".part")):
+        return False
+    if is_compressed(name):
+        name = os.path.splitext(name)[0]
+    return name.endswith(INPUT_EXTENSIONS)
+
+
+def spool_stem(path):
+    """Returns the file name without its .csv / compression extensions."""
+    name = os.path.basename(path)
+    if is_compressed(name):
+        name = os.path.splitext(name)[0]
+    return os.path.splitext(name)[0]
+
+
+def list_spool(folder):
+    """Returns the input files currently in the spool folder, oldest first."""
+    entries = [
+        entry for entry in os.scandir(folder)
+        if entry.is_file() and is_spool_input(entry.name)
+    ]
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    return [entry.path for entry in entries]
+
+
+@contextmanager
+def atomic_outputs(paths):
+    """
+    Yields temporary paths to write instead of `paths`.
+
+    The temporary files live in a hidden folder next to the outputs and
+    are renamed over the real paths only if the block finishes without
+    an error; otherwise they are deleted.
+    """
+    folder = os.path.dirname(os.path.abspath(paths[0]))
+    os.makedirs(folder, exist_ok=True)
+    temp_folder = tempfile.mkdtemp(prefix=".partial-", dir=folder)
+    temp_paths = [os.path.join(temp_folder, os.path.basename(path)) for path in paths]
+    try:
+        yield temp_paths
+        for temp_path, path in zip(temp_paths, paths):
+            if os.path.exists(temp_path):
+                os.replace(temp_path, path)
+    finally:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+
+
+# -----------------------------
+# Watching the spool folder
+# -----------------------------
+
+class InotifyWatcher:
+    """Reports files written or moved into a folder, via Linux inotify."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"cannot watch {folder}")
+
+    def wait(self, timeout):
+        """
+        Waits up to `timeout` seconds for new files.
+
+        Returns:
+            list: Paths of files that were finished since the last call.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; fall back to a full listing
+                return list_spool(self.folder)
+            name = os.fsdecode(name)
+            if name and is_spool_input(name):
+                paths.append(os.path.join(self.folder, name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """
+    Reports new files by scanning a folder.
+
+    A file is reported once its size and modification time are the same
+    on two scans in a row, so files still being copied are left alone.
+    """
+
+    def __init__(self, folder, interval=POLL_INTERVAL):
+        self.folder = folder
+        self.interval = interval
+        self.sizes = {}
+        self.reported = set()
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+
+        current = {}
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and is_spool_input(entry.name):
+                status = entry.stat()
+                current[entry.path] = (status.st_size, status.st_mtime_ns)
+
+        paths = [
+            path for path, signature in current.items()
+            if path not in self.reported and self.sizes.get(path) == signature
+        ]
+        self.reported.update(paths)
+        # Forget files that are gone, so a new file with the same name is picked up
+        self.reported &= set(current)
+        self.sizes = current
+        return paths
+
+    def close(self):
+        pass
+
+
+def open_watcher(folder):
+    """Returns an InotifyWatcher if possible, otherwise a PollingWatcher."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), polling {folder} instead")
+    return PollingWatcher(folder)
+
+
+# -----------------------------
+# Stats
+# -----------------------------
+
+class SpoolStats:
+    """Counts finished files and rows and reports throughput."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.files_done = 0
+        self.files_failed = 0
+        self.rows = 0
+        self.last_report = self.started
+        self.last_rows = 0
+
+    def snapshot(self, queued, running):
+        """Returns the current stats as a dictionary."""
+        now = time.monotonic()
+        elapsed = max(now - self.started, 1e-9)
+        interval = max(now - self.last_report, 1e-9)
+        stats = {
+            "uptime_seconds": round(elapsed, 1),
+            "files_done": self.files_done,
+            "files_failed": self.files_failed,
+            "rows": self.rows,
+            "queue_depth": queued,
+            "running": running,
+            "files_per_second": round(self.files_done / elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 1),
+            "recent_rows_per_second": round((self.rows - self.last_rows) / interval, 1),
+        }
+        self.last_report = now
+        self.last_rows = self.rows
+        return stats
+
+    def report(self, queued, running, path=None):
+        """Prints the stats and, if `path` is given, writes them there as JSON."""
+        stats = self.snapshot(queued, running)
+        print(
+            f"[stats] done {stats['files_done']}, failed {stats['files_failed']}, "
+            f"queued {queued}, running {running}, "
+            f"{stats['rows_per_second']} rows/s ({stats['recent_rows_per_second']} recent)"
+        )
+        if path:
+            with atomic_outputs([path]) as (temp_path,):
+                with open(temp_path, "w", encoding="utf-8") as file:
+                    json.dump(stats, file, indent=2)
+
+
+# -----------------------------
+# Daemon loop
+# -----------------------------
+
+def ignore_interrupts():
+    """Worker initializer: leave Ctrl-C to the parent, which shuts down cleanly."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def move_into(path, folder):
+    """Moves a file into a folder (replacing a file of the same name)."""
+    os.makedirs(folder, exist_ok=True)
+    os.replace(path, os.path.join(folder, os.path.basename(path)))
+
+
+def run_spool(spool_dir, process_file, output_dir, done_dir=None, failed_dir=None,
+              workers=WORKERS, once=False, stats_interval=STATS_INTERVAL):
+    """
+    Processes files from a spool folder until interrupted.
+
+    Args:
+        spool_dir (str): Folder new input files are dropped into.
+        process_file (callable): process_file(path, output_dir) -> rows;
+            must be a module-level function so worker processes can run it.
+        output_dir (str): Folder for the reports.
+        done_dir (str | None): Where finished inputs go
+            (default: spool_dir/done).
+        failed_dir (str | None): Where inputs that raised go
+            (default: spool_dir/failed).
+        workers (int): Worker processes.
+        once (bool): Stop when the spool is empty instead of waiting.
+        stats_interval (float): Seconds between stats reports.
+
+    Returns:
+        SpoolStats: Final counts.
+    """
+    done_dir = done_dir or os.path.join(spool_dir, "done")
+    failed_dir = failed_dir or os.path.join(spool_dir, "failed")
+    stats_path = os.path.join(output_dir, "stats.json")
+    os.makedirs(output_dir, exist_ok=True)
+
+    stats = SpoolStats()
+    backlog = deque()
+    known = set()
+    running = {}
+
+    def enqueue(paths):
+        for path in paths:
+            path = os.path.abspath(path)
+            if path not in known and os.path.exists(path):
+                known.add(path)
+                backlog.append(path)
+
+    def collect(finished):
+        """Moves finished inputs to the done or failed folder."""
+        for future in finished:
+            path = running.pop(future)
+            known.discard(path)
+            try:
+                stats.rows += future.result() or 0
+                stats.files_done += 1
+                move_into(path, done_dir)
+            except Exception as e:
+                stats.files_failed += 1
+                print(f"Failed to process {path}: {e}")
+                if os.path.exists(path):
+                    move_into(path, failed_dir)
+
+    watcher = open_watcher(spool_dir)
+    # Files already waiting are picked up after the watcher starts, so
+    # none slip through between the listing and the first event
+    enqueue(list_spool(spool_dir))
+    next_report = time.monotonic() + stats_interval
+    print(f"Watching {spool_dir} with {type(watcher).__name__}, {workers} worker(s)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=ignore_interrupts) as pool:
+            try:
+                while True:
+                    # Keep every worker busy; the rest waits in the backlog
+                    while backlog and len(running) < workers:
+                        path = backlog.popleft()
+                        running[pool.submit(process_file, path, output_dir)] = path
+
+                    if running:
+                        finished, _ = wait(running, timeout=0.2, return_when=FIRST_COMPLETED)
+                        collect(finished)
+
+                    if once and not running and not backlog:
+                        enqueue(list_spool(spool_dir))
+                        if not backlog:
+                            break
+
+                    enqueue(watcher.wait(0 if (running or backlog) else POLL_INTERVAL))
+
+                    if time.monotonic() >= next_report:
+                        stats.report(len(backlog), len(running), stats_path)
+                        next_report = time.monotonic() + stats_interval
+            except KeyboardInterrupt:
+                print("Stopping; finishing files in progress, queued files stay in the spool")
+                finished, _ = wait(running)
+                collect(finished)
+    finally:
+        watcher.close()
+
+    stats.report(len(backlog), 0, stats_path)
+    return stats
+
+
+def watch_argument_parser(description):
+    """
+    Returns an ArgumentParser with the shared daemon flags.
+
+    The parsed arguments have watch (None for a normal one-file run),
+    output, done, failed, workers and once; a tool can add its own
+    flags before parsing.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--watch", metavar="SPOOL_DIR",
+                        help="run as a daemon processing files dropped into SPOOL_DIR")
+    parser.add_argument("--output", default="output", help="folder for the daemon's reports")
+    parser.add_argument("--done", help="folder for processed inputs (default: SPOOL_DIR/done)")
+    parser.add_argument("--failed", help="folder for inputs that failed (default: SPOOL_DIR/failed)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes")
+    parser.add_argument("--once", action="store_true",
+                        help="exit once the spool is empty instead of waiting for new files")
+    return parser
@@ -0,0 +1,117 @@
+"""
+Tests that batch rule evaluation agrees with the scalar rules.
+
+Run from the repository root with:  python3 -m unittest common.test_batch_rules
+"""
+
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from common import batch_rules
+from common.batch_rules import MAX_WIDTH, BatchFieldRules
+from common.rules import compile_field, compile_rule_set, load_rule_file, tomllib
+
+# One rule of every type, each checked on its own so later rules are
+# reached too
+SINGLE_RULES = [
+    {"type": "not_empty"},
+    {"type": "min_length", "value": 3},
+    {"type": "max_length", "value": 5},
+    {"type": "not_contains", "value": "ab"},
+    {"type": "not_contains", "value": " "},
+    {"type": "not_contains", "value": "é"},
+    {"type": "not_contains", "value": ""},
+    {"type": "no_whitespace"},
+    {"type": "not_digits_only"},
+    {"type": "starts_with_letter"},
+    {"type": "allowed_chars", "chars": "abcXYZ019_-é"},
+    {"type": "requires", "class": "upper"},
+    {"type": "requires", "class": "lower"},
+    {"type": "requires", "class": "digit"},
+    {"type": "requires", "class": "alpha"},
+    {"type": "max_repeats", "value": 1},
+    {"type": "max_repeats", "value": 2},
+    {"type": "regex", "pattern": "[a-z]+[0-9]*"},
+    {"type": "email_format"},
+]
+
+EDGE_VALUES = [
+    "", " ", "a", "ab", "abc", "Abc1", "aB3_-", "ABCDEF", "123", "0", "١٢٣",
+    "\t", "a\tb", "a\nb", "a\x0bb", "a\x1cb", "\x7f", "\x01abc", "abc\x00",
+    "\x00", "a\x00\x00\x00b", "é", "été", "Ébc", "a b", "ǅabc", "ß", "😀",
+    "aaa", "aab", "abbb", "  ", "ab ab", "x" * (MAX_WIDTH - 1), "x" * MAX_WIDTH,
+    "x" * (MAX_WIDTH + 1), "Ab1" * 200, "ann@example.com", "a@b.c", "a@@b.com",
+]
+
+
+def random_values(count, seed=7):
+    """Short strings over ASCII (including control characters) and a few others."""
+    rng = random.Random(seed)
+    alphabet = [chr(code) for code in range(128)] + ["é", "Ä", " ", "٣"]
+    common = "abcXYZ019 _-@."
+    values = []
+    for _ in range(count):
+        size = rng.randint(0, 12)
+        values.append("".join(
+            rng.choice(common) if rng.random() < 0.7 else rng.choice(alphabet)
+            for _ in range(size)
+        ))
+    return values
+
+
+class BatchRulesTest(unittest.TestCase):
+    """evaluate() gives what first_failure() gives, value by value."""
+
+    def check(self, field_rules, values):
+        results = BatchFieldRules(field_rules).evaluate(values)
+        self.assertEqual(len(results), len(values))
+        for value, result in zip(values, results):
+            expected = field_rules.first_failure(value)
+            if result != expected:
+                self.fail(f"{value!r}: batch gave {result}, scalar gave {expected}")
+
+    def check_blocks(self, field_rules):
+        values = EDGE_VALUES + random_values(2000)
+        # A mixed block, and a block the packed path takes as a whole
+        self.check(field_rules, values)
+        self.check(field_rules, [value for value in values
+                                 if value.isascii() and "\0" not in value and len(value) <= MAX_WIDTH])
+        self.check(field_rules, [])
+
+    def test_single_rules(self):
+        for rule in SINGLE_RULES:
+            with self.subTest(rule=rule):
+                self.check_blocks(compile_field([rule]))
+
+    def test_all_rules_in_order(self):
+        # not_contains "" rejects every value, hiding the rules after it
+        self.check_blocks(compile_field([rule for rule in SINGLE_RULES if rule.get("value") != ""]))
+
+    @unittest.skipIf(tomllib is None, "TOML rule files need Python 3.11+ or tomli")
+    def test_shipped_rule_files(self):
+        for folder in ("01_username_validator", "02_password_validator"):
+            rules = compile_rule_set(load_rule_file(os.path.join(ROOT, folder, "rules.toml")))
+            for field, field_rules in rules.items():
+                with self.subTest(folder=folder, field=field):
+                    self.check_blocks(field_rules)
+
+
+@unittest.skipIf(batch_rules.np is None, "NumPy is not installed")
+class WithoutNumpyTest(BatchRulesTest):
+    """The same checks with NumPy hidden, through the scalar fallback."""
+
+    def setUp(self):
+        self.numpy = batch_rules.np
+        batch_rules.np = None
+
+    def tearDown(self):
+        batch_rules.np = self.numpy
+
+
+if __name__ == "__main__":
+    unittest.main()
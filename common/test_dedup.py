@@ -0,0 +1,85 @@
+"""
+Tests for duplicate and look-alike detection.
+
+Run from the repository root with:  python3 -m unittest common.test_dedup
+"""
+
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.dedup import DuplicateIndex, NearDuplicateIndex, normalize_email
+
+
+class DuplicateIndexTest(unittest.TestCase):
+    """Exact repeats, recorded only when the caller accepts the row."""
+
+    def test_exact_duplicate(self):
+        with DuplicateIndex() as index:
+            self.assertIsNone(index.check(normalize_email("Ann@Example.com"), 2))
+            self.assertEqual(index.check(normalize_email(" ann@example.COM"), 5), 2)
+            self.assertIsNone(index.check(normalize_email("bob@example.com"), 6))
+
+    def test_find_does_not_record(self):
+        with DuplicateIndex() as index:
+            self.assertIsNone(index.find("ann"))
+            self.assertIsNone(index.find("ann"))
+            index.add("ann", 3)
+            self.assertEqual(index.find("ann"), 3)
+
+    def test_blank_key(self):
+        with DuplicateIndex() as index:
+            self.assertIsNone(index.check("", 2))
+            self.assertIsNone(index.check("", 3))
+            self.assertIsNone(index.find(""))
+
+    def test_spilled_to_disk(self):
+        with contextlib.redirect_stdout(io.StringIO()), DuplicateIndex(max_memory_keys=10) as index:
+            for row_number in range(100):
+                index.add(f"user{row_number}", row_number)
+            self.assertEqual(index.find("user3"), 3)
+            self.assertEqual(index.find("user99"), 99)
+            self.assertIsNone(index.find("user100"))
+
+
+class NearDuplicateIndexTest(unittest.TestCase):
+    """Usernames that normalize to the same key as an earlier one."""
+
+    def test_look_alike(self):
+        with NearDuplicateIndex() as index:
+            self.assertIsNone(index.check("john.doe", 2))
+            self.assertEqual(index.check("John-Doe", 3), ("john.doe", 2))
+            self.assertEqual(index.check("j0hndoe", 4), ("john.doe", 2))
+            self.assertIsNone(index.check("jane.doe", 5))
+
+    def test_exact_repeat_is_not_a_look_alike(self):
+        with NearDuplicateIndex() as index:
+            index.add("john.doe", 2)
+            self.assertIsNone(index.find("john.doe"))
+
+    def test_only_first_username_is_kept(self):
+        with NearDuplicateIndex() as index:
+            index.add("john.doe", 2)
+            index.add("john_doe", 3)
+            self.assertEqual(index.find("JOHNDOE"), ("john.doe", 2))
+
+    def test_blank_key(self):
+        with NearDuplicateIndex() as index:
+            self.assertIsNone(index.check("", 2))
+            self.assertIsNone(index.check("._-", 3))
+            self.assertIsNone(index.check("", 4))
+
+    def test_spilled_to_disk(self):
+        with contextlib.redirect_stdout(io.StringIO()), NearDuplicateIndex(max_memory_keys=10) as index:
+            for row_number in range(50):
+                index.add(f"user.{row_number}x", row_number)
+            self.assertEqual(index.find("user-7x"), ("user.7x", 7))
+            self.assertEqual(index.find("USER_49X"), ("user.49x", 49))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests for reloading a rule file while a run is going.
+
+Run from the repository root with:  python3 -m unittest common.test_rules
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.rules import RuleConfig
+
+
+def min_length_rules(length):
+    return {"password": [{"type": "min_length", "value": length, "message": f"shorter than {length}"}]}
+
+
+class ReloadTest(unittest.TestCase):
+    """reload_if_changed swaps in the edited rules, and only working ones."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="rules-")
+        self.path = os.path.join(self.folder, "rules.json")
+        self.write(json.dumps(min_length_rules(5)))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, text):
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(text)
+        # Make the edit visible even where file times are coarse
+        status = os.stat(self.path)
+        os.utime(self.path, ns=(status.st_atime_ns, status.st_mtime_ns + 1_000_000_000))
+
+    def reload(self, config):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            changed = config.reload_if_changed()
+        return changed, output.getvalue()
+
+    def test_unchanged_file(self):
+        config = RuleConfig(self.path, reload_interval=0)
+        rules = config.rules
+        self.assertEqual(self.reload(config), (False, ""))
+        self.assertIs(config.rules, rules)
+
+    def test_edited_file(self):
+        config = RuleConfig(self.path, reload_interval=0)
+        self.assertEqual(config.rules["password"]("abcdef"), (True, None))
+
+        self.write(json.dumps(min_length_rules(8)))
+        changed, output = self.reload(config)
+
+        self.assertTrue(changed)
+        self.assertIn("version 2", output)
+        self.assertEqual(config.version, 2)
+        self.assertEqual(config.rules["password"]("abcdef"), (False, "shorter than 8"))
+        self.assertEqual(self.reload(config), (False, ""))
+
+    def test_broken_file_keeps_rules(self):
+        config = RuleConfig(self.path, reload_interval=0)
+        rules = config.rules
+
+        self.write('{"password": [{"type": "min_length"')
+        changed, output = self.reload(config)
+        self.assertFalse(changed)
+        self.assertIn("Keeping current rules", output)
+        self.assertIs(config.rules, rules)
+        # Reported once, not on every check
+        self.assertEqual(self.reload(config), (False, ""))
+
+        self.write(json.dumps({"password": [{"type": "no_such_rule"}]}))
+        self.assertFalse(self.reload(config)[0])
+        self.assertIs(config.rules, rules)
+        self.assertEqual(config.version, 1)
+
+    def test_checks_once_per_interval(self):
+        config = RuleConfig(self.path, reload_interval=3600)
+        self.write(json.dumps(min_length_rules(8)))
+        self.assertEqual(self.reload(config), (False, ""))
+        self.assertEqual(config.version, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
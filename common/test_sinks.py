@@ -0,0 +1,114 @@
+"""
+Tests for the output sinks with several batches per file.
+
+Run from the repository root with:  python3 -m unittest common.test_sinks
+"""
+
+import csv
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.sinks import open_sink, pyarrow
+
+FIELDNAMES = ["timestamp", "status", "note", "duration"]
+COLUMN_TYPES = {"duration": "float64"}
+
+# Batches of 4 rows: the status values differ from batch to batch, the
+# duration is blank for the whole first batch, and the note column mixes
+# numbers and text
+ROWS = [
+    {
+        "timestamp": f"2026-01-19 09:{i:02d}:00",
+        "status": f"STATUS_{i // 4}",
+        "note": i if i % 2 else f"note {i}",
+        "duration": None if i < 4 else i * 1.5,
+    }
+    for i in range(10)
+]
+
+
+def expected_text(value):
+    """The cell text a CSV file holds for a value."""
+    return "" if value is None else str(value)
+
+
+class MultiBatchSinkTest(unittest.TestCase):
+    """Every format writes files with more than one batch."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="sinks-")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, name):
+        path = os.path.join(self.folder, name)
+        with open_sink(path, FIELDNAMES, dictionary_columns=["status"],
+                       column_types=COLUMN_TYPES, batch_size=4) as writer:
+            writer.writeheader()
+            writer.writerows(dict(row) for row in ROWS)
+        return path
+
+    def check_text_rows(self, rows):
+        self.assertEqual(len(rows), len(ROWS))
+        for row, expected in zip(rows, ROWS):
+            for name in FIELDNAMES:
+                self.assertEqual(expected_text(row[name]), expected_text(expected[name]))
+
+    def test_csv(self):
+        with open(self.write("out.csv"), newline="") as file:
+            self.check_text_rows(list(csv.DictReader(file)))
+
+    def test_csv_gz(self):
+        with gzip.open(self.write("out.csv.gz"), "rt", newline="") as file:
+            self.check_text_rows(list(csv.DictReader(file)))
+
+    def test_jsonl(self):
+        with open(self.write("out.jsonl")) as file:
+            rows = [json.loads(line) for line in file]
+        self.check_text_rows(rows)
+
+    def test_sqlite(self):
+        connection = sqlite3.connect(self.write("out.sqlite"))
+        connection.row_factory = sqlite3.Row
+        rows = connection.execute("SELECT * FROM out ORDER BY timestamp").fetchall()
+        connection.close()
+        self.check_text_rows([dict(row) for row in rows])
+
+    def check_table(self, table):
+        self.assertEqual(table.schema.field("duration").type, pyarrow.float64())
+        self.assertEqual(table.schema.field("note").type, pyarrow.string())
+        self.assertEqual(table.column("duration").to_pylist(), [row["duration"] for row in ROWS])
+        self.assertEqual(table.column("note").to_pylist(), [str(row["note"]) for row in ROWS])
+        self.assertEqual(table.column("status").to_pylist(), [row["status"] for row in ROWS])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet(self):
+        self.check_table(pyarrow.parquet.read_table(self.write("out.parquet")))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow(self):
+        with pyarrow.ipc.open_file(self.write("out.arrow")) as reader:
+            self.assertEqual(reader.num_record_batches, 3)
+            self.check_table(reader.read_all())
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_empty_parquet(self):
+        path = os.path.join(self.folder, "empty.parquet")
+        with open_sink(path, FIELDNAMES, column_types=COLUMN_TYPES):
+            pass
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.names, FIELDNAMES)
+
+
+if __name__ == "__main__":
+    unittest.main()
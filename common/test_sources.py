@@ -0,0 +1,60 @@
+"""
+Tests for reading files in background threads.
+
+Run from the repository root with:  python3 -m unittest common.test_sources
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.sources import CHUNK_LINES, MAX_PENDING_CHUNKS, iter_files
+
+# Enough lines that a reader fills its queue and waits for the caller
+LINES = CHUNK_LINES * (MAX_PENDING_CHUNKS + 2)
+
+
+class IterFilesTest(unittest.TestCase):
+    """Readers are stopped when the caller stops early."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="sources-")
+        self.paths = []
+        for name in ("a.log", "b.log", "c.log"):
+            path = os.path.join(self.folder, name)
+            with open(path, "w") as file:
+                file.writelines(f"{name} line {i}\n" for i in range(LINES))
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def assert_readers_stopped(self, before):
+        for thread in threading.enumerate():
+            if thread not in before:
+                thread.join(timeout=5)
+                self.assertFalse(thread.is_alive())
+
+    def test_stop_while_reading_a_file(self):
+        before = set(threading.enumerate())
+        files = iter_files(self.paths, workers=2)
+        path, lines = next(files)
+        self.assertEqual(path, self.paths[0])
+        self.assertEqual(next(lines), "a.log line 0\n")
+        files.close()
+        self.assert_readers_stopped(before)
+
+    def test_read_everything(self):
+        before = set(threading.enumerate())
+        counts = [sum(1 for _ in lines) for _, lines in iter_files(self.paths, workers=2)]
+        self.assertEqual(counts, [LINES] * 3)
+        self.assert_readers_stopped(before)
+
+
+if __name__ == "__main__":
+    unittest.main()